@@ -0,0 +1,305 @@
+"""
+Analytics Ingestion
+
+Buffered pipeline for high-volume tracking events (page views, user
+activity). `track` only appends to an in-memory buffer; a background thread
+flushes it every few seconds (or as soon as a batch fills up) with one
+insert_many into the "analytics_events" time-series collection, whose raw
+events expire by TTL, and one bulk_write of `$inc` upserts into
+"analytics_rollup" that keeps per-minute/hour/day counters per event key.
+Dashboards read `get_rollups` instead of scanning raw events.
+
+Failed writes are retried without counting anything twice. A time-series
+collection has no unique `_id`, so before an event is sent again the
+ingestor looks up which of the retried events are already stored (by `_id`,
+within their time window) and only inserts the rest. Rollup `$inc`s the
+server rejected are kept and added to the next flush; when the outcome of a
+rollup write is unknown, the affected days are recomputed from the raw
+events instead (`rebuild_rollups`).
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure, PyMongoError
+
+import database
+
+logger = logging.getLogger("notebuddy.analytics")
+
+EVENTS = "analytics_events"
+ROLLUPS = "analytics_rollup"
+RAW_TTL = int(os.getenv("ANALYTICS_RAW_TTL_DAYS", 30)) * 86400
+FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", 5))
+BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", 1000))
+MAX_BUFFER = int(os.getenv("ANALYTICS_MAX_BUFFER", 100_000))
+# Only raised by the plain-collection fallback, which has a unique _id
+DUPLICATE_KEY = 11000
+
+# Rollup retention per granularity; day rollups are kept forever
+GRANULARITIES = {
+    "minute": timedelta(days=7),
+    "hour": timedelta(days=90),
+    "day": None,
+}
+
+
+def _truncate(ts: datetime, granularity: str) -> datetime:
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ensure_collections(db):
+    """Create the time-series event collection (or a TTL'd plain one) and rollup indexes"""
+    try:
+        db.create_collection(
+            EVENTS,
+            timeseries={"timeField": "timestamp", "metaField": "meta", "granularity": "seconds"},
+            expireAfterSeconds=RAW_TTL,
+        )
+    except CollectionInvalid:
+        pass  # already exists
+    except (OperationFailure, NotImplementedError, TypeError):
+        # Pre-5.0 servers: plain collection with a TTL index
+        db[EVENTS].create_index("timestamp", expireAfterSeconds=RAW_TTL, name="timestamp_ttl")
+    db[ROLLUPS].create_index(
+        [("granularity", ASCENDING), ("kind", ASCENDING), ("key", ASCENDING), ("bucket", ASCENDING)],
+        unique=True,
+        name="rollup_key",
+    )
+    db[ROLLUPS].create_index("expire_at", expireAfterSeconds=0, name="expire_at_ttl")
+
+
+class EventIngestor:
+    def __init__(self, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL, max_buffer: int = MAX_BUFFER):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flushed = 0
+        self._buffer: deque = deque(maxlen=max_buffer)
+        self._appended = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = False
+        # Rollup deltas the server rejected, re-sent with the next flush
+        self._rollup_backlog: Counter = Counter()
+        # [start, end) of days whose rollups must be rebuilt from raw events
+        self._stale_span: Optional[Tuple[datetime, datetime]] = None
+
+    @property
+    def dropped(self) -> int:
+        # Events pushed out of the bounded buffer before they could be flushed
+        return self._appended - self.flushed - len(self._buffer)
+
+    def track(self, kind: str, key: str, data: Dict, timestamp: Optional[datetime] = None):
+        ts = timestamp or datetime.now(timezone.utc)
+        with self._lock:
+            self._buffer.append({**data, "timestamp": ts, "meta": {"kind": kind, "key": key}})
+            self._appended += 1
+            full = len(self._buffer) >= self.batch_size
+        self._ensure_started()
+        if full:
+            self._wake.set()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="analytics-flush", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.flush)
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except PyMongoError:
+                logger.exception("Analytics flush failed; events stay buffered")
+
+    def _drain(self) -> List[Dict]:
+        with self._lock:
+            batch = list(self._buffer)
+            self._buffer.clear()
+        return batch
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of events written"""
+        db = database.db
+        if db is None:
+            return 0
+        with self._flush_lock:
+            if not self._ready:
+                ensure_collections(db)
+                self._ready = True
+            events = self._drain()
+            if not events and not self._rollup_backlog and self._stale_span is None:
+                return 0
+            written, retry, error = self._insert(db, events) if events else ([], [], None)
+            if retry:
+                with self._lock:
+                    self._buffer.extendleft(reversed(retry))
+            self.flushed += len(written)
+            self._update_rollups(db, written)
+            if error is not None:
+                raise error
+            return len(written)
+
+    def _update_rollups(self, db, events: List[Dict]):
+        counts = _rollup_counts(events)
+        counts.update(self._rollup_backlog)
+        self._rollup_backlog = Counter()
+        buckets = list(counts)
+        if buckets:
+            try:
+                db[ROLLUPS].bulk_write(_rollup_ops(counts), ordered=False)
+            except BulkWriteError as e:
+                # Rejected upserts were not applied and can simply be re-sent
+                for err in e.details.get("writeErrors", []):
+                    self._rollup_backlog[buckets[err["index"]]] += counts[buckets[err["index"]]]
+                if e.details.get("writeConcernErrors"):
+                    self._mark_stale(buckets)
+                logger.warning("Analytics rollup update partly failed: %s", e.details.get("writeErrors"))
+            except PyMongoError:
+                # Some $incs may have been applied: recount these days instead
+                self._mark_stale(buckets)
+                logger.exception("Analytics rollup update failed for %d events", len(events))
+        if self._stale_span is not None:
+            start, end = self._stale_span
+            try:
+                rebuild_rollups(db, start, end)
+            except PyMongoError:
+                logger.exception("Analytics rollup rebuild for %s..%s failed; will retry", start, end)
+                return
+            self._stale_span = None
+            # The rebuild counted these from raw events already
+            for bucket in [b for b in self._rollup_backlog if start <= _aware(b[3]) < end]:
+                del self._rollup_backlog[bucket]
+
+    def _mark_stale(self, buckets: List[Tuple]):
+        days = [_aware(_truncate(b[3], "day")) for b in buckets]
+        start, end = min(days), max(days) + timedelta(days=1)
+        if self._stale_span is not None:
+            start, end = min(start, self._stale_span[0]), max(end, self._stale_span[1])
+        self._stale_span = (start, end)
+
+    def _insert(self, db, events: List[Dict]) -> Tuple[List[Dict], List[Dict], Optional[PyMongoError]]:
+        """Insert in chunks; returns (written, to retry, error).
+
+        On a BulkWriteError only the events the server rejected are retried,
+        the rest of their chunk is stored. insert_many sets `_id` on each
+        event in place, so an event carrying an `_id` was sent before and is
+        only sent again if it isn't stored yet.
+        """
+        written: List[Dict] = []
+        for i in range(0, len(events), self.batch_size):
+            chunk = events[i:i + self.batch_size]
+            rest = events[i + self.batch_size:]
+            resent = [ev for ev in chunk if "_id" in ev]
+            if resent:
+                try:
+                    stored = _stored_ids(db, resent)
+                except PyMongoError as e:
+                    return written, chunk + rest, e
+                written.extend(ev for ev in resent if ev["_id"] in stored)
+                chunk = [ev for ev in chunk if ev.get("_id") not in stored]
+                if not chunk:
+                    continue
+            try:
+                db[EVENTS].insert_many(chunk, ordered=False)
+            except BulkWriteError as e:
+                failed = {
+                    err["index"] for err in e.details.get("writeErrors", [])
+                    if err.get("code") != DUPLICATE_KEY
+                }
+                written.extend(ev for j, ev in enumerate(chunk) if j not in failed)
+                if not failed and not e.details.get("writeConcernErrors"):
+                    continue
+                return written, [chunk[j] for j in sorted(failed)] + rest, e
+            except PyMongoError as e:
+                # Outcome unknown (network error, timeout): retry the chunk
+                return written, chunk + rest, e
+            written.extend(chunk)
+        return written, [], None
+
+    def stats(self) -> Dict:
+        return {"buffered": len(self._buffer), "flushed": self.flushed, "dropped": self.dropped}
+
+
+def _aware(ts: datetime) -> datetime:
+    # Stored dates come back naive (UTC) unless the client is tz_aware
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _stored_ids(db, events: List[Dict]) -> set:
+    """The `_id`s of these already-sent events that the events collection holds"""
+    times = [_aware(e["timestamp"]) for e in events]
+    # Stored timestamps are truncated to milliseconds
+    window = {"$gte": min(times) - timedelta(milliseconds=1), "$lte": max(times) + timedelta(milliseconds=1)}
+    cursor = db[EVENTS].find({"timestamp": window, "_id": {"$in": [e["_id"] for e in events]}}, {"_id": 1})
+    return {d["_id"] for d in cursor}
+
+
+def _rollup_counts(events: Iterable[Dict]) -> Counter:
+    counts: Counter = Counter()
+    for e in events:
+        for granularity in GRANULARITIES:
+            counts[(granularity, e["meta"]["kind"], e["meta"]["key"], _truncate(e["timestamp"], granularity))] += 1
+    return counts
+
+
+def _rollup_ops(counts: Counter, replace: bool = False) -> List[UpdateOne]:
+    ops = []
+    for (granularity, kind, key, bucket), n in counts.items():
+        retention = GRANULARITIES[granularity]
+        on_insert = {"expire_at": bucket + retention} if retention else {}
+        ops.append(UpdateOne(
+            {"granularity": granularity, "kind": kind, "key": key, "bucket": bucket},
+            {"$set" if replace else "$inc": {"count": n}, **({"$setOnInsert": on_insert} if on_insert else {})},
+            upsert=True,
+        ))
+    return ops
+
+
+def rebuild_rollups(db, start: datetime, end: datetime) -> int:
+    """Recount the rollups of [start, end) from the raw events; returns the number of buckets written.
+
+    `start` and `end` should be day boundaries so day and hour buckets are
+    counted in full. Only days still within the raw events' TTL can be
+    rebuilt, and increments written concurrently for the same buckets may be
+    overwritten, so this is a repair path rather than part of every flush.
+    """
+    projection = {"_id": 0, "timestamp": 1, "meta": 1}
+    counts = _rollup_counts(db[EVENTS].find({"timestamp": {"$gte": start, "$lt": end}}, projection))
+    if counts:
+        db[ROLLUPS].bulk_write(_rollup_ops(counts, replace=True), ordered=False)
+    return len(counts)
+
+
+def get_rollups(kind: str, granularity: str = "hour", start: datetime = None, end: datetime = None, key: str = None) -> List[Dict]:
+    """Counters for one event kind, oldest bucket first"""
+    db = database.db
+    if db is None:
+        return []
+    filt = {"granularity": granularity, "kind": kind}
+    if key is not None:
+        filt["key"] = key
+    if start or end:
+        filt["bucket"] = {**({"$gte": start} if start else {}), **({"$lt": end} if end else {})}
+    cursor = db[ROLLUPS].find(filt, {"_id": 0, "key": 1, "bucket": 1, "count": 1}).sort("bucket", ASCENDING)
+    return list(cursor)
+
+
+ingestor = EventIngestor()
+track = ingestor.track
@@ -1,12 +1,17 @@
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from bson import ObjectId
 
+from load_shedding import db_listener
+from schema_versions import for_insert
+
 DATABASE_URL = os.getenv("DATABASE_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "notebuddy")
+# "mongo" (default) or "memory" (see memory_backend.py)
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "mongo").lower()
 
 _client: Optional[AsyncIOMotorClient] = None
 _db: Optional[AsyncIOMotorDatabase] = None
@@ -15,7 +20,12 @@ _db: Optional[AsyncIOMotorDatabase] = None
 def get_db() -> AsyncIOMotorDatabase:
     global _client, _db
     if _db is None:
-        _client = AsyncIOMotorClient(DATABASE_URL)
+        if DATABASE_BACKEND == "memory":
+            from memory_backend import AsyncMemoryClient
+
+            _client = AsyncMemoryClient()
+        else:
+            _client = AsyncIOMotorClient(DATABASE_URL, event_listeners=[db_listener])
         _db = _client[DATABASE_NAME]
     return _db
 
@@ -33,23 +43,22 @@ def _ensure_id_filter(filter_dict: Dict[str, Any]) -> Dict[str, Any]:
 
 
 async def create_document(collection: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    # Stored in the shared shape (chapters/thumbnail_url, BSON dates, no
+    # stored id, schema_version) and presented back in this app's shape
     db = get_db()
-    now = datetime.utcnow().isoformat()
-    doc = {**data, "created_at": now, "updated_at": now}
+    now = datetime.now(timezone.utc)
+    doc = for_insert(collection, {**data, "created_at": now, "updated_at": now})
     res = await db[collection].insert_one(doc)
-    oid = res.inserted_id
-    # also store readable id field for convenience
-    await db[collection].update_one({"_id": oid}, {"$set": {"id": str(oid)}})
-    doc["_id"] = oid
-    doc["id"] = str(oid)
+    doc["_id"] = res.inserted_id
     return _normalize(doc)
 
 
 async def update_document(collection: str, filter_dict: Dict[str, Any], update_data: Dict[str, Any]) -> int:
     db = get_db()
-    update_data["updated_at"] = datetime.utcnow().isoformat()
+    fields = {_STORED_NAMES.get(k, k): v for k, v in update_data.items()}
+    fields["updated_at"] = datetime.now(timezone.utc)
     filt = _ensure_id_filter(filter_dict)
-    res = await db[collection].update_one(filt, {"$set": update_data})
+    res = await db[collection].update_one(filt, {"$set": fields})
     return res.modified_count
 
 
@@ -79,6 +88,10 @@ async def delete_document(collection: str, filter_dict: Dict[str, Any]) -> int:
     return res.deleted_count
 
 
+# This app's field names -> the shared stored names
+_STORED_NAMES = {"tags": "chapters", "thumbnail": "thumbnail_url"}
+
+
 def _normalize(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
     if not doc:
         return None
@@ -86,4 +99,12 @@ def _normalize(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
     if "_id" in d:
         d["id"] = d.get("id") or str(d["_id"])  # ensure id exists
         d.pop("_id", None)
+    # Documents migrated to the root schema (see schema_versions.py) use
+    # chapters/thumbnail_url and BSON dates; present them in this app's shape
+    for ours, theirs in _STORED_NAMES.items():
+        if ours not in d and theirs in d:
+            d[ours] = d.pop(theirs)
+    for field in ("created_at", "updated_at"):
+        if isinstance(d.get(field), datetime):
+            d[field] = d[field].isoformat()
     return d
@@ -0,0 +1,267 @@
+"""
+Adaptive Concurrency Limiting
+
+`LoadShedMiddleware` admits at most `limiter.limit` requests at a time and
+rejects the rest immediately with 503 + Retry-After instead of letting them
+queue for a pool connection. The limit follows AIMD: it grows by one per
+`limit` completions while requests actually hit it, and shrinks by BACKOFF
+(at most once per COOLDOWN seconds) when route latency or MongoDB command
+latency rises above TOLERANCE times its observed no-load baseline, or when
+requests fail with a 5xx.
+
+Requests are classified before routing. Each priority class may only use a
+share of the limit, so as the limit shrinks search is shed first and admin
+moderation last:
+
+    critical  /api/admin/*                 100%
+    high      GET /api/notes/{id}           90%
+    normal    everything else               75%
+    low       /api/notes?q=, /api/suggest,  50%
+              /api/admin/uploads/archive
+
+MongoDB latency comes from `db_listener`, a pymongo command listener passed
+to the client in database.py. Both apps share this module; it lives in
+backend/ and imports nothing from the repository root, so that app can be
+deployed on its own, and the root app imports it as `backend.load_shedding`.
+Latency is tracked per (route, command) and only for commands issued while
+serving a request: a slow aggregate in one endpoint doesn't hide behind fast
+finds elsewhere, and background work (jobs, change streams) is not counted;
+the migration runner tracks its own batch latency. A request backs the limit
+off when its own route's commands slow down. Commands sent from threads that
+don't carry the request's context (motor's executor, in backend/) are not
+attributed. Configuration is read from the environment: LOAD_SHEDDING (set
+to 0 to disable), SHED_INITIAL_LIMIT, SHED_MIN_LIMIT, SHED_MAX_LIMIT,
+SHED_LATENCY_TOLERANCE, SHED_RETRY_AFTER.
+"""
+
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from pymongo import monitoring
+
+enabled = os.getenv("LOAD_SHEDDING", "1").lower() not in ("0", "false", "no")
+
+INITIAL_LIMIT = int(os.getenv("SHED_INITIAL_LIMIT", 32))
+MIN_LIMIT = int(os.getenv("SHED_MIN_LIMIT", 4))
+MAX_LIMIT = int(os.getenv("SHED_MAX_LIMIT", 256))
+TOLERANCE = float(os.getenv("SHED_LATENCY_TOLERANCE", 2.0))
+RETRY_AFTER = int(os.getenv("SHED_RETRY_AFTER", 1))
+BACKOFF = 0.9
+COOLDOWN = 0.5
+
+PRIORITIES = {"critical": 1.0, "high": 0.9, "normal": 0.75, "low": 0.5}
+
+_NOTE_DETAIL = re.compile(r"^/api/notes/[^/]+$")
+# Commands that measure database load; getMore is excluded because change
+# stream cursors (invalidation.py) block in it on purpose
+_DB_COMMANDS = {"find", "insert", "update", "delete", "aggregate", "findAndModify", "count", "distinct"}
+
+
+# Scope of the request being served; routing fills in scope["route"] later
+_request: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("load_shed_request", default=None)
+
+
+def _route_path(scope) -> str:
+    # Key latency by route template; unmatched paths share one bucket
+    return getattr(scope.get("route"), "path", "<unmatched>")
+
+
+def classify(scope) -> str:
+    path = scope["path"]
+    if path.startswith("/api/admin/uploads/archive"):
+        return "low"
+    if path.startswith("/api/admin"):
+        return "critical"
+    if scope["method"] == "GET" and _NOTE_DETAIL.match(path):
+        return "high"
+    if path == "/api/suggest":
+        return "low"
+    if path == "/api/notes" and parse_qs(scope.get("query_string", b"").decode("latin-1")).get("q"):
+        return "low"
+    return "normal"
+
+
+class LatencyTracker:
+    """Short-term EWMA against a baseline that follows dips at once and rises slowly"""
+
+    def __init__(self, alpha: float = 0.1, drift: float = 0.002):
+        self.alpha = alpha
+        self.drift = drift
+        self.recent: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.samples = 0
+
+    def observe(self, seconds: float):
+        self.samples += 1
+        if self.recent is None:
+            self.recent = self.baseline = seconds
+            return
+        self.recent += (seconds - self.recent) * self.alpha
+        if self.recent < self.baseline:
+            self.baseline = self.recent
+        else:
+            self.baseline += (self.recent - self.baseline) * self.drift
+
+    @property
+    def ratio(self) -> float:
+        if not self.baseline:
+            return 1.0
+        return self.recent / self.baseline
+
+    def stats(self) -> Dict:
+        return {
+            "samples": self.samples,
+            "recent_ms": round(self.recent * 1000, 2) if self.recent is not None else None,
+            "baseline_ms": round(self.baseline * 1000, 2) if self.baseline is not None else None,
+        }
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: int = INITIAL_LIMIT, min_limit: int = MIN_LIMIT, max_limit: int = MAX_LIMIT,
+                 tolerance: float = TOLERANCE):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.inflight = 0
+        self.db: Dict[Tuple[str, str], LatencyTracker] = {}
+        self.routes: Dict[str, LatencyTracker] = {}
+        self.counts = {name: {"inflight": 0, "accepted": 0, "rejected": 0} for name in PRIORITIES}
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, priority: str) -> bool:
+        with self._lock:
+            if self.inflight >= max(1, int(self.limit * PRIORITIES[priority])):
+                self.counts[priority]["rejected"] += 1
+                return False
+            self.inflight += 1
+            self.counts[priority]["inflight"] += 1
+            self.counts[priority]["accepted"] += 1
+            return True
+
+    def release(self, priority: str, route: str, seconds: float, failed: bool = False):
+        with self._lock:
+            saturated = self.inflight >= self.limit * 0.8
+            self.inflight -= 1
+            self.counts[priority]["inflight"] -= 1
+            tracker = self.routes.get(route)
+            if tracker is None:
+                tracker = self.routes[route] = LatencyTracker()
+            tracker.observe(seconds)
+            if failed or tracker.ratio > self.tolerance or self._db_ratio(route) > self.tolerance:
+                now = time.monotonic()
+                if now - self._last_decrease >= COOLDOWN:
+                    self._last_decrease = now
+                    self.limit = max(self.min_limit, self.limit * BACKOFF)
+                    self.decreases += 1
+            elif saturated:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def observe_db(self, route: str, command: str, seconds: float):
+        with self._lock:
+            tracker = self.db.get((route, command))
+            if tracker is None:
+                tracker = self.db[(route, command)] = LatencyTracker()
+            tracker.observe(seconds)
+
+    def _db_ratio(self, route: Optional[str] = None) -> float:
+        return max(
+            (t.ratio for (r, _), t in self.db.items() if route is None or r == route),
+            default=1.0,
+        )
+
+    def db_ratio(self, route: Optional[str] = None) -> float:
+        """Worst recent/baseline DB latency ratio, for one route or across all of them"""
+        with self._lock:
+            return self._db_ratio(route)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": enabled,
+                "limit": round(self.limit, 2),
+                "inflight": self.inflight,
+                "decreases": self.decreases,
+                "classes": {
+                    name: {**counts, "max_inflight": max(1, int(self.limit * PRIORITIES[name]))}
+                    for name, counts in self.counts.items()
+                },
+                "db_latency": {f"{route} {command}": t.stats() for (route, command), t in sorted(self.db.items())},
+                "routes": {route: t.stats() for route, t in sorted(self.routes.items())},
+            }
+
+
+class DbLatencyListener(monitoring.CommandListener):
+    def __init__(self, limiter: AdaptiveLimiter):
+        self.limiter = limiter
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        # Called on the thread that ran the command; threadpool calls copy
+        # the request's context, background threads have none
+        scope = _request.get()
+        if scope is not None and event.command_name in _DB_COMMANDS:
+            self.limiter.observe_db(_route_path(scope), event.command_name, event.duration_micros / 1e6)
+
+
+_BUSY_BODY = json.dumps({"detail": "Server busy, please retry shortly"}).encode()
+
+
+class LoadShedMiddleware:
+    def __init__(self, app, limiter: AdaptiveLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled:
+            await self.app(scope, receive, send)
+            return
+        priority = classify(scope)
+        if not self.limiter.try_acquire(priority):
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_BUSY_BODY)).encode()),
+                    (b"retry-after", str(RETRY_AFTER).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": _BUSY_BODY})
+            return
+
+        status = 500
+
+        async def wrapped_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        token = _request.set(scope)
+        try:
+            await self.app(scope, receive, wrapped_send)
+        finally:
+            _request.reset(token)
+            self.limiter.release(priority, _route_path(scope), time.perf_counter() - start, failed=status >= 500)
+
+
+limiter = AdaptiveLimiter()
+db_listener = DbLatencyListener(limiter)
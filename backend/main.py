@@ -5,9 +5,12 @@ from typing import List, Optional
 
 from database import create_document, get_documents, get_document, update_document, delete_document, get_db
 from schemas import Note, Upload, Contributor, Settings
+import load_shedding
 
 app = FastAPI(title="NoteBuddy API")
 
+# Added first so it sits inside CORS: shed 503s still carry CORS headers
+app.add_middleware(load_shedding.LoadShedMiddleware, limiter=load_shedding.limiter)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -83,7 +86,8 @@ class UploadIn(Upload):
 
 @app.post("/api/uploads")
 async def create_upload(upload: UploadIn):
-    data = upload.dict()
+    # JSON mode so HttpUrl values are stored as plain strings
+    data = upload.model_dump(mode="json")
     data["status"] = "pending"
     doc = await create_document("upload", data)
     return {"message": "Received", "id": doc["id"]}
@@ -205,3 +209,8 @@ async def put_settings(body: SettingsIn, _: bool = Depends(require_admin)):
         return {"message": "Updated"}
     await create_document("settings", body.dict())
     return {"message": "Created"}
+
+
+@app.get("/api/admin/limiter")
+async def limiter_status(_: bool = Depends(require_admin)):
+    return load_shedding.limiter.stats()
@@ -0,0 +1,100 @@
+"""
+In-memory stand-in for the motor client, selected with DATABASE_BACKEND=memory.
+
+Wraps a mongomock client (same query, update, sort/skip/limit and index
+semantics as the sync stand-in in ../database.py) behind the subset of
+motor's async API this app uses, so the API can be tested and benchmarked
+without a running mongod. Operations complete synchronously; there is no I/O
+to wait for.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import mongomock
+
+_ASYNC_METHODS = {
+    "insert_one", "insert_many", "find_one", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "count_documents", "estimated_document_count", "distinct",
+    "bulk_write", "find_one_and_update", "find_one_and_delete", "find_one_and_replace",
+    "create_index", "create_indexes", "drop_index", "index_information", "drop",
+}
+
+
+def _awaitable(fn):
+    async def call(*args, **kwargs):
+        return fn(*args, **kwargs)
+    return call
+
+
+class AsyncMemoryCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs) -> "AsyncMemoryCursor":
+        self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, n: int) -> "AsyncMemoryCursor":
+        self._cursor.skip(n)
+        return self
+
+    def limit(self, n: int) -> "AsyncMemoryCursor":
+        self._cursor.limit(n)
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        try:
+            return next(self._cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = []
+        for doc in self._cursor:
+            docs.append(doc)
+            if length is not None and len(docs) >= length:
+                break
+        return docs
+
+
+class AsyncMemoryCollection:
+    def __init__(self, collection):
+        self._collection = collection
+        self.name = collection.name
+
+    def find(self, *args, **kwargs) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self._collection.find(*args, **kwargs))
+
+    def aggregate(self, pipeline, **kwargs) -> AsyncMemoryCursor:
+        return AsyncMemoryCursor(self._collection.aggregate(pipeline, **kwargs))
+
+    def __getattr__(self, name):
+        if name not in _ASYNC_METHODS:
+            raise AttributeError(name)
+        return _awaitable(getattr(self._collection, name))
+
+
+class AsyncMemoryDatabase:
+    def __init__(self, client: "AsyncMemoryClient", database):
+        self.client = client
+        self._database = database
+        self.name = database.name
+
+    def __getitem__(self, name: str) -> AsyncMemoryCollection:
+        return AsyncMemoryCollection(self._database[name])
+
+    async def list_collection_names(self) -> List[str]:
+        return self._database.list_collection_names()
+
+
+class AsyncMemoryClient:
+    address = ("memory", 0)
+
+    def __init__(self):
+        self._client = mongomock.MongoClient()
+
+    def __getitem__(self, name: str) -> AsyncMemoryDatabase:
+        return AsyncMemoryDatabase(self, self._client[name])
@@ -0,0 +1,84 @@
+"""
+Schema Versions
+
+The numbered steps that bring a stored document from the shape it was written
+in (`schema_version`, missing = 0) to the canonical shape in ../schemas.py,
+plus the two entry points both apps use: `upgrade()` for reads and
+`for_insert()` for writes. Kept in this directory, with no imports from the
+repository root, so backend/ can be deployed on its own; the root app's
+migrations.py (runner and CLI) imports it as `backend.schema_versions`.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+VERSION_FIELD = "schema_version"
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    collections: Tuple[str, ...]
+    apply: Callable[[Dict], None]  # mutates the document in place
+
+
+def _rename_backend_fields(doc: Dict):
+    for old, new in (("tags", "chapters"), ("thumbnail", "thumbnail_url")):
+        if old in doc:
+            value = doc.pop(old)
+            if not doc.get(new):
+                doc[new] = value
+
+
+def _parse_timestamps(doc: Dict):
+    for field in ("created_at", "updated_at"):
+        value = doc.get(field)
+        if isinstance(value, str):
+            try:
+                parsed = datetime.fromisoformat(value)
+            except ValueError:
+                continue
+            # backend/ writes naive utcnow() strings
+            doc[field] = parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _drop_stored_id(doc: Dict):
+    if "_id" in doc and doc.get("id") == str(doc["_id"]):
+        del doc["id"]
+
+
+ALL_COLLECTIONS = ("note", "upload", "contributor", "settings", "subject", "college")
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "rename tags/thumbnail to chapters/thumbnail_url", ("note", "upload"), _rename_backend_fields),
+    Migration(2, "store created_at/updated_at as dates", ALL_COLLECTIONS, _parse_timestamps),
+    Migration(3, "drop stored id duplicating _id", ALL_COLLECTIONS, _drop_stored_id),
+]
+
+
+def target_version(collection: str) -> int:
+    return max((m.version for m in MIGRATIONS if collection in m.collections), default=0)
+
+
+def upgrade(collection: str, doc: Optional[Dict]) -> Optional[Dict]:
+    """Dual-read shim: present a document in the current shape, whatever it is stored as"""
+    if not doc:
+        return doc
+    version = doc.get(VERSION_FIELD) or 0
+    if version >= target_version(collection):
+        return doc
+    for m in MIGRATIONS:
+        if m.version > version and collection in m.collections:
+            m.apply(doc)
+    return doc
+
+
+def for_insert(collection: str, doc: Dict) -> Dict:
+    """Bring a document about to be inserted to the current shape and stamp its version"""
+    upgrade(collection, doc)
+    version = target_version(collection)
+    if version:
+        doc[VERSION_FIELD] = version
+    return doc
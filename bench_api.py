@@ -0,0 +1,206 @@
+"""
+Hermetic API Benchmark
+
+Starts the app in a subprocess against a seeded database, drives its public
+endpoints with bench_http.run and prints requests/second and latency per
+endpoint. With the in-memory backend (DATABASE_BACKEND=memory, see
+database.py) no mongod is needed; `--backend both` runs the same workload
+against the in-memory store and real Mongo so the two can be compared:
+
+    python bench_api.py                              # in-memory, root app
+    python bench_api.py --app backend -d 5
+    DATABASE_URL=mongodb://localhost:27017 python bench_api.py --backend both
+
+Real Mongo runs use a throwaway database (--mongo-db, default
+"notebuddy_bench") that is dropped and re-seeded on every run. Load shedding
+is disabled unless --shedding is given, so results show raw capacity.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+import bench_http
+from migrations import VERSION_FIELD, target_version
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SUBJECTS = ["Physics", "Chemistry", "Biology", "Mathematics", "English", "Nepali", "Accountancy", "Economics"]
+COLLEGES = ["LBA", "SXC", "GEMS", "Trinity", "Other"]
+
+ENDPOINTS = {
+    "root": [
+        "/api/notes",
+        "/api/notes?sort=likes&subject=Physics",
+        "/api/notes?q=chapter%201",
+        "/api/notes/{note_id}",
+        "/api/leaderboard",
+        "/api/settings",
+        "/api/suggest?q=ph",
+    ],
+    "backend": [
+        "/api/notes",
+        "/api/notes?subject=Physics",
+        "/api/notes/{note_id}",
+        "/api/leaderboard",
+        "/api/settings",
+    ],
+}
+
+
+def seed(db, notes: int = 2000, contributors: int = 200, uploads: int = 500, rng_seed: int = 7):
+    """Fill `db` (a pymongo or mongomock database) with a deterministic catalog.
+
+    Documents are in the current schema, so reads don't pay for upgrade().
+    """
+    rng = random.Random(rng_seed)
+    now = datetime.now(timezone.utc)
+    names = [f"Contributor {i}" for i in range(contributors)]
+    db["contributor"].insert_many(
+        [{"name": n, "points": rng.randint(0, 5000), "streak": rng.randint(0, 30), "badges": [],
+          "created_at": now, VERSION_FIELD: target_version("contributor")} for n in names]
+    )
+    db["note"].insert_many([
+        {
+            "title": f"{rng.choice(SUBJECTS)} chapter {rng.randint(1, 20)} notes {i}",
+            "class_level": rng.choice(["11", "12"]),
+            "college": rng.choice(COLLEGES),
+            "subject": rng.choice(SUBJECTS),
+            "chapters": [f"chapter {rng.randint(1, 20)}"],
+            "pages": rng.randint(1, 80),
+            "drive_link": f"https://drive.google.com/file/d/{i}",
+            "uploader_alias": rng.choice(names),
+            "likes": rng.randint(0, 500),
+            "downloads": rng.randint(0, 2000),
+            "language": "en",
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now - timedelta(minutes=i),
+            VERSION_FIELD: target_version("note"),
+        }
+        for i in range(notes)
+    ])
+    db["upload"].insert_many([
+        {
+            "title": f"Upload {i}",
+            "class_level": "12",
+            "college": rng.choice(COLLEGES),
+            "subject": rng.choice(SUBJECTS),
+            "drive_link": f"https://drive.google.com/file/d/u{i}",
+            "contributor_name": rng.choice(names),
+            "status": rng.choice(["pending", "accepted", "rejected"]),
+            "created_at": now - timedelta(hours=i),
+            VERSION_FIELD: target_version("upload"),
+        }
+        for i in range(uploads)
+    ])
+
+
+def serve(app: str, port: int, sizes: dict):
+    """Child process: seed the configured backend, then run uvicorn"""
+    app_dir = os.path.join(ROOT, "backend") if app == "backend" else ROOT
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+    import database
+
+    if app == "backend":
+        if database.DATABASE_BACKEND == "memory":
+            sync_db = database.get_db()._database
+        else:
+            from pymongo import MongoClient
+            sync_db = MongoClient(database.DATABASE_URL)[database.DATABASE_NAME]
+    else:
+        sync_db = database.db
+    sync_db.client.drop_database(sync_db.name)
+    seed(sync_db, **sizes)
+
+    import uvicorn
+    from main import app as asgi_app
+
+    uvicorn.run(asgi_app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(base: str, proc: subprocess.Popen, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            with urllib.request.urlopen(base + "/", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+def run_backend(backend: str, args) -> dict:
+    port = _free_port()
+    env = dict(os.environ, DATABASE_BACKEND=backend, PYTHONUNBUFFERED="1")
+    if backend == "mongo":
+        if not env.get("DATABASE_URL"):
+            raise SystemExit("DATABASE_URL is required for the mongo backend")
+        env["DATABASE_NAME"] = args.mongo_db
+    if not args.shedding:
+        env["LOAD_SHEDDING"] = "0"
+    sizes = {"notes": args.notes, "contributors": args.contributors, "uploads": args.uploads}
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", args.app, "--port", str(port), "--sizes", json.dumps(sizes)]
+    proc = subprocess.Popen(cmd, env=env)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base, proc)
+        with urllib.request.urlopen(base + "/api/notes?limit=1") as r:
+            note_id = json.load(r)["items"][0]["id"]
+        results = {}
+        for path in ENDPOINTS[args.app]:
+            results[path] = bench_http.run(base + path.format(note_id=note_id), args.concurrency, args.duration)
+        return results
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API against the in-memory store and/or MongoDB")
+    parser.add_argument("--app", choices=["root", "backend"], default="root")
+    parser.add_argument("--backend", choices=["memory", "mongo", "both"], default="memory")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-d", "--duration", type=float, default=3.0, help="seconds per endpoint")
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--contributors", type=int, default=200)
+    parser.add_argument("--uploads", type=int, default=500)
+    parser.add_argument("--mongo-db", default="notebuddy_bench", help="database to (re)create for mongo runs")
+    parser.add_argument("--shedding", action="store_true", help="keep adaptive load shedding on")
+    parser.add_argument("--serve", choices=["root", "backend"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--sizes", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, json.loads(args.sizes))
+        return
+
+    backends = ["memory", "mongo"] if args.backend == "both" else [args.backend]
+    results = {b: run_backend(b, args) for b in backends}
+    header = f"{'endpoint':<42}" + "".join(f"{b + ' rps':>14}{b + ' p99':>12}" for b in backends)
+    print(header)
+    for path in results[backends[0]]:
+        row = f"{path[:42]:<42}"
+        for b in backends:
+            r = results[b][path]
+            row += f"{r['rps']:>14}{r['p99_ms']:>12}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
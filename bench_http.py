@@ -0,0 +1,75 @@
+"""
+HTTP Throughput Benchmark
+
+Hammers a running server with keep-alive connections and reports requests
+per second and latency percentiles, e.g. to compare launch modes:
+
+    ./start_server.sh dev      # or: ./start_server.sh start
+    python bench_http.py http://127.0.0.1:8000/api/notes -c 32 -d 15
+"""
+
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def _client(url, deadline, latencies, errors):
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    local = []
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 500:
+                errors.append(resp.status)
+        except (OSError, http.client.HTTPException):
+            errors.append(-1)
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+            continue
+        local.append(time.perf_counter() - start)
+    conn.close()
+    latencies.extend(local)
+
+
+def run(url: str, concurrency: int = 16, duration: float = 10.0) -> dict:
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=_client, args=(url, deadline, latencies, errors)) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    n = len(latencies)
+    pct = lambda p: round(latencies[min(n - 1, int(n * p))] * 1000, 2) if n else None
+    return {
+        "requests": n,
+        "errors": len(errors),
+        "rps": round(n / duration, 1),
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if n else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep-alive HTTP load generator")
+    parser.add_argument("url")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    args = parser.parse_args()
+    print(run(args.url, args.concurrency, args.duration))
+
+
+if __name__ == "__main__":
+    main()
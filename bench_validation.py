@@ -0,0 +1,89 @@
+"""
+Validation Cost Benchmark
+
+Per-document cost of the ways a note can be turned into a model or response,
+comparing what the write and read paths used to do with the fast paths in
+validation.py:
+
+    python bench_validation.py -n 5000
+"""
+
+import argparse
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+import validation
+from schemas import Note, NoteOut
+
+
+def sample_docs(n: int):
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Physics chapter {i % 20} notes",
+            "class_level": "12",
+            "college": "LBA",
+            "subject": "Physics",
+            "chapters": [f"chapter {i % 20}", "waves"],
+            "pages": 12,
+            "drive_link": f"https://drive.google.com/file/d/{i}/view",
+            "uploader_alias": "Admin Upload",
+            "contributor_id": None,
+            "thumbnail_url": f"https://img.example.com/{i}.png",
+            "likes": i % 300,
+            "downloads": i % 900,
+            "trending_score": 1.5,
+            "trending_epoch": 1,
+            "language": "en",
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(n)
+    ]
+
+
+def _per_doc(fn, n: int, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-document validation cost, before and after")
+    parser.add_argument("-n", type=int, default=5000, help="documents per run")
+    args = parser.parse_args()
+    docs = sample_docs(args.n)
+    rows = [{k: v for k, v in d.items() if k in Note.model_fields} for d in docs]
+    notes = validation.validate_batch(Note, rows)[0]
+
+    def old_read():
+        for d in docs:
+            d = dict(d)
+            d["id"] = str(d.pop("_id"))
+
+    cases = [
+        ("write: Note(**row) per document (before)", lambda: [Note(**r) for r in rows]),
+        ("write: uncached TypeAdapter per document", lambda: [TypeAdapter(Note).validate_python(r) for r in rows]),
+        ("write: validation.validate (cached adapter)", lambda: [validation.validate(Note, r) for r in rows]),
+        ("write: validation.validate_batch (one call)", lambda: validation.validate_batch(Note, rows)),
+        ("write: to_document of a validated note", lambda: [validation.to_document(n) for n in notes]),
+        ("read: raw dict + id (before, untyped)", old_read),
+        ("read: NoteOut(**doc) validated", lambda: [NoteOut(**{**d, "id": str(d["_id"])}).model_dump() for d in docs]),
+        ("read: NoteOut.model_construct(**doc)", lambda: [NoteOut.model_construct(**d).model_dump(warnings=False) for d in docs]),
+        ("read: validation.present (trusted projection)", lambda: validation.present_many(NoteOut, docs)),
+    ]
+    width = max(len(name) for name, _ in cases)
+    print(f"{'path':<{width}}  us/doc")
+    for name, fn in cases:
+        print(f"{name:<{width}}  {_per_doc(fn, args.n):7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+In-process Caches
+
+Small thread-safe TTL caches for hot read paths (settings, leaderboard, note
+details). Entries are dropped by TTL or explicitly through the invalidation
+bus (see invalidation.py) when an admin write happens on any worker.
+
+`get_or_load` only stores what it loaded if no invalidation or clear
+happened while the loader ran; otherwise the value may predate the write that
+caused the invalidation, so it is returned but not cached.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl: float, maxsize: int = 1024):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._generation = 0
+
+    def get(self, key: Hashable = None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                self.misses += 1
+                return MISSING
+            self.hits += 1
+            return item[1]
+
+    def _store(self, key: Hashable, value: Any):
+        if len(self._data) >= self.maxsize and key not in self._data:
+            # Drop the entry closest to expiry
+            self._data.pop(min(self._data, key=lambda k: self._data[k][0]))
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]):
+        value = self.get(key)
+        if value is MISSING:
+            generation = self._generation
+            value = loader()
+            with self._lock:
+                if generation == self._generation:
+                    self._store(key, value)
+        return value
+
+    def invalidate(self, key: Hashable = None):
+        with self._lock:
+            self._data.pop(key, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+
+    def stats(self) -> Dict:
+        return {"name": self.name, "size": len(self._data), "hits": self.hits, "misses": self.misses}
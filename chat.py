@@ -0,0 +1,263 @@
+"""
+Chat Message Storage
+
+Room history is stored in "message_buckets": each bucket holds up to
+BUCKET_SIZE messages of one room (numbered by `seq`), and a new bucket also
+carries a copy of the last RECENT messages of the previous one, so the
+newest bucket alone always answers "last 50 messages" in one document read.
+Older history is paged with a keyset cursor ("<seq>:<skip>") walking back
+through buckets.
+
+Appending is one find_one_and_update on the open bucket. Room
+`last_activity` is not written per message: it is collected in memory and
+flushed periodically with one bulk `$max` update per batch of rooms.
+Recent messages of active rooms are cached in-process.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+import database
+from cache import MISSING, TTLCache
+
+logger = logging.getLogger("notebuddy.chat")
+
+BUCKETS = "message_buckets"
+ROOMS = "chat_rooms"
+BUCKET_SIZE = int(os.getenv("CHAT_BUCKET_SIZE", 200))
+RECENT = 50
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("CHAT_ACTIVITY_FLUSH_INTERVAL", 10))
+
+recent_cache = TTLCache("chat_recent", ttl=5, maxsize=2048)
+
+_activity: Dict[str, datetime] = {}
+_activity_lock = threading.Lock()
+_flusher: Optional[threading.Thread] = None
+_stop = threading.Event()
+_atexit_registered = False
+_indexed = False
+
+
+def ensure_indexes(db):
+    db[BUCKETS].create_index([("room_id", ASCENDING), ("seq", DESCENDING)], unique=True, name="room_seq")
+
+
+def _open_bucket(db, room_id: str, message: Dict) -> Optional[Dict]:
+    return db[BUCKETS].find_one_and_update(
+        {"room_id": room_id, "count": {"$lt": BUCKET_SIZE}},
+        {"$push": {"messages": message}, "$inc": {"count": 1}, "$set": {"last_at": message["created_at"]}},
+        sort=[("seq", DESCENDING)],
+        projection={"seq": 1, "count": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _start_bucket(db, room_id: str, message: Dict) -> Dict:
+    prev = db[BUCKETS].find_one({"room_id": room_id}, {"seq": 1, "messages": {"$slice": -RECENT}}, sort=[("seq", DESCENDING)])
+    bucket = {
+        "room_id": room_id,
+        "seq": prev["seq"] + 1 if prev else 0,
+        "carry": prev["messages"] if prev else [],
+        "messages": [message],
+        "count": 1,
+        "first_at": message["created_at"],
+        "last_at": message["created_at"],
+    }
+    db[BUCKETS].insert_one(bucket)
+    return bucket
+
+
+def _ensure_indexes_once(db):
+    global _indexed
+    if db is None:
+        raise RuntimeError("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    if not _indexed:
+        ensure_indexes(db)
+        _indexed = True
+
+
+def append_message(room_id: str, sender_id: str, content: str, message_type: str = "text") -> str:
+    """Store a message in the room's open bucket; returns the message id.
+
+    Raises RuntimeError when no database is configured.
+    """
+    db = database.db
+    _ensure_indexes_once(db)
+    now = datetime.now(timezone.utc)
+    message = {
+        "id": str(ObjectId()),
+        "sender_id": sender_id,
+        "content": content,
+        "type": message_type,  # text, image, file, system
+        "reactions": {},
+        "is_edited": False,
+        "is_deleted": False,
+        "created_at": now,
+    }
+    while True:
+        bucket = _open_bucket(db, room_id, message)
+        if bucket is not None:
+            break
+        try:
+            bucket = _start_bucket(db, room_id, message)
+            break
+        except DuplicateKeyError:
+            # Another writer opened the next bucket first; append to it
+            continue
+    _cache_append(room_id, bucket, message)
+    _touch_room(room_id, now)
+    return message["id"]
+
+
+def _cache_append(room_id: str, bucket: Dict, message: Dict):
+    cached = recent_cache.get(room_id)
+    if cached is MISSING:
+        return
+    if cached is None:
+        recent_cache.invalidate(room_id)
+    elif bucket["seq"] == cached["seq"] and bucket["count"] == cached["count"] + 1:
+        recent_cache.set(room_id, {"seq": cached["seq"], "count": bucket["count"], "tail": (cached["tail"] + [message])[-RECENT:]})
+    elif bucket["seq"] == cached["seq"] + 1 and bucket["count"] == 1:
+        recent_cache.set(room_id, {"seq": bucket["seq"], "count": 1, "tail": (cached["tail"] + [message])[-RECENT:]})
+    else:
+        # Another worker wrote in between; reload on next read
+        recent_cache.invalidate(room_id)
+
+
+def _cursor(seq: int, skip: int) -> Optional[str]:
+    # "<seq>:<k>" = continue with bucket `seq`, skipping its newest k messages
+    return f"{seq}:{skip}" if seq >= 0 else None
+
+
+def recent_messages(room_id: str, limit: int = RECENT) -> Dict:
+    """Newest `limit` (<= RECENT) messages, oldest first, from a single bucket read"""
+    db = database.db
+    if db is None:
+        return {"messages": [], "cursor": None}
+
+    def load():
+        b = db[BUCKETS].find_one(
+            {"room_id": room_id},
+            {"seq": 1, "count": 1, "carry": 1, "messages": {"$slice": -RECENT}},
+            sort=[("seq", DESCENDING)],
+        )
+        if not b:
+            return None
+        return {"seq": b["seq"], "count": b["count"], "tail": (b.get("carry", []) + b["messages"])[-RECENT:]}
+
+    page = recent_cache.get_or_load(room_id, load)
+    if page is None:
+        return {"messages": [], "cursor": None}
+    messages = page["tail"][-limit:]
+    n = len(messages)
+    if n <= page["count"]:
+        cursor = _cursor(page["seq"], n)
+    else:
+        cursor = _cursor(page["seq"] - 1, n - page["count"])
+    return {"messages": messages, "cursor": cursor}
+
+
+def older_messages(room_id: str, cursor: str, limit: int = RECENT) -> Dict:
+    """Messages before `cursor` (oldest first) and the cursor for the next page"""
+    db = database.db
+    if db is None:
+        return {"messages": [], "cursor": None}
+    seq, _, skip = cursor.partition(":")
+    seq, skip = int(seq), int(skip)
+    page: List[Dict] = []
+    while len(page) < limit and seq >= 0:
+        need = limit - len(page)
+        b = db[BUCKETS].find_one(
+            {"room_id": room_id, "seq": seq},
+            {"count": 1, "messages": {"$slice": -(skip + need)}},
+        )
+        if not b:
+            seq = -1
+            break
+        tail = b["messages"]
+        chunk = tail[: len(tail) - skip][-need:] if len(tail) > skip else []
+        page = chunk + page
+        if len(chunk) < need or skip + len(chunk) >= b["count"]:
+            seq, skip = seq - 1, 0
+        else:
+            skip += len(chunk)
+    return {"messages": page, "cursor": _cursor(seq, skip)}
+
+
+def _touch_room(room_id: str, at: datetime):
+    with _activity_lock:
+        prev = _activity.get(room_id)
+        if prev is None or at > prev:
+            _activity[room_id] = at
+        if _flusher is None or not _flusher.is_alive():
+            _start_flusher()
+
+
+def _start_flusher():
+    # Called with _activity_lock held. A flusher that was told to stop keeps
+    # its slot until it has exited, so only one ever runs.
+    global _flusher, _atexit_registered
+    _stop.clear()
+    _flusher = threading.Thread(target=_flush_loop, name="chat-activity", daemon=True)
+    _flusher.start()
+    if not _atexit_registered:
+        atexit.register(shutdown)
+        _atexit_registered = True
+
+
+def flush_room_activity() -> int:
+    """Write pending room last_activity values in one bulk_write"""
+    with _activity_lock:
+        pending = dict(_activity)
+        _activity.clear()
+    if not pending or database.db is None:
+        return 0
+    ops = [UpdateOne({"_id": ObjectId(rid)}, {"$max": {"last_activity": at}}) for rid, at in pending.items() if ObjectId.is_valid(rid)]
+    if ops:
+        try:
+            database.db[ROOMS].bulk_write(ops, ordered=False)
+        except Exception:
+            # Keep the values for the next flush; $max makes the retry safe
+            with _activity_lock:
+                for rid, at in pending.items():
+                    if rid not in _activity or at > _activity[rid]:
+                        _activity[rid] = at
+            raise
+    return len(ops)
+
+
+def _flush_loop():
+    while not _stop.wait(ACTIVITY_FLUSH_INTERVAL):
+        try:
+            flush_room_activity()
+        except Exception:
+            logger.exception("Flushing chat room activity failed")
+
+
+def shutdown(timeout: float = 5.0):
+    """Stop the activity flusher and write what it still holds (atexit, tests)"""
+    global _flusher
+    _stop.set()
+    with _activity_lock:
+        flusher = _flusher
+    if flusher is not None:
+        flusher.join(timeout)
+        if flusher.is_alive():
+            logger.warning("Chat activity flusher did not stop within %.1fs", timeout)
+    try:
+        flush_room_activity()
+    except Exception:
+        logger.exception("Final chat room activity flush failed")
+    with _activity_lock:
+        # A flusher still running keeps the stop flag (and its slot) until it exits
+        if _flusher is flusher and (flusher is None or not flusher.is_alive()):
+            _flusher = None
+            _stop.clear()
@@ -0,0 +1,195 @@
+"""
+Response Compression
+
+`CompressionMiddleware` negotiates br / zstd / gzip from Accept-Encoding and
+compresses JSON/text responses above a size threshold; bodies larger than
+OFFLOAD_BYTES are compressed in a worker thread so the event loop keeps
+serving. brotli and zstandard are optional: without them only gzip is
+offered.
+
+Cacheable endpoints (settings, leaderboard, first catalog pages) keep a
+`Payload` in their cache entry instead of a dict: the JSON bytes are
+serialized once and each encoding is produced on first use and stored next
+to them, so cache hits never re-serialize or re-compress.
+"""
+
+import gzip
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+import anyio
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from profiling import phase
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+OFFLOAD_BYTES = int(os.getenv("COMPRESSION_OFFLOAD_BYTES", 64 * 1024))
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def _gzip(data: bytes, high: bool) -> bytes:
+    return gzip.compress(data, compresslevel=9 if high else 6, mtime=0)
+
+
+def _brotli(data: bytes, high: bool) -> bytes:
+    return brotli.compress(data, quality=9 if high else 4)
+
+
+def _zstd(data: bytes, high: bool) -> bytes:
+    return zstandard.ZstdCompressor(level=19 if high else 3).compress(data)
+
+
+# Server preference order when the client accepts several equally
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS["br"] = _brotli
+if zstandard is not None:
+    ENCODERS["zstd"] = _zstd
+ENCODERS["gzip"] = _gzip
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported encoding from an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for name in ENCODERS:
+        q = accepted.get(name, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def _compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class Payload:
+    """Serialized JSON body plus lazily built, retained compressed variants"""
+
+    __slots__ = ("body", "encoded", "_lock")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def of(cls, content) -> "Payload":
+        # Same serialization as fastapi's JSONResponse
+        with phase("serialization"):
+            body = json.dumps(
+                jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+            ).encode("utf-8")
+        return cls(body)
+
+    def get(self, encoding: str) -> bytes:
+        data = self.encoded.get(encoding)
+        if data is None:
+            with self._lock:
+                data = self.encoded.get(encoding)
+                if data is None:
+                    with phase("compression"):
+                        data = ENCODERS[encoding](self.body, high=True)
+                    self.encoded[encoding] = data
+        return data
+
+    def response(self, accept_encoding: Optional[str]) -> Response:
+        headers = {"Vary": "Accept-Encoding"}
+        encoding = negotiate(accept_encoding) if len(self.body) >= MIN_SIZE else None
+        if encoding is None:
+            return Response(self.body, media_type="application/json", headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(self.get(encoding), media_type="application/json", headers=headers)
+
+
+class CompressionMiddleware:
+    """Compress single-message responses; streamed bodies pass through untouched"""
+
+    def __init__(self, app, minimum_size: int = MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = None
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def wrapped_send(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            headers = {k.lower(): v for k, v in start_message.get("headers", [])}
+            body = message.get("body", b"")
+            media_type = headers.get(b"content-type", b"").decode("latin-1")
+            if (
+                message.get("more_body", False)
+                or b"content-encoding" in headers
+                or len(body) < self.minimum_size
+                or not _compressible(media_type)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+            encoder = ENCODERS[encoding]
+            with phase("compression"):
+                if len(body) >= OFFLOAD_BYTES:
+                    compressed = await anyio.to_thread.run_sync(encoder, body, False)
+                else:
+                    compressed = encoder(body, False)
+            raw = [(k, v) for k, v in start_message.get("headers", []) if k.lower() not in (b"content-length", b"vary")]
+            vary = headers.get(b"vary")
+            raw += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"),
+            ]
+            passthrough = True
+            await send({**start_message, "headers": raw})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, wrapped_send)
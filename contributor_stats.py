@@ -0,0 +1,165 @@
+"""
+Contributor Stats
+
+Precomputed per-contributor stats stored in the "contributor_stats" collection
+(one document per contributor, keyed by the contributor's _id). The acceptance
+and like/download paths keep it up to date incrementally so the profile
+endpoint is a single lookup; `reconcile` recomputes everything from the
+source collections ("note", and "upload" plus "upload_archive" for the days
+of accepted uploads) and reports/fixes drift. Archived uploads expire by
+TTL, so a contributor with no accepted upload left in either collection has
+their streak left as stored rather than reset.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+
+from schemas import ContributorStats
+from upload_archive import ARCHIVE, UPLOADS
+
+COLLECTION = "contributor_stats"
+COUNTER_FIELDS = {"likes": "total_likes", "downloads": "total_downloads"}
+STAT_FIELDS = ("accepted_count", "total_likes", "total_downloads", "streak")
+
+
+def _oid(contributor_id) -> ObjectId:
+    return contributor_id if isinstance(contributor_id, ObjectId) else ObjectId(contributor_id)
+
+
+def streak_from_days(days: Iterable[date]) -> int:
+    """Length of the run of consecutive days ending at the most recent one"""
+    ordered = sorted(set(days), reverse=True)
+    if not ordered:
+        return 0
+    streak = 1
+    for prev, cur in zip(ordered, ordered[1:]):
+        if prev - cur != timedelta(days=1):
+            break
+        streak += 1
+    return streak
+
+
+def record_acceptance(db, contributor_id, name: str, when: Optional[datetime] = None):
+    """Count an accepted upload for a contributor and advance their streak.
+
+    The new streak is computed from the stored one inside a single pipeline
+    update, so concurrent acceptances never build on the same old value.
+    """
+    when = when or datetime.now(timezone.utc)
+    today = when.date().isoformat()
+    yesterday = (when.date() - timedelta(days=1)).isoformat()
+    streak = {"$ifNull": ["$streak", 0]}
+    d = db[COLLECTION].find_one_and_update(
+        {"_id": _oid(contributor_id)},
+        [{"$set": {
+            "accepted_count": {"$add": [{"$ifNull": ["$accepted_count", 0]}, 1]},
+            "streak": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": ["$last_accepted_on", today]}, "then": {"$max": [streak, 1]}},
+                    {"case": {"$eq": ["$last_accepted_on", yesterday]}, "then": {"$add": [streak, 1]}},
+                ],
+                "default": 1,
+            }},
+            "total_likes": {"$ifNull": ["$total_likes", 0]},
+            "total_downloads": {"$ifNull": ["$total_downloads", 0]},
+            "name": {"$literal": name},
+            "last_accepted_on": today,
+            "updated_at": when,
+        }}],
+        projection={"streak": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    # Mirror onto the contributor; within one day the streak only grows, so a
+    # late write of an older value can't lower it
+    db["contributor"].update_one(
+        {"_id": _oid(contributor_id)},
+        [{"$set": {
+            "streak": {"$cond": [{"$eq": ["$streak_on", today]}, {"$max": ["$streak", d["streak"]]}, d["streak"]]},
+            "streak_on": today,
+        }}],
+    )
+
+
+def record_counter(db, contributor_id: Optional[str], counter: str, delta: int = 1):
+    """Mirror a like/download on one of the contributor's notes"""
+    if not contributor_id:
+        return
+    db[COLLECTION].update_one(
+        {"_id": _oid(contributor_id)},
+        {"$inc": {COUNTER_FIELDS[counter]: delta}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+
+
+def get_stats(db, contributor_id) -> ContributorStats:
+    d = db[COLLECTION].find_one({"_id": _oid(contributor_id)}, {"_id": 0}) or {}
+    return ContributorStats(**d)
+
+
+def _actual_stats(db) -> Dict[str, Dict]:
+    actual: Dict[str, Dict] = {}
+    contributors = {d["name"]: str(d["_id"]) for d in db["contributor"].find({}, {"name": 1})}
+    for c_id in contributors.values():
+        actual[c_id] = {"accepted_count": 0, "total_likes": 0, "total_downloads": 0}
+
+    pipeline = [
+        {"$match": {"contributor_id": {"$ne": None}}},
+        {"$group": {
+            "_id": "$contributor_id",
+            "accepted_count": {"$sum": 1},
+            "total_likes": {"$sum": {"$ifNull": ["$likes", 0]}},
+            "total_downloads": {"$sum": {"$ifNull": ["$downloads", 0]}},
+        }},
+    ]
+    for row in db["note"].aggregate(pipeline):
+        c_id = str(row.pop("_id"))
+        if not ObjectId.is_valid(c_id):
+            continue
+        actual.setdefault(c_id, {}).update(row)
+
+    # Hot collection first: an upload archived in between is then found in
+    # the archive (it is copied there before it is deleted); keyed by _id so
+    # one seen in both counts once
+    accepted: Dict[ObjectId, Tuple[str, datetime]] = {}
+    filt = {"status": "accepted", "contributor_name": {"$in": list(contributors)}, "reviewed_at": {"$ne": None}}
+    for collection in (UPLOADS, ARCHIVE):
+        for up in db[collection].find(filt, {"contributor_name": 1, "reviewed_at": 1}):
+            accepted[up["_id"]] = (up["contributor_name"], up["reviewed_at"])
+    days: Dict[str, List[date]] = {}
+    for name, reviewed_at in accepted.values():
+        days.setdefault(contributors[name], []).append(reviewed_at.date())
+    # Contributors without day data keep no "streak" key: it is not reconciled
+    for c_id, c_days in days.items():
+        actual[c_id]["streak"] = streak_from_days(c_days)
+        actual[c_id]["last_accepted_on"] = max(c_days).isoformat()
+    return actual
+
+
+def reconcile(db, fix: bool = True) -> Dict:
+    """Recompute stats from the source collections and report (and optionally repair) drift"""
+    actual = _actual_stats(db)
+    stored = {str(d["_id"]): d for d in db[COLLECTION].find({})}
+    drift = []
+    ops = []
+    now = datetime.now(timezone.utc)
+    for c_id, values in actual.items():
+        current = stored.get(c_id, {})
+        fields = {
+            f: {"stored": current.get(f, 0), "actual": values[f]}
+            for f in STAT_FIELDS if f in values and current.get(f, 0) != values[f]
+        }
+        if not fields:
+            continue
+        drift.append({"contributor_id": c_id, "fields": fields})
+        if fix:
+            update = {f: values[f] for f in STAT_FIELDS if f in values} | {"updated_at": now}
+            if values.get("last_accepted_on"):
+                update["last_accepted_on"] = values["last_accepted_on"]
+            ops.append(UpdateOne({"_id": _oid(c_id)}, {"$set": update}, upsert=True))
+    if ops:
+        db[COLLECTION].bulk_write(ops, ordered=False)
+    return {"checked": len(actual), "drifted": len(drift), "fixed": fix, "drift": drift}
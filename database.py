@@ -5,13 +5,20 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from pymongo import MongoClient, InsertOne, UpdateOne, DeleteOne, ReturnDocument
+from bson import ObjectId
 from datetime import datetime, timezone
+import asyncio
+import functools
 import os
 from dotenv import load_dotenv
-from typing import Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 from pydantic import BaseModel
 
+import profiling
+from backend.load_shedding import db_listener
+from migrations import VERSION_FIELD, for_insert, target_version
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -20,36 +27,240 @@ db = None
 
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
+# "mongo" (default) or "memory": an in-process stand-in for tests and
+# benchmarks that needs no mongod (requires the mongomock package)
+database_backend = os.getenv("DATABASE_BACKEND", "mongo").lower()
+
+if database_backend == "memory":
+    import mongomock
 
-if database_url and database_name:
-    _client = MongoClient(database_url)
+    _client = mongomock.MongoClient()
+    db = _client[database_name or "notebuddy"]
+elif database_url and database_name:
+    # connect=False: don't open sockets at import, so a preloading server
+    # (gunicorn_conf.py) can fork workers before the client is used
+    _client = MongoClient(database_url, connect=False, event_listeners=[db_listener, profiling.db_listener])
     db = _client[database_name]
 
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
+def _require_db():
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    return db
 
+
+def _to_dict(data: Union[BaseModel, dict]) -> dict:
     # Convert Pydantic model to dict if needed
     if isinstance(data, BaseModel):
-        data_dict = data.model_dump()
-    else:
-        data_dict = data.copy()
+        # JSON mode so HttpUrl values are stored as plain strings
+        return data.model_dump(mode="json")
+    return data.copy()
+
+
+def _id_filter(filter_dict: Optional[dict]) -> dict:
+    """Allow filtering by string "id"/"_id" by mapping to an ObjectId _id"""
+    f = dict(filter_dict or {})
+    if "id" in f:
+        f["_id"] = f.pop("id")
+    if isinstance(f.get("_id"), str) and ObjectId.is_valid(f["_id"]):
+        f["_id"] = ObjectId(f["_id"])
+    return f
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
-    data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
+def _update_spec(update_data: Union[BaseModel, dict], now: datetime) -> dict:
+    """Plain fields become $set; operator documents ($inc, $push, ...) pass through"""
+    data = _to_dict(update_data)
+    if any(k.startswith("$") for k in data):
+        spec = dict(data)
+        spec["$set"] = {**spec.get("$set", {}), "updated_at": now}
+        return spec
+    return {"$set": {**data, "updated_at": now}}
+
+
+def _upsert_spec(collection_name: str, update_data: Union[BaseModel, dict], now: datetime) -> dict:
+    """_update_spec plus the fields a newly inserted document needs"""
+    spec = _update_spec(update_data, now)
+    on_insert = {"created_at": now, **spec.get("$setOnInsert", {})}
+    version = target_version(collection_name)
+    if version and VERSION_FIELD not in spec["$set"]:
+        on_insert[VERSION_FIELD] = version
+    spec["$setOnInsert"] = on_insert
+    return spec
+
+
+def _stamp(collection_name: str, data: Union[BaseModel, dict], now: datetime) -> dict:
+    data_dict = _to_dict(data)
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
+    return for_insert(collection_name, data_dict)
+
+
+def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp"""
+    result = _require_db()[collection_name].insert_one(_stamp(collection_name, data, datetime.now(timezone.utc)))
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+
+def create_documents(collection_name: str, items: Iterable[Union[BaseModel, dict]], ordered: bool = False) -> List[str]:
+    """Insert many documents in one round trip; returns their ids"""
+    now = datetime.now(timezone.utc)
+    docs = [_stamp(collection_name, d, now) for d in items]
+    if not docs:
+        return []
+    result = _require_db()[collection_name].insert_many(docs, ordered=ordered)
+    return [str(i) for i in result.inserted_ids]
+
+
+def get_document(collection_name: str, filter_dict: dict = None, projection: dict = None):
+    """Get a single document (or None)"""
+    return _require_db()[collection_name].find_one(_id_filter(filter_dict), projection)
+
+
+def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None,
+                  projection: dict = None, sort: list = None, skip: int = 0):
     """Get documents from collection"""
-    if db is None:
-        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-    
-    cursor = db[collection_name].find(filter_dict or {})
+    cursor = _require_db()[collection_name].find(_id_filter(filter_dict), projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if skip:
+        cursor = cursor.skip(skip)
     if limit:
         cursor = cursor.limit(limit)
-    
+
     return list(cursor)
+
+
+def count_documents(collection_name: str, filter_dict: dict = None) -> int:
+    return _require_db()[collection_name].count_documents(_id_filter(filter_dict))
+
+
+def update_document(collection_name: str, filter_dict: dict, update_data: Union[BaseModel, dict], upsert: bool = False) -> int:
+    """Update the first matching document; returns the number modified"""
+    now = datetime.now(timezone.utc)
+    spec = _upsert_spec(collection_name, update_data, now) if upsert else _update_spec(update_data, now)
+    result = _require_db()[collection_name].update_one(_id_filter(filter_dict), spec, upsert=upsert)
+    return result.modified_count
+
+
+def update_documents(collection_name: str, filter_dict: dict, update_data: Union[BaseModel, dict]) -> int:
+    """Update every matching document; returns the number modified"""
+    spec = _update_spec(update_data, datetime.now(timezone.utc))
+    return _require_db()[collection_name].update_many(_id_filter(filter_dict), spec).modified_count
+
+
+def upsert_document(collection_name: str, filter_dict: dict, data: Union[BaseModel, dict]) -> str:
+    """Update the matching document or insert it; returns its id"""
+    spec = _upsert_spec(collection_name, data, datetime.now(timezone.utc))
+    doc = _require_db()[collection_name].find_one_and_update(
+        _id_filter(filter_dict), spec, projection={"_id": 1}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return str(doc["_id"])
+
+
+def delete_document(collection_name: str, filter_dict: dict) -> int:
+    return _require_db()[collection_name].delete_one(_id_filter(filter_dict)).deleted_count
+
+
+def delete_documents(collection_name: str, filter_dict: dict) -> int:
+    return _require_db()[collection_name].delete_many(_id_filter(filter_dict)).deleted_count
+
+
+def bulk_update(collection_name: str, updates: Iterable[Tuple[dict, Union[BaseModel, dict]]], upsert: bool = False) -> int:
+    """Apply (filter, update) pairs in one unordered bulk_write; returns the number modified"""
+    now = datetime.now(timezone.utc)
+    make = functools.partial(_upsert_spec, collection_name) if upsert else _update_spec
+    ops = [UpdateOne(_id_filter(f), make(u, now), upsert=upsert) for f, u in updates]
+    if not ops:
+        return 0
+    return _require_db()[collection_name].bulk_write(ops, ordered=False).modified_count
+
+
+def bulk_delete(collection_name: str, filters: Iterable[dict]) -> int:
+    """Delete the first match of each filter in one unordered bulk_write"""
+    ops = [DeleteOne(_id_filter(f)) for f in filters]
+    if not ops:
+        return 0
+    return _require_db()[collection_name].bulk_write(ops, ordered=False).deleted_count
+
+
+class BatchWriter:
+    """Queue inserts/updates/deletes across collections and send them with bulk_write.
+
+    Ids for inserts are assigned client-side so callers get them immediately.
+    Use as a context manager to flush on exit:
+
+        with BatchWriter() as batch:
+            for name, email in people:
+                create_user(name, email, pw_hash, batch=batch)
+    """
+
+    def __init__(self, chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+        self._ops: Dict[str, list] = {}
+        self.counts = {"inserted": 0, "modified": 0, "upserted": 0, "deleted": 0}
+
+    def _queue(self, collection_name: str, op):
+        ops = self._ops.setdefault(collection_name, [])
+        ops.append(op)
+        if len(ops) >= self.chunk_size:
+            self._flush_collection(collection_name)
+
+    def insert(self, collection_name: str, data: Union[BaseModel, dict]) -> str:
+        doc = _stamp(collection_name, data, datetime.now(timezone.utc))
+        doc.setdefault("_id", ObjectId())
+        self._queue(collection_name, InsertOne(doc))
+        return str(doc["_id"])
+
+    def update(self, collection_name: str, filter_dict: dict, update_data: Union[BaseModel, dict], upsert: bool = False):
+        now = datetime.now(timezone.utc)
+        spec = _upsert_spec(collection_name, update_data, now) if upsert else _update_spec(update_data, now)
+        self._queue(collection_name, UpdateOne(_id_filter(filter_dict), spec, upsert=upsert))
+
+    def delete(self, collection_name: str, filter_dict: dict):
+        self._queue(collection_name, DeleteOne(_id_filter(filter_dict)))
+
+    def _flush_collection(self, collection_name: str):
+        ops = self._ops.pop(collection_name, [])
+        if not ops:
+            return
+        result = _require_db()[collection_name].bulk_write(ops, ordered=False)
+        self.counts["inserted"] += result.inserted_count
+        self.counts["modified"] += result.modified_count
+        self.counts["upserted"] += result.upserted_count
+        self.counts["deleted"] += result.deleted_count
+
+    def flush(self):
+        for collection_name in list(self._ops):
+            self._flush_collection(collection_name)
+        return self.counts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+
+# Async forms for use inside `async def` endpoints; each runs the sync helper
+# in a worker thread so the event loop is never blocked on the driver
+def _to_async(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    wrapper.__name__ = f"async_{fn.__name__}"
+    return wrapper
+
+
+async_create_document = _to_async(create_document)
+async_create_documents = _to_async(create_documents)
+async_get_document = _to_async(get_document)
+async_get_documents = _to_async(get_documents)
+async_count_documents = _to_async(count_documents)
+async_update_document = _to_async(update_document)
+async_update_documents = _to_async(update_documents)
+async_upsert_document = _to_async(upsert_document)
+async_delete_document = _to_async(delete_document)
+async_delete_documents = _to_async(delete_documents)
+async_bulk_update = _to_async(bulk_update)
+async_bulk_delete = _to_async(bulk_delete)
@@ -0,0 +1,99 @@
+"""
+Gunicorn Configuration (production launcher)
+
+Used by `start_server.sh start`. Runs the app in N uvicorn worker processes
+with uvloop and httptools, imports the app once in the master (preload) so
+workers fork with it already loaded, and supports graceful zero-downtime
+restarts (see `start_server.sh reload`). Each worker drops a marker in
+LOG_DIR/ready once its startup (including WARM_UP) has finished, so a reload
+can wait for the new generation before stopping the old one. Everything is
+driven by environment:
+
+    APP_DIR          directory holding main.py: "." (default) or "backend"
+    APP_MODULE       ASGI app to serve (default "main:app")
+    HOST / PORT      bind address (default 0.0.0.0:8000)
+    WEB_CONCURRENCY  worker count (default: usable CPU cores)
+    GRACEFUL_TIMEOUT seconds a worker gets to finish requests on restart
+    LOG_DIR          where the pid file and logs go (default "logs")
+    READY_TIMEOUT    seconds `reload` waits for new workers (default 120)
+"""
+
+import math
+import os
+
+try:
+    from uvicorn_worker import UvicornWorker
+except ImportError:
+    from uvicorn.workers import UvicornWorker
+
+
+def usable_cpus() -> int:
+    """CPUs this process may actually use: affinity mask capped by the cgroup quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+LOG_DIR = os.path.abspath(os.getenv("LOG_DIR", "logs"))
+READY_DIR = os.path.join(LOG_DIR, "ready")
+os.makedirs(READY_DIR, exist_ok=True)
+
+
+def ready_marker(master_pid: int, worker_pid: int) -> str:
+    return os.path.join(READY_DIR, f"{master_pid}.{worker_pid}")
+
+
+class FastUvicornWorker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+    _marked_ready = False
+
+    async def callback_notify(self):
+        await super().callback_notify()
+        # The server's first heartbeat comes right after lifespan startup
+        if not self._marked_ready:
+            self._marked_ready = True
+            open(ready_marker(self.ppid, self.pid), "w").close()
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def child_exit(server, worker):
+    _remove(ready_marker(server.pid, worker.pid))
+
+
+def on_exit(server):
+    for name in os.listdir(READY_DIR):
+        if name.startswith(f"{server.pid}."):
+            _remove(os.path.join(READY_DIR, name))
+
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+chdir = os.path.abspath(os.getenv("APP_DIR", "."))
+wsgi_app = os.getenv("APP_MODULE", "main:app")
+workers = int(os.getenv("WEB_CONCURRENCY", 0)) or usable_cpus()
+# gunicorn loads this file as the `__config__` module; older releases only take a dotted path
+worker_class = f"{__name__}.FastUvicornWorker"
+preload_app = True
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+keepalive = 5
+backlog = 2048
+pidfile = os.path.join(LOG_DIR, "gunicorn.pid")
+accesslog = os.getenv("ACCESS_LOG") or None
+errorlog = "-"
+raw_env = ["WARM_UP=1"]
+
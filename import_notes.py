@@ -0,0 +1,197 @@
+"""
+Bulk Note Importer
+
+Command-line importer for seeding the "note" collection, e.g. when onboarding
+a new college:
+
+    python import_notes.py notes.csv --set college=LBA --chunk-size 1000
+
+Rows are streamed from CSV or JSONL, validated in batches against the Note
+schema, de-duplicated on drive_link (within the file and against existing
+notes) and written with unordered bulk upserts. After every committed chunk
+the row offset is saved to a checkpoint file, so an interrupted run can be
+continued with --resume. Rows that fail validation are written to a
+`.rejects.jsonl` file next to the input.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+import validation
+from migrations import VERSION_FIELD, target_version
+from schemas import Note
+
+LIST_FIELDS = {"chapters"}
+LIST_SEPARATORS = (";", "|")
+# Maintained by the app; an import sets them on new notes only
+SERVER_FIELDS = {"likes", "downloads"}
+
+
+def read_rows(path: str) -> Iterator[Dict]:
+    """Yield raw rows from a .csv or .jsonl/.ndjson file"""
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield _clean_csv_row(row)
+
+
+def _clean_csv_row(row: Dict) -> Dict:
+    out = {}
+    for k, v in row.items():
+        if k is None:
+            continue
+        v = (v or "").strip()
+        if not v:
+            continue
+        if k in LIST_FIELDS:
+            sep = next((s for s in LIST_SEPARATORS if s in v), None)
+            v = [p.strip() for p in v.split(sep)] if sep else [v]
+        out[k] = v
+    return out
+
+
+def validate_batch(rows: List[Dict]) -> Tuple[List[Note], List[Tuple[int, Dict, str]]]:
+    """Validate a chunk in one call; returns (valid notes, [(index, row, error)])"""
+    return validation.validate_batch(Note, rows)
+
+
+def build_ops(notes: List[Note], seen: set, update_existing: bool) -> List[UpdateOne]:
+    now = datetime.now(timezone.utc)
+    version = target_version("note")
+    ops = []
+    for note in notes:
+        doc = note.model_dump(mode="json")
+        link = doc["drive_link"]
+        if link in seen:
+            continue
+        seen.add(link)
+        if update_existing:
+            # Only columns present in the file overwrite an existing note;
+            # schema defaults and counters are filled in on insert
+            given = {k: v for k, v in note.model_dump(mode="json", exclude_unset=True).items() if k not in SERVER_FIELDS}
+            on_insert = {k: v for k, v in doc.items() if k not in given}
+            update = {"$set": {**given, "updated_at": now}, "$setOnInsert": {**on_insert, "created_at": now, VERSION_FIELD: version}}
+        else:
+            update = {"$setOnInsert": {**doc, "created_at": now, "updated_at": now, VERSION_FIELD: version}}
+        ops.append(UpdateOne({"drive_link": link}, update, upsert=True))
+    return ops
+
+
+def _load_checkpoint(path: str) -> Dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_checkpoint(path: str, state: Dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def run_import(
+    db,
+    path: str,
+    chunk_size: int = 500,
+    defaults: Optional[Dict] = None,
+    update_existing: bool = False,
+    resume: bool = False,
+    checkpoint: Optional[str] = None,
+    out=sys.stderr,
+) -> Dict:
+    checkpoint = checkpoint or path + ".checkpoint"
+    rejects_path = path + ".rejects.jsonl"
+    state = _load_checkpoint(checkpoint) if resume else {}
+    skip = state.get("rows_done", 0)
+    totals = {k: state.get(k, 0) for k in ("inserted", "existing", "updated", "duplicates", "rejected")}
+    db["note"].create_index("drive_link", name="drive_link_1")
+    seen: set = set()
+    started = time.perf_counter()
+    rows_done = skip
+
+    def flush(chunk: List[Dict]):
+        nonlocal rows_done
+        notes, rejected = validate_batch(chunk)
+        if rejected:
+            with open(rejects_path, "a", encoding="utf-8") as f:
+                for i, row, error in rejected:
+                    f.write(json.dumps({"row": rows_done + i + 1, "error": error, "data": row}) + "\n")
+        ops = build_ops(notes, seen, update_existing)
+        if ops:
+            res = db["note"].bulk_write(ops, ordered=False)
+            totals["inserted"] += res.upserted_count
+            totals["updated"] += res.modified_count
+            totals["existing"] += res.matched_count - res.modified_count
+        totals["duplicates"] += len(notes) - len(ops)
+        totals["rejected"] += len(rejected)
+        rows_done += len(chunk)
+        _save_checkpoint(checkpoint, {"source": os.path.abspath(path), "rows_done": rows_done, **totals})
+        elapsed = time.perf_counter() - started
+        rate = (rows_done - skip) / elapsed if elapsed else 0.0
+        print(f"{rows_done} rows | {totals['inserted']} new, {totals['rejected']} rejected | {rate:,.0f} rows/s", file=out)
+
+    chunk: List[Dict] = []
+    for n, row in enumerate(read_rows(path)):
+        if n < skip:
+            continue
+        chunk.append({**(defaults or {}), **row})
+        if len(chunk) >= chunk_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    elapsed = time.perf_counter() - started
+    return {"rows": rows_done, "seconds": round(elapsed, 3), **totals}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk import notes from CSV or JSONL")
+    parser.add_argument("path", help="CSV or JSONL file")
+    parser.add_argument("--chunk-size", type=int, default=500, help="rows per validation/write batch")
+    parser.add_argument("--set", action="append", default=[], metavar="FIELD=VALUE", help="default for a missing column (repeatable)")
+    parser.add_argument("--update-existing", action="store_true", help="overwrite notes whose drive_link already exists")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint of a previous run")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <path>.checkpoint)")
+    args = parser.parse_args(argv)
+
+    from database import db
+    from invalidation import bus
+
+    if db is None:
+        parser.error("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    defaults = dict(item.split("=", 1) for item in args.set)
+    summary = run_import(
+        db,
+        args.path,
+        chunk_size=args.chunk_size,
+        defaults=defaults,
+        update_existing=args.update_existing,
+        resume=args.resume,
+        checkpoint=args.checkpoint,
+    )
+    if summary["inserted"] or summary["updated"]:
+        # Running API workers rebuild their catalog-derived indexes
+        bus.configure(db)
+        bus.publish("catalog")
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
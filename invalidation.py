@@ -0,0 +1,183 @@
+"""
+Cache Invalidation Bus
+
+Admin writes publish typed events ("settings", "leaderboard", "note", ...)
+into the "cache_event" collection. Every worker tails that collection and
+fans events out to the handlers registered for their type, so in-process
+caches stay consistent across uvicorn workers.
+
+Tailing uses a MongoDB change stream and resumes from the last seen resume
+token after errors. Standalone servers (local dev, tests) don't support
+change streams; there the bus falls back to polling for events by sequence
+number, numbers being allocated from the "cache_version" collection.
+
+A publisher reserves its number before inserting the event, so two
+concurrent publishers can insert out of order. The poller therefore tracks
+the highest number up to which it has seen every event (`last_seq`) and keeps
+re-querying above it, skipping events it already handled. A number that
+never shows up (its publisher died between the two writes) is given up on
+after GAP_TIMEOUT seconds.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger("notebuddy.invalidation")
+
+EVENTS = "cache_event"
+VERSIONS = "cache_version"
+EVENT_TTL = int(os.getenv("CACHE_EVENT_TTL", 24 * 3600))
+POLL_INTERVAL = float(os.getenv("CACHE_POLL_INTERVAL", 1.0))
+GAP_TIMEOUT = float(os.getenv("CACHE_GAP_TIMEOUT", 30.0))
+
+Handler = Callable[[Optional[str]], None]
+
+
+class InvalidationBus:
+    def __init__(self):
+        self.db = None
+        self.mode = None
+        self.last_seq = 0
+        self.resume_token = None
+        self._ahead: set = set()  # handled sequence numbers above last_seq
+        self._gap_since: Optional[float] = None
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, event_type: str, handler: Handler):
+        """Call handler(key) for every event of this type, local or remote"""
+        self._handlers.setdefault(event_type, []).append(handler)
+
+    def dispatch(self, event_type: str, key: Optional[str] = None):
+        for handler in self._handlers.get(event_type, []):
+            try:
+                handler(key)
+            except Exception:
+                logger.exception("Invalidation handler for %s failed", event_type)
+
+    def publish(self, event_type: str, key: Optional[str] = None):
+        """Invalidate locally right away, then broadcast to the other workers"""
+        self.dispatch(event_type, key)
+        if self.db is None:
+            return
+        try:
+            seq = self.db[VERSIONS].find_one_and_update(
+                {"_id": "events"}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+            )["seq"]
+            self.db[EVENTS].insert_one({
+                "seq": seq,
+                "type": event_type,
+                "key": key,
+                "pid": os.getpid(),
+                "created_at": datetime.now(timezone.utc),
+            })
+        except PyMongoError:
+            # Other workers fall back to cache TTLs
+            logger.exception("Failed to publish %s invalidation", event_type)
+
+    def _handle(self, event: Dict):
+        if event.get("pid") == os.getpid():
+            return
+        self.dispatch(event["type"], event.get("key"))
+
+    def configure(self, db):
+        """Publish through `db` without tailing it (CLI tools); `start` also tails"""
+        self.db = db
+
+    def start(self, db):
+        if self._thread is not None:
+            return
+        self.configure(db)
+        db[EVENTS].create_index([("seq", ASCENDING)], name="seq_asc")
+        db[EVENTS].create_index("created_at", expireAfterSeconds=EVENT_TTL, name="created_at_ttl")
+        latest = db[VERSIONS].find_one({"_id": "events"})
+        self.last_seq = latest["seq"] if latest else 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        if not hasattr(type(self.db[EVENTS]), "watch"):
+            # In-memory stand-in (DATABASE_BACKEND=memory) has no change streams
+            self._poll()
+            return
+        while not self._stop.is_set():
+            try:
+                self._tail_change_stream()
+            except (OperationFailure, NotImplementedError) as e:
+                # 40573: change streams need a replica set / sharded cluster
+                if not isinstance(e, OperationFailure) or e.code in (40573, 40324) or "replica set" in str(e):
+                    logger.info("Change streams unavailable, polling %s", EVENTS)
+                    self._poll()
+                    return
+                logger.warning("Change stream failed, resuming: %s", e)
+                self._stop.wait(POLL_INTERVAL)
+            except Exception as e:
+                logger.warning("Change stream failed, resuming: %s", e)
+                self._stop.wait(POLL_INTERVAL)
+
+    def _tail_change_stream(self):
+        self.mode = "change_stream"
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        with self.db[EVENTS].watch(pipeline, resume_after=self.resume_token) as stream:
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    event = change["fullDocument"]
+                    # Kept current so a fallback to polling resumes from here
+                    self.last_seq = max(self.last_seq, event.get("seq", 0))
+                    self._handle(event)
+                self.resume_token = stream.resume_token
+                if change is None:
+                    self._stop.wait(0.1)
+
+    def _poll(self):
+        self.mode = "polling"
+        while not self._stop.wait(POLL_INTERVAL):
+            try:
+                self.poll_once()
+            except PyMongoError as e:
+                logger.warning("Polling %s failed: %s", EVENTS, e)
+
+    def poll_once(self, now: Optional[float] = None):
+        for event in self.db[EVENTS].find({"seq": {"$gt": self.last_seq}}).sort("seq", ASCENDING):
+            seq = event.get("seq", 0)
+            if seq in self._ahead:
+                continue
+            self._ahead.add(seq)
+            self._handle(event)
+        self._advance(time.monotonic() if now is None else now)
+
+    def _advance(self, now: float):
+        start = self.last_seq
+        while self.last_seq + 1 in self._ahead:
+            self.last_seq += 1
+            self._ahead.discard(self.last_seq)
+        if not self._ahead or self.last_seq != start:
+            # No gap, or the oldest one closed: time the next from now
+            self._gap_since = None if not self._ahead else now
+        elif self._gap_since is None:
+            self._gap_since = now
+        elif now - self._gap_since >= GAP_TIMEOUT:
+            logger.warning("Giving up on invalidation events %d-%d", self.last_seq + 1, min(self._ahead) - 1)
+            self.last_seq = min(self._ahead) - 1
+            self._gap_since = None
+            self._advance(now)
+
+    def stats(self) -> Dict:
+        return {"mode": self.mode, "last_seq": self.last_seq, "pending_gap": len(self._ahead), "types": sorted(self._handlers)}
+
+
+bus = InvalidationBus()
@@ -0,0 +1,116 @@
+"""
+Background Jobs
+
+Tiny periodic job runner for maintenance tasks (stats reconciliation, score
+re-normalization, ...). Each job runs on its own daemon thread so it never
+blocks request handling, and a failing run is logged and retried on the next
+tick instead of killing the loop.
+
+Every server worker process starts the same jobs. Jobs that act on shared
+data are given a database for a lease: before each run the worker takes (or
+renews) the job's document in "job_lease" for one interval, and workers that
+find it held by another live process skip that tick, so each tick runs once
+across the deployment. If the holder dies its lease expires and another
+worker takes over.
+"""
+
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger("notebuddy.jobs")
+
+LEASES = "job_lease"
+
+_jobs: Dict[str, "PeriodicJob"] = {}
+
+
+def _owner() -> str:
+    # Evaluated per call: forked workers each get their own pid
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def acquire_lease(db, name: str, seconds: float, owner: Optional[str] = None) -> bool:
+    """Take or renew the named lease for `seconds`; False while another owner holds it"""
+    owner = owner or _owner()
+    now = datetime.now(timezone.utc)
+    try:
+        db[LEASES].find_one_and_update(
+            {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lte": now}}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=seconds), "renewed_at": now}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        # The lease exists and is held by someone else, so the upsert collided
+        return False
+
+
+class PeriodicJob:
+    def __init__(self, name: str, interval: float, fn: Callable[[], object], lease_db=None):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.lease_db = lease_db
+        self.last_result = None
+        self.last_error = None
+        self.skipped = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"job-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        try:
+            if self.lease_db is not None and not acquire_lease(self.lease_db, self.name, self.interval):
+                self.skipped += 1
+                return None
+            self.last_result = self.fn()
+            self.last_error = None
+            if self.lease_db is not None:
+                # Hold the lease for a full interval after a long run, too
+                acquire_lease(self.lease_db, self.name, self.interval)
+        except Exception as e:
+            self.last_error = str(e)
+            logger.exception("Job %s failed", self.name)
+        return self.last_result
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+
+def interval_from_env(var: str, default: float) -> float:
+    """Read a job interval in seconds; 0 or negative disables the job"""
+    try:
+        return float(os.getenv(var, default))
+    except ValueError:
+        return default
+
+
+def start_periodic(name: str, interval: float, fn: Callable[[], object], lease_db=None):
+    """Start a named job unless disabled (interval <= 0) or already running.
+
+    Pass `lease_db` for jobs that must run in only one worker per interval.
+    """
+    if interval <= 0 or name in _jobs:
+        return _jobs.get(name)
+    job = PeriodicJob(name, interval, fn, lease_db)
+    _jobs[name] = job
+    job.start()
+    return job
+
+
+def stop_all():
+    for job in _jobs.values():
+        job.stop()
+    _jobs.clear()
@@ -1,15 +1,41 @@
 import os
+import re
+from collections import Counter
+from datetime import datetime, timezone
 from typing import List, Optional
 from fastapi import FastAPI, Depends, HTTPException, Header, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse, Response
 from pydantic import BaseModel
 from bson import ObjectId
-
-from database import db, create_document, get_documents
+from pymongo import ReturnDocument, UpdateOne
+
+from database import db, create_document, create_documents, get_documents
+from cache import TTLCache
+from compression import CompressionMiddleware, Payload
+from invalidation import bus
+import contributor_stats
+import jobs
+from backend import load_shedding
+import migrations
+import notifications
+import profiling
+import read_model
+import suggest
+import upload_archive
+import validation
+import thumbnails
+import trending
 from schemas import Note as NoteSchema, Upload as UploadSchema, Contributor as ContributorSchema, Settings as SettingsSchema
+from schemas import ContributorAdminList, ContributorAdminOut, ContributorList, ContributorOut, ContributorProfile, NoteList, NoteOut, SettingsOut, UploadList, UploadOut
 
-app = FastAPI(title="NoteBuddy API", version="0.1.1")
+app = FastAPI(title="NoteBuddy API", version="0.1.1", default_response_class=profiling.TimedJSONResponse)
+# Before any route is declared: times FastAPI's request validation per request
+app.router.route_class = profiling.TimedRoute
 
+# Added first so it sits inside CORS: shed 503s still carry CORS headers
+app.add_middleware(load_shedding.LoadShedMiddleware, limiter=load_shedding.limiter)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -17,11 +43,71 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(profiling.RequestTimingMiddleware, log=profiling.slow_requests)
 
 ADMIN_USER = os.getenv("ADMIN_USER", "buddy")
 ADMIN_PASS = os.getenv("ADMIN_PASS", "buddy_mukesh123@")
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "admin-token")
 
+settings_cache = TTLCache("settings", ttl=300)
+leaderboard_cache = TTLCache("leaderboard", ttl=60)
+note_cache = TTLCache("note", ttl=30, maxsize=4096)
+# First pages of the catalog per filter/sort, stored as precompressed payloads
+catalog_cache = TTLCache("catalog", ttl=30, maxsize=512)
+CACHES = [settings_cache, leaderboard_cache, note_cache, catalog_cache]
+
+
+def _index_published_note(note_id: Optional[str]):
+    if db is not None and note_id:
+        d = db["note"].find_one({"_id": ObjectId(note_id)})
+        if d:
+            suggest.index.add_note(d)
+            if read_model.store.ready:
+                read_model.store.add_note(d)
+    if note_id:
+        note_cache.invalidate(note_id)
+    catalog_cache.clear()
+
+
+def _reload_catalog():
+    if db is None:
+        return
+    suggest.index.build(db)
+    if read_model.store.ready:
+        read_model.store.build(db)
+    note_cache.clear()
+    catalog_cache.clear()
+
+
+# Reload the read model before clearing so a refill can't cache stale data
+def _on_settings_changed(_):
+    if read_model.store.ready:
+        read_model.store.load_settings(db)
+    settings_cache.clear()
+
+
+def _on_leaderboard_changed(_):
+    if read_model.store.ready:
+        read_model.store.load_contributors(db)
+    leaderboard_cache.clear()
+
+
+# A note's counters and fields also show on the cached catalog pages
+def _on_note_changed(note_id: Optional[str]):
+    if note_id:
+        note_cache.invalidate(note_id)
+    else:
+        note_cache.clear()
+    catalog_cache.clear()
+
+
+bus.subscribe("settings", _on_settings_changed)
+bus.subscribe("leaderboard", _on_leaderboard_changed)
+bus.subscribe("note", _on_note_changed)
+bus.subscribe("note_published", _index_published_note)
+bus.subscribe("catalog", lambda _: _reload_catalog())
+
 
 class LoginRequest(BaseModel):
     username: str
@@ -33,6 +119,16 @@ class AcceptPayload(BaseModel):
     reviewer_note: Optional[str] = None
 
 
+class BulkAcceptItem(BaseModel):
+    upload_id: str
+    assigned_points: int
+    reviewer_note: Optional[str] = None
+
+
+class BulkAcceptPayload(BaseModel):
+    items: List[BulkAcceptItem]
+
+
 class RejectPayload(BaseModel):
     reason: str
 
@@ -43,6 +139,18 @@ class PointsAdjust(BaseModel):
     note: Optional[str] = None
 
 
+class MarkReadPayload(BaseModel):
+    user_id: str
+    ids: Optional[List[str]] = None
+
+
+class BroadcastPayload(BaseModel):
+    title: str
+    message: str
+    type: str = "info"
+    action_url: Optional[str] = None
+
+
 # Utilities
 
 def require_admin(authorization: Optional[str] = Header(None)):
@@ -54,6 +162,76 @@ def require_admin(authorization: Optional[str] = Header(None)):
     return True
 
 
+@app.on_event("startup")
+def start_jobs():
+    if db is None:
+        return
+    bus.start(db)
+    # Shared-data jobs take a lease so each tick runs in one worker only;
+    # the read model is per process and refreshes in every worker
+    jobs.start_periodic(
+        "contributor-stats-reconcile",
+        jobs.interval_from_env("STATS_RECONCILE_INTERVAL", 6 * 3600),
+        lambda: contributor_stats.reconcile(db),
+        lease_db=db,
+    )
+    trending.ensure_indexes(db)
+    notifications.ensure_indexes(db)
+    upload_archive.ensure_indexes(db)
+    jobs.start_periodic(
+        "upload-archive",
+        jobs.interval_from_env("UPLOAD_ARCHIVE_INTERVAL", 3600),
+        lambda: upload_archive.archive_stale(db),
+        lease_db=db,
+    )
+    suggest.index.build(db)
+    # Picks up likes/downloads counted by other workers
+    jobs.start_periodic(
+        "suggest-rebuild",
+        jobs.interval_from_env("SUGGEST_REBUILD_INTERVAL", 3600),
+        lambda: suggest.index.build(db),
+    )
+    jobs.start_periodic(
+        "trending-renormalize",
+        jobs.interval_from_env("TRENDING_RENORMALIZE_INTERVAL", 3600),
+        lambda: trending.renormalize(db),
+        lease_db=db,
+    )
+    if read_model.enabled:
+        read_model.store.build(db)
+        jobs.start_periodic(
+            "read-model-refresh",
+            jobs.interval_from_env("READ_MODEL_REFRESH_INTERVAL", 60),
+            lambda: read_model.store.build(db),
+        )
+
+
+def warm_up():
+    """Prime per-worker caches and lazy imports before the first real request.
+
+    Calls the plain loaders behind the endpoints, not the endpoints
+    themselves: their defaults are Query/Header markers that only FastAPI
+    resolves, and would otherwise end up in Mongo filters.
+    """
+    _settings_payload().response("br, gzip")
+    _leaderboard_payload(20).response("br, gzip")
+    _catalog_first_page(None, None, None, "new", 24).response("br, gzip")
+    validation.validate(NoteSchema, {"title": "warm", "class_level": "11", "college": "x", "subject": "x", "drive_link": "https://drive.google.com/"})
+
+
+@app.on_event("startup")
+def start_warm_up():
+    if os.getenv("WARM_UP") and db is not None:
+        warm_up()
+
+
+@app.on_event("shutdown")
+def stop_jobs():
+    jobs.stop_all()
+    bus.stop()
+    thumbnails.cache.shutdown()
+
+
 @app.get("/")
 def read_root():
     return {"message": "NoteBuddy API running"}
@@ -87,7 +265,7 @@ def test_database():
 
 # Public endpoints
 
-@app.get("/api/notes")
+@app.get("/api/notes", responses={200: {"model": NoteList}})
 def list_notes(
     q: Optional[str] = None,
     subject: Optional[str] = None,
@@ -96,10 +274,27 @@ def list_notes(
     sort: Optional[str] = "new",
     skip: int = 0,
     limit: int = 24,
+    accept_encoding: Optional[str] = Header(None),
 ):
     # Graceful fallback when DB is not configured
     if db is None:
         return {"items": [], "count": 0}
+    if not q and skip == 0:
+        return _catalog_first_page(subject, class_level, college, sort, limit).response(accept_encoding)
+    return _query_notes(q, subject, class_level, college, sort, skip, limit)
+
+
+def _catalog_first_page(subject, class_level, college, sort, limit) -> Payload:
+    key = (subject, class_level, college, sort, limit)
+    return catalog_cache.get_or_load(
+        key, lambda: Payload.of(_query_notes(None, subject, class_level, college, sort, 0, limit))
+    )
+
+
+def _query_notes(q, subject, class_level, college, sort, skip, limit):
+    if read_model.store.ready:
+        items = read_model.store.list_notes(q, subject, class_level, college, sort, skip, limit)
+        return {"items": items, "count": len(items)}
     filter_q = {}
     if subject:
         filter_q["subject"] = subject
@@ -108,34 +303,112 @@ def list_notes(
     if college:
         filter_q["college"] = college
     if q:
-        filter_q["title"] = {"$regex": q, "$options": "i"}
+        # Escaped: a user-supplied pattern could backtrack catastrophically
+        filter_q["title"] = {"$regex": re.escape(q), "$options": "i"}
 
     sort_spec = [("created_at", -1)]
     if sort == "likes":
         sort_spec = [("likes", -1)]
     elif sort == "downloads":
         sort_spec = [("downloads", -1)]
+    elif sort == "trending":
+        sort_spec = [("trending_score", -1)]
 
     cursor = db["note"].find(filter_q).sort(sort_spec).skip(skip).limit(limit)
-    items = []
-    for d in cursor:
-        d["id"] = str(d.pop("_id"))
-        items.append(d)
+    items = [validation.present(NoteOut, migrations.upgrade("note", d)) for d in cursor]
     return {"items": items, "count": len(items)}
 
 
-@app.get("/api/notes/{note_id}")
+@app.get("/api/suggest")
+def suggest_terms(q: str = "", limit: int = Query(8, ge=1, le=25)):
+    return {"items": suggest.index.search(q, limit)}
+
+
+@app.get("/api/notes/{note_id}", responses={200: {"model": NoteOut}})
 def get_note(note_id: str):
     if db is None:
         raise HTTPException(404, detail="Note not found")
-    try:
+    if read_model.store.ready:
+        d = read_model.store.get_note(note_id)
+        if d is not None:
+            return d
+
+    def load():
         d = db["note"].find_one({"_id": ObjectId(note_id)})
         if not d:
             raise HTTPException(404, detail="Note not found")
-        d["id"] = str(d.pop("_id"))
-        return d
+        return validation.present(NoteOut, migrations.upgrade("note", d))
+
+    try:
+        return note_cache.get_or_load(note_id, load)
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(400, detail="Invalid note id")
+
+
+@app.get("/api/notes/{note_id}/thumbnail")
+async def note_thumbnail(
+    note_id: str,
+    w: int = Query(320, ge=1, le=2000),
+    if_none_match: Optional[str] = Header(None),
+):
+    note = await run_in_threadpool(get_note, note_id)
+    url = note.get("thumbnail_url")
+    if not url:
+        raise HTTPException(404, detail="Note has no thumbnail")
+    for _ in range(3):
+        try:
+            path, media_type = await thumbnails.cache.get(str(url), thumbnails.nearest_width(w))
+            stat = os.stat(path)
+            break
+        except FileNotFoundError:
+            # Evicted between get() and here; the next get() renders it again
+            continue
+        except thumbnails.SourceError as e:
+            raise HTTPException(502, detail=f"Thumbnail unavailable: {e}")
+    else:
+        raise HTTPException(503, detail="Thumbnail cache is busy")
+    # The URL stays the same when a note's thumbnail changes, so it is not
+    # immutable; the ETag (content digest + variant) makes revalidation cheap
+    etag = f'"{os.path.basename(path)}"'
+    headers = {"Cache-Control": "public, max-age=3600", "ETag": etag}
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+
+
+def _bump_note_counter(note_id: str, counter: str):
+    if db is None:
+        raise HTTPException(503, detail="Database not configured")
+    try:
+        oid = ObjectId(note_id)
     except Exception:
         raise HTTPException(400, detail="Invalid note id")
+    d = db["note"].find_one_and_update(
+        {"_id": oid},
+        trending.counter_update(counter),
+        projection={counter: 1, "contributor_id": 1, "trending_score": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not d:
+        raise HTTPException(404, detail="Note not found")
+    contributor_stats.record_counter(db, d.get("contributor_id"), counter)
+    suggest.index.record_counter(note_id)
+    if read_model.store.ready:
+        read_model.store.record_counter(note_id, counter, d[counter], d.get("trending_score"))
+    bus.publish("note", note_id)
+    return {"ok": True, counter: d[counter]}
+
+
+@app.post("/api/notes/{note_id}/like")
+def like_note(note_id: str):
+    return _bump_note_counter(note_id, "likes")
+
+
+@app.post("/api/notes/{note_id}/download")
+def download_note(note_id: str):
+    return _bump_note_counter(note_id, "downloads")
 
 
 @app.post("/api/uploads")
@@ -143,22 +416,77 @@ def submit_upload(payload: UploadSchema):
     # Public submission goes to pending review queue
     if db is None:
         raise HTTPException(503, detail="Database not configured")
-    data = payload.dict()
+    data = validation.to_document(payload)
     data["status"] = data.get("status", "pending")
     new_id = create_document("upload", data)
     return {"ok": True, "id": new_id, "message": "Thanks — Notes received! Your Knowledge Points will be reviewed."}
 
 
-@app.get("/api/leaderboard")
-def leaderboard(limit: int = 20):
+@app.get("/api/leaderboard", responses={200: {"model": ContributorList}})
+def leaderboard(limit: int = 20, accept_encoding: Optional[str] = Header(None)):
     if db is None:
         return {"items": []}
-    cursor = db["contributor"].find({}).sort([("points", -1)]).limit(limit)
-    items = []
-    for d in cursor:
-        d["id"] = str(d.pop("_id"))
-        items.append(d)
-    return {"items": items}
+    return _leaderboard_payload(limit).response(accept_encoding)
+
+
+def _leaderboard_payload(limit: int) -> Payload:
+    def load():
+        if read_model.store.ready:
+            return Payload.of({"items": read_model.store.leaderboard(limit)})
+        cursor = db["contributor"].find({}).sort([("points", -1)]).limit(limit)
+        return Payload.of({"items": validation.present_many(ContributorOut, cursor)})
+
+    return leaderboard_cache.get_or_load(limit, load)
+
+
+@app.get("/api/contributors/{contributor_id}", responses={200: {"model": ContributorProfile}})
+def contributor_profile(contributor_id: str):
+    if db is None:
+        raise HTTPException(404, detail="Contributor not found")
+    try:
+        oid = ObjectId(contributor_id)
+    except Exception:
+        raise HTTPException(400, detail="Invalid contributor id")
+    c = db["contributor"].find_one({"_id": oid})
+    if not c:
+        raise HTTPException(404, detail="Contributor not found")
+    c["stats"] = contributor_stats.get_stats(db, oid)
+    return validation.present(ContributorProfile, c)
+
+
+# There is no end-user login yet, so user_id is caller-supplied; inboxes are
+# admin-only until requests carry a verified user identity
+@app.get("/api/notifications")
+def list_notifications(
+    user_id: str,
+    unread_only: bool = False,
+    before: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    _: bool = Depends(require_admin),
+):
+    if db is None:
+        return {"items": [], "next": None, "unread": 0}
+    try:
+        return notifications.inbox(db, user_id, unread_only=unread_only, before=before, limit=limit)
+    except ValueError:
+        raise HTTPException(400, detail="Invalid cursor")
+
+
+@app.get("/api/notifications/unread-count")
+def unread_notifications(user_id: str, _: bool = Depends(require_admin)):
+    if db is None:
+        return {"unread": 0}
+    return {"unread": notifications.unread_count(db, user_id)}
+
+
+@app.post("/api/notifications/read")
+def mark_notifications_read(body: MarkReadPayload, _: bool = Depends(require_admin)):
+    if db is None:
+        raise HTTPException(503, detail="Database not configured")
+    try:
+        return {"ok": True, "updated": notifications.mark_read(db, body.user_id, body.ids)}
+    except ValueError:
+        raise HTTPException(400, detail="Invalid notification id")
 
 
 # Admin endpoints
@@ -170,7 +498,7 @@ def admin_login(body: LoginRequest):
     raise HTTPException(status_code=401, detail="Invalid credentials")
 
 
-@app.get("/api/admin/uploads")
+@app.get("/api/admin/uploads", responses={200: {"model": UploadList}})
 def admin_list_uploads(status: Optional[str] = None, _: bool = Depends(require_admin)):
     if db is None:
         raise HTTPException(503, detail="Database not configured")
@@ -178,11 +506,105 @@ def admin_list_uploads(status: Optional[str] = None, _: bool = Depends(require_a
     if status:
         q["status"] = status
     cursor = db["upload"].find(q).sort([("created_at", -1)])
-    items = []
-    for d in cursor:
-        d["id"] = str(d.pop("_id"))
-        items.append(d)
-    return {"items": items}
+    return {"items": [validation.present(UploadOut, migrations.upgrade("upload", d)) for d in cursor]}
+
+
+@app.get("/api/admin/uploads/archive")
+def admin_search_archive(
+    status: Optional[str] = None,
+    contributor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    _: bool = Depends(require_admin),
+):
+    if db is None:
+        raise HTTPException(503, detail="Database not configured")
+    items = upload_archive.search_archive(db, status, contributor, skip, limit)
+    return {"items": items, "count": len(items)}
+
+
+@app.post("/api/admin/uploads/archive")
+def admin_run_archive(days: Optional[float] = None, _: bool = Depends(require_admin)):
+    if db is None:
+        raise HTTPException(503, detail="Database not configured")
+    result = upload_archive.archive_stale(db, days if days is not None else upload_archive.ARCHIVE_AFTER_DAYS)
+    return {**result, **upload_archive.stats(db)}
+
+
+def _note_data(up: dict, contributor_id: Optional[ObjectId]) -> dict:
+    """Fields of the Note created from an accepted upload"""
+    return {
+        "title": up.get("title"),
+        "class_level": up.get("class_level"),
+        "college": up.get("college"),
+        "subject": up.get("subject"),
+        "chapters": up.get("chapters", []),
+        "pages": up.get("pages"),
+        "drive_link": up.get("drive_link"),
+        "uploader_alias": up.get("contributor_name") or "Admin Upload",
+        "contributor_id": str(contributor_id) if contributor_id else None,
+        "thumbnail_url": up.get("thumbnail_url"),
+        "likes": 0,
+        "downloads": 0,
+        "language": "en"
+    }
+
+
+@app.post("/api/admin/uploads/accept")
+def bulk_accept_uploads(body: BulkAcceptPayload, _: bool = Depends(require_admin)):
+    if db is None:
+        raise HTTPException(503, detail="Database not configured")
+    wanted, errors = {}, []
+    for item in body.items:
+        if ObjectId.is_valid(item.upload_id):
+            wanted[ObjectId(item.upload_id)] = item
+        else:
+            errors.append({"upload_id": item.upload_id, "error": "Invalid upload id"})
+    uploads = [
+        migrations.upgrade("upload", u)
+        for u in db["upload"].find({"_id": {"$in": list(wanted)}, "status": {"$ne": "accepted"}})
+    ]
+    found = {u["_id"] for u in uploads}
+    errors += [{"upload_id": str(oid), "error": "Upload not found or already accepted"} for oid in wanted if oid not in found]
+    names = list({u["contributor_name"] for u in uploads if u.get("contributor_name")})
+    contributors = {c["name"]: c["_id"] for c in db["contributor"].find({"name": {"$in": names}}, {"name": 1})} if names else {}
+
+    # One validation call for the whole batch; bad rows are reported, not fatal
+    notes, rejected = validation.validate_batch(
+        NoteSchema, [_note_data(u, contributors.get(u.get("contributor_name"))) for u in uploads]
+    )
+    errors += [{"upload_id": str(uploads[i]["_id"]), "error": msg} for i, _, msg in rejected]
+    bad = {i for i, _, _ in rejected}
+    uploads = [u for i, u in enumerate(uploads) if i not in bad]
+    if not uploads:
+        return {"accepted": [], "errors": errors}
+
+    note_ids = create_documents("note", notes)
+    reviewed_at = datetime.now(timezone.utc)
+    db["upload"].bulk_write([
+        UpdateOne({"_id": u["_id"]}, {"$set": {
+            "status": "accepted",
+            "assigned_points": wanted[u["_id"]].assigned_points,
+            "reviewer_note": wanted[u["_id"]].reviewer_note,
+            "reviewed_at": reviewed_at,
+        }})
+        for u in uploads
+    ], ordered=False)
+    points = Counter()
+    for u in uploads:
+        cid = contributors.get(u.get("contributor_name"))
+        if cid:
+            points[cid] += wanted[u["_id"]].assigned_points
+            contributor_stats.record_acceptance(db, cid, u["contributor_name"], reviewed_at)
+    if points:
+        db["contributor"].bulk_write([UpdateOne({"_id": cid}, {"$inc": {"points": n}}) for cid, n in points.items()], ordered=False)
+        bus.publish("leaderboard")
+    for note_id in note_ids:
+        bus.publish("note_published", note_id)
+    return {
+        "accepted": [{"upload_id": str(u["_id"]), "note_id": nid} for u, nid in zip(uploads, note_ids)],
+        "errors": errors,
+    }
 
 
 @app.post("/api/admin/uploads/{upload_id}/accept")
@@ -190,36 +612,22 @@ def accept_upload(upload_id: str, body: AcceptPayload, _: bool = Depends(require
     if db is None:
         raise HTTPException(503, detail="Database not configured")
     try:
-        up = db["upload"].find_one({"_id": ObjectId(upload_id)})
+        up = migrations.upgrade("upload", db["upload"].find_one({"_id": ObjectId(upload_id)}))
         if not up:
             raise HTTPException(404, detail="Upload not found")
-        # Create Note from Upload
-        note_data = {
-            "title": up.get("title"),
-            "class_level": up.get("class_level"),
-            "college": up.get("college"),
-            "subject": up.get("subject"),
-            "chapters": up.get("chapters", []),
-            "pages": up.get("pages"),
-            "drive_link": up.get("drive_link"),
-            "uploader_alias": up.get("contributor_name") or "Admin Upload",
-            "contributor_id": None,
-            "thumbnail_url": up.get("thumbnail_url"),
-            "likes": 0,
-            "downloads": 0,
-            "language": "en"
-        }
-        # validate
-        NoteSchema(**note_data)
-        new_note_id = create_document("note", note_data)
-        # Update upload
-        db["upload"].update_one({"_id": ObjectId(upload_id)}, {"$set": {"status": "accepted", "assigned_points": body.assigned_points, "reviewer_note": body.reviewer_note}})
-        # Award points if contributor exists by name
         name = up.get("contributor_name")
-        if name:
-            c = db["contributor"].find_one({"name": name})
-            if c:
-                db["contributor"].update_one({"_id": c["_id"]}, {"$inc": {"points": body.assigned_points}})
+        c = db["contributor"].find_one({"name": name}, {"_id": 1}) if name else None
+        note = validation.validate(NoteSchema, _note_data(up, c["_id"] if c else None))
+        new_note_id = create_document("note", note)
+        # Update upload
+        reviewed_at = datetime.now(timezone.utc)
+        db["upload"].update_one({"_id": ObjectId(upload_id)}, {"$set": {"status": "accepted", "assigned_points": body.assigned_points, "reviewer_note": body.reviewer_note, "reviewed_at": reviewed_at}})
+        # Award points and update stats if contributor exists by name
+        if c:
+            db["contributor"].update_one({"_id": c["_id"]}, {"$inc": {"points": body.assigned_points}})
+            contributor_stats.record_acceptance(db, c["_id"], name, reviewed_at)
+            bus.publish("leaderboard")
+        bus.publish("note_published", new_note_id)
         return {"ok": True, "note_id": new_note_id}
     except HTTPException:
         raise
@@ -232,22 +640,18 @@ def reject_upload(upload_id: str, body: RejectPayload, _: bool = Depends(require
     if db is None:
         raise HTTPException(503, detail="Database not configured")
     try:
-        db["upload"].update_one({"_id": ObjectId(upload_id)}, {"$set": {"status": "rejected", "reviewer_note": body.reason}})
+        db["upload"].update_one({"_id": ObjectId(upload_id)}, {"$set": {"status": "rejected", "reviewer_note": body.reason, "reviewed_at": datetime.now(timezone.utc)}})
         return {"ok": True}
     except Exception as e:
         raise HTTPException(400, detail=f"Error rejecting upload: {str(e)}")
 
 
-@app.get("/api/admin/contributors")
+@app.get("/api/admin/contributors", responses={200: {"model": ContributorAdminList}})
 def list_contributors(_: bool = Depends(require_admin)):
     if db is None:
         raise HTTPException(503, detail="Database not configured")
     cursor = db["contributor"].find({}).sort([("points", -1)])
-    items = []
-    for d in cursor:
-        d["id"] = str(d.pop("_id"))
-        items.append(d)
-    return {"items": items}
+    return {"items": validation.present_many(ContributorAdminOut, cursor)}
 
 
 @app.post("/api/admin/contributors")
@@ -256,9 +660,11 @@ def upsert_contributor(c: ContributorSchema, _: bool = Depends(require_admin)):
         raise HTTPException(503, detail="Database not configured")
     existing = db["contributor"].find_one({"name": c.name})
     if existing:
-        db["contributor"].update_one({"_id": existing["_id"]}, {"$set": c.dict()})
+        db["contributor"].update_one({"_id": existing["_id"]}, {"$set": validation.to_document(c)})
+        bus.publish("leaderboard")
         return {"id": str(existing["_id"]) }
     new_id = create_document("contributor", c)
+    bus.publish("leaderboard")
     return {"id": new_id}
 
 
@@ -268,24 +674,40 @@ def adjust_points(body: PointsAdjust, _: bool = Depends(require_admin)):
         raise HTTPException(503, detail="Database not configured")
     try:
         db["contributor"].update_one({"_id": ObjectId(body.contributor_id)}, {"$inc": {"points": body.delta}})
+        bus.publish("leaderboard")
         return {"ok": True}
     except Exception:
         raise HTTPException(400, detail="Invalid contributor id")
 
 
-@app.get("/api/settings")
-def get_settings():
+@app.post("/api/admin/contributors/stats/reconcile")
+def reconcile_contributor_stats(fix: bool = True, _: bool = Depends(require_admin)):
+    if db is None:
+        raise HTTPException(503, detail="Database not configured")
+    return contributor_stats.reconcile(db, fix=fix)
+
+
+@app.get("/api/settings", responses={200: {"model": SettingsOut}})
+def get_settings(accept_encoding: Optional[str] = Header(None)):
     if db is None:
         # Return built-in defaults when DB missing
         default = SettingsSchema()
         return default.dict()
-    s = db["settings"].find_one({})
-    if not s:
-        default = SettingsSchema()
-        sid = create_document("settings", default)
-        s = db["settings"].find_one({"_id": ObjectId(sid)})
-    s["id"] = str(s.pop("_id"))
-    return s
+    return _settings_payload().response(accept_encoding)
+
+
+def _settings_payload() -> Payload:
+    def load():
+        if read_model.store.ready and read_model.store.settings is not None:
+            return Payload.of(read_model.store.settings)
+        s = db["settings"].find_one({})
+        if not s:
+            default = SettingsSchema()
+            sid = create_document("settings", default)
+            s = db["settings"].find_one({"_id": ObjectId(sid)})
+        return Payload.of(validation.present(SettingsOut, s))
+
+    return settings_cache.get_or_load(None, load)
 
 
 @app.put("/api/admin/settings")
@@ -293,13 +715,79 @@ def update_settings(body: SettingsSchema, _: bool = Depends(require_admin)):
     if db is None:
         raise HTTPException(503, detail="Database not configured")
     s = db["settings"].find_one({})
+    previous = set((s or {}).get("featured_contributor_ids") or [])
+    newly_featured = [cid for cid in body.featured_contributor_ids if cid not in previous]
+    if newly_featured:
+        notifications.fanout.enqueue(
+            newly_featured,
+            "You're featured!",
+            "Your notes are now featured on the NoteBuddy home page.",
+            type="success",
+        )
     if not s:
         sid = create_document("settings", body)
+        bus.publish("settings")
         return {"id": sid}
-    db["settings"].update_one({"_id": s["_id"]}, {"$set": body.dict()})
+    db["settings"].update_one({"_id": s["_id"]}, {"$set": validation.to_document(body)})
+    bus.publish("settings")
     return {"id": str(s["_id"]) }
 
 
+@app.post("/api/admin/notifications/broadcast")
+def broadcast_notification(body: BroadcastPayload, _: bool = Depends(require_admin)):
+    if db is None:
+        raise HTTPException(503, detail="Database not configured")
+    user_ids = [str(d["_id"]) for d in db["contributor"].find({}, {"_id": 1})]
+    notifications.fanout.enqueue(user_ids, body.title, body.message, type=body.type, action_url=body.action_url)
+    return {"ok": True, "queued": len(user_ids)}
+
+
+@app.get("/api/admin/migrations")
+def migration_status(_: bool = Depends(require_admin)):
+    return {"items": migrations.status(db) if db is not None else []}
+
+
+@app.post("/api/admin/profile")
+async def profile(
+    seconds: float = Query(10, gt=0, le=profiling.MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=100),
+    include_idle: bool = False,
+    _: bool = Depends(require_admin),
+):
+    try:
+        counts = await run_in_threadpool(profiling.profiler.run, seconds, interval_ms / 1000, include_idle)
+    except profiling.ProfilerBusy:
+        raise HTTPException(409, detail="A profile is already running")
+    return PlainTextResponse(profiling.collapse(counts))
+
+
+@app.get("/api/admin/slow-requests")
+def slow_requests(limit: int = Query(50, ge=1, le=1000), _: bool = Depends(require_admin)):
+    log = profiling.slow_requests
+    return {"threshold_ms": log.threshold_ms, "seen": log.seen, "items": log.recent(limit)}
+
+
+@app.delete("/api/admin/slow-requests")
+def clear_slow_requests(_: bool = Depends(require_admin)):
+    profiling.slow_requests.clear()
+    return {"ok": True}
+
+
+@app.get("/api/admin/limiter")
+def limiter_status(_: bool = Depends(require_admin)):
+    return load_shedding.limiter.stats()
+
+
+@app.get("/api/admin/cache")
+def cache_status(_: bool = Depends(require_admin)):
+    return {
+        "caches": [c.stats() for c in CACHES + [notifications.unread_cache]],
+        "invalidation": bus.stats(),
+        "notification_fanout": notifications.fanout.stats(),
+        "read_model": read_model.store.stats(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
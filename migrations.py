@@ -0,0 +1,202 @@
+"""
+Online Schema Migrations
+
+The root app and backend/ store the same collections in different shapes:
+`chapters`/`thumbnail_url` versus `tags`/`thumbnail`, `created_at` as a BSON
+date versus an ISO string, and `_id` only versus an extra stored `id`. The
+canonical shape is the one in schemas.py. Each document records the shape it
+is in as `schema_version` (missing = 0), and MIGRATIONS lists the numbered
+steps that bring it up to date. The steps, `upgrade()` and `for_insert()`
+live in backend/schema_versions.py so backend/ can be deployed on its own;
+they are re-exported here.
+
+`MigrationRunner` rewrites a collection while the app keeps serving: it walks
+outdated documents in `_id` order, applies every pending step in Python and
+writes the result with unordered `bulk_write` batches. Each update is guarded
+by the old values of the fields it touches, so a document changed in the
+meantime is left alone and picked up by the next pass. Batches are throttled
+to a docs/second budget and back off while the runner's own batch latency
+(the `find` and `bulk_write` of each batch, tracked against its no-load
+baseline) is elevated. Progress is checkpointed in the
+"migration_state" collection, so an interrupted run resumes where it stopped.
+
+Until a collection is fully migrated, readers pass documents through
+`upgrade()`, which applies the same steps in memory (dual read). Every
+writer in both apps inserts documents through `for_insert()`, so new
+documents are already in the current shape and never need migrating.
+
+    python migrations.py status
+    python migrations.py run --collection note --batch-size 500 --rate 2000
+"""
+
+import argparse
+import copy
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from backend import load_shedding
+from backend.schema_versions import ALL_COLLECTIONS, VERSION_FIELD, for_insert, target_version, upgrade
+
+STATE_COLLECTION = "migration_state"
+
+
+def plan_update(collection: str, doc: Dict) -> UpdateOne:
+    """Compare-and-set update bringing one stored document to the target version"""
+    new = upgrade(collection, copy.deepcopy(doc))
+    set_fields = {k: v for k, v in new.items() if k not in doc or doc[k] != v}
+    unset_fields = {k: "" for k in doc if k not in new}
+    guard = {"_id": doc["_id"], VERSION_FIELD: doc.get(VERSION_FIELD)}
+    for k in list(set_fields) + list(unset_fields):
+        guard[k] = doc[k] if k in doc else {"$exists": False}
+    set_fields[VERSION_FIELD] = target_version(collection)
+    update = {"$set": set_fields}
+    if unset_fields:
+        update["$unset"] = unset_fields
+    return UpdateOne(guard, update)
+
+
+def _outdated(collection: str) -> Dict:
+    return {VERSION_FIELD: {"$not": {"$gte": target_version(collection)}}}
+
+
+class MigrationRunner:
+    def __init__(self, db, collection: str, batch_size: int = 500, rate: Optional[float] = None,
+                 max_backoff: float = 5.0, max_passes: int = 3, report: Optional[Callable[[Dict], None]] = None):
+        self.db = db
+        self.collection = collection
+        self.batch_size = batch_size
+        self.rate = rate
+        self.max_backoff = max_backoff
+        self.max_passes = max_passes
+        self.report = report
+        self.target = target_version(collection)
+        # The runner is a CLI, so the request-scoped latency in
+        # load_shedding.limiter never sees its commands; it tracks its own
+        self.latency = load_shedding.LatencyTracker()
+
+    def _load_state(self, restart: bool) -> Dict:
+        state = self.db[STATE_COLLECTION].find_one({"_id": self.collection})
+        if restart or not state or state.get("version") != self.target or state.get("finished_at"):
+            state = {
+                "_id": self.collection,
+                "version": self.target,
+                "last_id": None,
+                "pass": 1,
+                "pass_conflicts": 0,
+                "migrated": 0,
+                "conflicts": 0,
+                "batches": 0,
+                "started_at": datetime.now(timezone.utc),
+                "finished_at": None,
+            }
+        state["remaining"] = self.db[self.collection].count_documents(_outdated(self.collection))
+        return state
+
+    def _save_state(self, state: Dict):
+        state["updated_at"] = datetime.now(timezone.utc)
+        self.db[STATE_COLLECTION].replace_one({"_id": self.collection}, state, upsert=True)
+
+    def _throttle(self, count: int, elapsed: float, backoff: float) -> float:
+        delay = max(0.0, count / self.rate - elapsed) if self.rate else 0.0
+        if self.latency.ratio > load_shedding.TOLERANCE:
+            backoff = min(self.max_backoff, backoff * 2 if backoff else 0.1)
+        else:
+            backoff = 0.0
+        if delay + backoff:
+            time.sleep(delay + backoff)
+        return backoff
+
+    def run(self, restart: bool = False) -> Dict:
+        coll = self.db[self.collection]
+        state = self._load_state(restart)
+        session_start, session_docs, backoff = time.perf_counter(), 0, 0.0
+        while True:
+            query = _outdated(self.collection)
+            if state["last_id"] is not None:
+                query["_id"] = {"$gt": state["last_id"]}
+            started = time.perf_counter()
+            batch = list(coll.find(query).sort("_id", 1).limit(self.batch_size))
+            if not batch:
+                # Documents skipped on conflict are retried from the start
+                if state["pass_conflicts"] and state["pass"] < self.max_passes:
+                    state.update({"last_id": None, "pass": state["pass"] + 1, "pass_conflicts": 0})
+                    continue
+                state["finished_at"] = datetime.now(timezone.utc)
+                state["remaining"] = coll.count_documents(_outdated(self.collection))
+                self._save_state(state)
+                break
+            result = coll.bulk_write([plan_update(self.collection, d) for d in batch], ordered=False)
+            self.latency.observe(time.perf_counter() - started)
+            conflicts = len(batch) - result.matched_count
+            state["migrated"] += result.matched_count
+            state["conflicts"] += conflicts
+            state["pass_conflicts"] += conflicts
+            state["remaining"] = max(0, state["remaining"] - result.matched_count)
+            state["batches"] += 1
+            state["last_id"] = batch[-1]["_id"]
+            session_docs += len(batch)
+            state["docs_per_sec"] = round(session_docs / (time.perf_counter() - session_start), 1)
+            self._save_state(state)
+            if self.report:
+                self.report(state)
+            backoff = self._throttle(len(batch), time.perf_counter() - started, backoff)
+        return state
+
+
+def status(db) -> List[Dict]:
+    """Per-collection progress: checkpoint state plus a live count of outdated documents"""
+    states = {s["_id"]: s for s in db[STATE_COLLECTION].find({})}
+    out = []
+    for name in ALL_COLLECTIONS:
+        s = states.get(name, {})
+        out.append({
+            "collection": name,
+            "target_version": target_version(name),
+            "outdated": db[name].count_documents(_outdated(name)),
+            "migrated": s.get("migrated", 0),
+            "conflicts": s.get("conflicts", 0),
+            "docs_per_sec": s.get("docs_per_sec"),
+            "started_at": s.get("started_at"),
+            "updated_at": s.get("updated_at"),
+            "finished_at": s.get("finished_at"),
+        })
+    return out
+
+
+def _print_progress(state: Dict):
+    rate = state.get("docs_per_sec") or 0
+    eta = f"{state['remaining'] / rate:.0f}s" if rate else "?"
+    print(f"{state['_id']}: pass {state['pass']} migrated={state['migrated']} conflicts={state['conflicts']} "
+          f"remaining={state['remaining']} {rate} docs/s eta {eta}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Migrate stored documents to the current schema")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="show per-collection progress")
+    run = sub.add_parser("run", help="migrate outdated documents")
+    run.add_argument("--collection", action="append", choices=ALL_COLLECTIONS, help="limit to a collection (repeatable)")
+    run.add_argument("--batch-size", type=int, default=500, help="documents per bulk_write")
+    run.add_argument("--rate", type=float, help="max documents per second")
+    run.add_argument("--restart", action="store_true", help="ignore saved checkpoints")
+    args = parser.parse_args(argv)
+
+    from database import db
+
+    if db is None:
+        parser.error("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    if args.command == "status":
+        for row in status(db):
+            print(row)
+        return
+    for name in args.collection or ALL_COLLECTIONS:
+        runner = MigrationRunner(db, name, batch_size=args.batch_size, rate=args.rate, report=_print_progress)
+        state = runner.run(restart=args.restart)
+        print(f"{name}: done, migrated={state['migrated']} conflicts={state['conflicts']} outdated={state['remaining']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Notification Fan-out
+
+`fanout.enqueue(user_ids, ...)` hands a notification to a background worker
+that writes one document per recipient with chunked insert_many calls, so
+notifying every contributor costs a handful of round trips instead of N.
+Per-user unread counts live in the "notification_counter" collection
+(updated with one bulk `$inc` per chunk) and are cached in-process, so the
+unread badge never scans "notifications". Inboxes are read with keyset
+pagination over the (user_id, is_read, created_at) index.
+"""
+
+import logging
+import os
+import queue
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+import database
+from cache import TTLCache
+
+logger = logging.getLogger("notebuddy.notifications")
+
+NOTIFICATIONS = "notifications"
+COUNTERS = "notification_counter"
+CHUNK_SIZE = int(os.getenv("NOTIFICATION_CHUNK_SIZE", 500))
+
+unread_cache = TTLCache("notification_unread", ttl=30, maxsize=10_000)
+
+
+def ensure_indexes(db):
+    db[NOTIFICATIONS].create_index(
+        [("user_id", ASCENDING), ("is_read", ASCENDING), ("created_at", DESCENDING)],
+        name="inbox",
+    )
+
+
+def _notification(user_id: str, title: str, message: str, type: str, action_url: Optional[str], metadata: Dict, now: datetime) -> Dict:
+    return {
+        "user_id": user_id,
+        "title": title,
+        "message": message,
+        "type": type,  # info, success, warning, error
+        "is_read": False,
+        "action_url": action_url,
+        "metadata": metadata,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def _bump_unread(db, deltas: Counter):
+    ops = [UpdateOne({"_id": uid}, {"$inc": {"unread": n}}, upsert=True) for uid, n in deltas.items() if n]
+    if ops:
+        db[COUNTERS].bulk_write(ops, ordered=False)
+    for uid in deltas:
+        unread_cache.invalidate(uid)
+
+
+def deliver(db, user_ids: Iterable[str], title: str, message: str, type: str = "info",
+            action_url: Optional[str] = None, metadata: Optional[Dict] = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """Write the notification for every recipient in chunks; returns the number written"""
+    now = datetime.now(timezone.utc)
+    written = 0
+    chunk: List[Dict] = []
+
+    def flush():
+        nonlocal written
+        try:
+            db[NOTIFICATIONS].insert_many(chunk, ordered=False)
+        except BulkWriteError as e:
+            # Count the documents that did go in before giving up
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            stored = [d for i, d in enumerate(chunk) if i not in failed]
+            _bump_unread(db, Counter(d["user_id"] for d in stored))
+            written += len(stored)
+            raise
+        _bump_unread(db, Counter(d["user_id"] for d in chunk))
+        written += len(chunk)
+        chunk.clear()
+
+    for uid in user_ids:
+        chunk.append(_notification(uid, title, message, type, action_url, metadata or {}, now))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return written
+
+
+class FanoutWorker:
+    def __init__(self):
+        self.delivered = 0
+        self.failed = 0
+        self._queue: "queue.Queue[Dict]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, user_ids: Iterable[str], title: str, message: str, type: str = "info",
+                action_url: Optional[str] = None, metadata: Optional[Dict] = None):
+        """Queue a notification for delivery; returns immediately"""
+        self._queue.put({
+            "user_ids": list(user_ids), "title": title, "message": message,
+            "type": type, "action_url": action_url, "metadata": metadata,
+        })
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="notification-fanout", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                db = database.db
+                if db is not None:
+                    self.delivered += deliver(db, **job)
+            except PyMongoError:
+                self.failed += len(job["user_ids"])
+                logger.exception("Notification fan-out to %d users failed", len(job["user_ids"]))
+                try:
+                    # The outcome of the failed chunk is unknown; recount
+                    reconcile_unread(db, job["user_ids"])
+                except PyMongoError:
+                    logger.exception("Unread counters for %d users not reconciled", len(job["user_ids"]))
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Block until every queued job has been written (tests, shutdown)"""
+        self._queue.join()
+
+    def stats(self) -> Dict:
+        return {"queued": self._queue.qsize(), "delivered": self.delivered, "failed": self.failed}
+
+
+def unread_count(db, user_id: str) -> int:
+    def load():
+        d = db[COUNTERS].find_one({"_id": user_id})
+        return max(d.get("unread", 0), 0) if d else 0
+
+    return unread_cache.get_or_load(user_id, load)
+
+
+def reconcile_unread(db, user_ids: Iterable[str]) -> Dict[str, int]:
+    """Reset the unread counters of `user_ids` to a fresh count of their unread notifications.
+
+    A repair path for fan-outs that failed with an unknown outcome; an $inc
+    landing between the count and the write is lost, so it isn't a hot path.
+    """
+    user_ids = list(set(user_ids))
+    counts = {uid: 0 for uid in user_ids}
+    for row in db[NOTIFICATIONS].aggregate([
+        {"$match": {"user_id": {"$in": user_ids}, "is_read": False}},
+        {"$group": {"_id": "$user_id", "n": {"$sum": 1}}},
+    ]):
+        counts[row["_id"]] = row["n"]
+    ops = [UpdateOne({"_id": uid}, {"$set": {"unread": n}}, upsert=True) for uid, n in counts.items()]
+    if ops:
+        db[COUNTERS].bulk_write(ops, ordered=False)
+    for uid in user_ids:
+        unread_cache.invalidate(uid)
+    return counts
+
+
+def _object_id(value: str) -> ObjectId:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise ValueError(f"invalid id: {value!r}")
+
+
+def parse_cursor(before: str):
+    """`next` from an inbox page -> (created_at, _id); ValueError if malformed"""
+    ts, _, oid = before.partition("_")
+    return datetime.fromisoformat(ts), _object_id(oid)
+
+
+def inbox(db, user_id: str, unread_only: bool = False, before: Optional[str] = None, limit: int = 20) -> Dict:
+    """One page of a user's notifications, newest first; pass `next` back as `before`"""
+    filt: Dict = {"user_id": user_id, "is_read": False if unread_only else {"$in": [False, True]}}
+    if before:
+        cursor_at, oid = parse_cursor(before)
+        filt["$or"] = [
+            {"created_at": {"$lt": cursor_at}},
+            {"created_at": cursor_at, "_id": {"$lt": oid}},
+        ]
+    cursor = db[NOTIFICATIONS].find(filt).sort([("created_at", DESCENDING), ("_id", DESCENDING)]).limit(limit)
+    items = []
+    for d in cursor:
+        d["id"] = str(d.pop("_id"))
+        items.append(d)
+    next_cursor = f"{items[-1]['created_at'].isoformat()}_{items[-1]['id']}" if len(items) == limit else None
+    return {"items": items, "next": next_cursor, "unread": unread_count(db, user_id)}
+
+
+def mark_read(db, user_id: str, ids: Optional[List[str]] = None) -> int:
+    """Mark some (or all) of a user's notifications read and adjust the counter.
+
+    Raises ValueError for a malformed id.
+    """
+    filt: Dict = {"user_id": user_id, "is_read": False}
+    if ids:
+        filt["_id"] = {"$in": [_object_id(i) for i in ids]}
+    modified = db[NOTIFICATIONS].update_many(filt, {"$set": {"is_read": True, "updated_at": datetime.now(timezone.utc)}}).modified_count
+    # Decrement rather than reset, so a fan-out $inc racing this isn't lost
+    if modified:
+        _bump_unread(db, Counter({user_id: -modified}))
+    return modified
+
+
+fanout = FanoutWorker()
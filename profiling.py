@@ -0,0 +1,286 @@
+"""
+Profiling
+
+Two tools for finding where request time goes:
+
+* `profiler.run(seconds)` samples the Python stacks of every thread in this
+  worker process at a fixed interval and returns counts per collapsed stack
+  ("root;caller;callee count" lines from `collapse`), the input format of
+  flamegraph.pl and speedscope. It is exposed to admins at
+  POST /api/admin/profile; under gunicorn it profiles whichever worker
+  receives that request.
+
+* `RequestTimingMiddleware` times every request and splits the time into
+  phases: MongoDB commands (reported by `db_listener`, a pymongo command
+  listener), Pydantic validation, JSON serialization and compression (code
+  wraps those in `phase("validation")`, `phase("serialization")`, ...), and
+  FastAPI's own body/parameter parsing and validation up to the endpoint
+  call ("request_validation", recorded by `TimedRoute`; for sync endpoints
+  it includes the hand-off to the threadpool), with the remainder as "other".
+  Requests slower than SLOW_REQUEST_MS are kept, with their breakdown, in a
+  ring buffer of the last SLOW_REQUEST_BUFFER entries.
+"""
+
+import contextvars
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 500))
+SLOW_REQUEST_BUFFER = int(os.getenv("SLOW_REQUEST_BUFFER", 200))
+MAX_PROFILE_SECONDS = 60
+
+# Leaf frames of threads that are parked rather than working: function name
+# -> stdlib files it must come from, so app code named `get` or `wait` is kept
+_IDLE_FRAMES = {
+    "wait": ("threading.py",),
+    "_wait_for_tstate_lock": ("threading.py",),
+    "select": ("selectors.py",),
+    "accept": ("socket.py",),
+    "_worker": (os.path.join("concurrent", "futures", "thread.py"),),
+    "run_forever": (os.path.join("asyncio", "base_events.py"),),
+}
+
+
+def _is_idle(code) -> bool:
+    files = _IDLE_FRAMES.get(code.co_name)
+    return files is not None and code.co_filename.endswith(files)
+
+
+class ProfilerBusy(Exception):
+    """A profiling run is already in progress"""
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def run(self, seconds: float, interval: float = 0.005, include_idle: bool = False) -> Counter:
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            me = threading.get_ident()
+            counts: Counter = Counter()
+            deadline = time.monotonic() + min(seconds, MAX_PROFILE_SECONDS)
+            while time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for tid, frame in sys._current_frames().items():
+                    if tid == me:
+                        continue
+                    if not include_idle and _is_idle(frame.f_code):
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    stack.append(names.get(tid, str(tid)))
+                    counts[";".join(reversed(stack))] += 1
+                time.sleep(interval)
+            return counts
+        finally:
+            self._lock.release()
+
+
+def collapse(counts: Counter) -> str:
+    return "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+
+
+# -- per-request phase timing ----------------------------------------------
+
+class RequestTiming:
+    __slots__ = ("phases", "db_calls", "_handler_start", "_phases_at_start")
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.db_calls = 0
+        self._handler_start: Optional[float] = None
+        self._phases_at_start = 0.0
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def start_request_validation(self):
+        self._handler_start = time.perf_counter()
+        self._phases_at_start = sum(self.phases.values())
+
+    def end_request_validation(self):
+        if self._handler_start is None:
+            return
+        elapsed = time.perf_counter() - self._handler_start
+        # Phases recorded meanwhile (e.g. db calls in dependencies) keep their own bucket
+        nested = sum(self.phases.values()) - self._phases_at_start
+        self._handler_start = None
+        self.add("request_validation", max(0.0, elapsed - nested))
+
+
+_current: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar("request_timing", default=None)
+
+
+@contextmanager
+def phase(name: str):
+    """Attribute the enclosed block's time to `name` in the current request's breakdown"""
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+
+
+class DbTimingListener(monitoring.CommandListener):
+    # pymongo calls listeners on the thread that ran the command, which runs
+    # in the request's context (threadpool calls copy contextvars)
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        timing = _current.get()
+        if timing is not None:
+            timing.add("db", event.duration_micros / 1e6)
+            timing.db_calls += 1
+
+
+def _end_request_validation():
+    timing = _current.get()
+    if timing is not None:
+        timing.end_request_validation()
+
+
+def _mark_entry(call):
+    # Keeps the endpoint's sync/async kind, which FastAPI checks
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def entered(*args, **kwargs):
+            _end_request_validation()
+            return await call(*args, **kwargs)
+    else:
+        @functools.wraps(call)
+        def entered(*args, **kwargs):
+            _end_request_validation()
+            return call(*args, **kwargs)
+    entered._timed = True
+    return entered
+
+
+class TimedRoute(APIRoute):
+    """APIRoute that times FastAPI's request parsing and validation.
+
+    The clock starts when the route handler is entered and stops when the
+    endpoint is called (or when validation fails with a 422). Install with
+    `app.router.route_class = TimedRoute` before routes are declared.
+    """
+
+    def get_route_handler(self):
+        if not getattr(self.dependant.call, "_timed", False):
+            self.dependant.call = _mark_entry(self.dependant.call)
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timing = _current.get()
+            if timing is None:
+                return await handler(request)
+            timing.start_request_validation()
+            try:
+                return await handler(request)
+            except RequestValidationError:
+                timing.end_request_validation()
+                raise
+
+        return timed_handler
+
+
+class TimedJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        with phase("serialization"):
+            return super().render(content)
+
+
+class SlowRequestLog:
+    def __init__(self, threshold_ms: float = SLOW_REQUEST_MS, size: int = SLOW_REQUEST_BUFFER):
+        self.threshold_ms = threshold_ms
+        self.entries: deque = deque(maxlen=size)
+        self.seen = 0
+
+    def record(self, entry: Dict):
+        self.seen += 1
+        self.entries.append(entry)
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict]:
+        items = list(self.entries)[::-1]
+        return items[:limit] if limit else items
+
+    def clear(self):
+        self.entries.clear()
+
+
+class RequestTimingMiddleware:
+    def __init__(self, app, log: SlowRequestLog):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = RequestTiming()
+        token = _current.set(timing)
+        status = 500
+
+        async def wrapped_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, wrapped_send)
+        finally:
+            _current.reset(token)
+            total = time.perf_counter() - start
+            if total * 1000 >= self.log.threshold_ms:
+                phases = {f"{k}_ms": round(v * 1000, 2) for k, v in timing.phases.items()}
+                phases["other_ms"] = round(max(0.0, total - sum(timing.phases.values())) * 1000, 2)
+                route = scope.get("route")
+                self.log.record({
+                    "at": datetime.now(timezone.utc).isoformat(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "query": scope.get("query_string", b"").decode("latin-1"),
+                    "status": status,
+                    "total_ms": round(total * 1000, 2),
+                    "db_calls": timing.db_calls,
+                    "phases": phases,
+                })
+
+
+profiler = SamplingProfiler()
+slow_requests = SlowRequestLog()
+db_listener = DbTimingListener()
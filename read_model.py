@@ -0,0 +1,233 @@
+"""
+Public Catalog Read Model
+
+Optional (READ_MODEL=1) in-process snapshot that serves the public read
+endpoints (list_notes, get_note, leaderboard, settings) from memory, with
+MongoDB remaining the source of truth.
+
+Published notes are held column-wise: the documents themselves plus compact
+`array` columns for the sortable counters, hash indexes from
+subject/class_level/college to row numbers, and precomputed row orders for
+every `sort` mode. A new note produces a copy of the snapshot with the row
+inserted into each index and order by binary search (no re-sort), which is
+swapped in, so readers never see a half-built index; like/download counters
+are patched in place and re-sorted on the next refresh. Title search is a
+case-insensitive substring match, never a user-supplied regex. The model is
+built at startup, updated from admin writes through the invalidation bus
+(see invalidation.py) and fully refreshed on a timer to pick up like/download
+counters written by other workers.
+"""
+
+import os
+import threading
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from migrations import upgrade
+from schemas import ContributorOut, NoteOut, SettingsOut
+from validation import present
+
+enabled = os.getenv("READ_MODEL", "").lower() in ("1", "true", "yes")
+
+INDEXED_FIELDS = ("subject", "class_level", "college")
+_EPOCH = datetime.min
+
+
+class NoteSnapshot:
+    def __init__(self, docs: Iterable[Dict]):
+        self.docs: List[Dict] = list(docs)
+        self.by_id: Dict[str, int] = {d["id"]: i for i, d in enumerate(self.docs)}
+        self.likes = array("q", (int(d.get("likes") or 0) for d in self.docs))
+        self.downloads = array("q", (int(d.get("downloads") or 0) for d in self.docs))
+        self.trending = array("d", (float(d.get("trending_score") or 0.0) for d in self.docs))
+        self.titles: List[str] = [_title(d) for d in self.docs]
+        self.index: Dict[str, Dict[str, array]] = {}
+        for field in INDEXED_FIELDS:
+            buckets: Dict[str, array] = {}
+            for i, d in enumerate(self.docs):
+                value = d.get(field)
+                if value is not None:
+                    buckets.setdefault(value, array("I")).append(i)
+            self.index[field] = buckets
+        rows = range(len(self.docs))
+        created = [d.get("created_at") or _EPOCH for d in self.docs]
+        # Stable sorts of the reversed row list keep later inserts first on ties
+        self.orders = {
+            "new": array("I", sorted(reversed(rows), key=lambda i: _sortable(created[i]), reverse=True)),
+            "likes": array("I", sorted(rows, key=self.likes.__getitem__, reverse=True)),
+            "downloads": array("I", sorted(rows, key=self.downloads.__getitem__, reverse=True)),
+            "trending": array("I", sorted(rows, key=self.trending.__getitem__, reverse=True)),
+        }
+
+    def __len__(self):
+        return len(self.docs)
+
+    def with_note(self, doc: Dict) -> "NoteSnapshot":
+        """A copy of this snapshot with `doc` added, ordered as a full rebuild would order it"""
+        snap = NoteSnapshot.__new__(NoteSnapshot)
+        row = len(self.docs)
+        snap.docs = self.docs + [doc]
+        snap.by_id = {**self.by_id, doc["id"]: row}
+        snap.likes = array("q", self.likes)
+        snap.likes.append(int(doc.get("likes") or 0))
+        snap.downloads = array("q", self.downloads)
+        snap.downloads.append(int(doc.get("downloads") or 0))
+        snap.trending = array("d", self.trending)
+        snap.trending.append(float(doc.get("trending_score") or 0.0))
+        snap.titles = self.titles + [_title(doc)]
+        snap.index = {}
+        for field in INDEXED_FIELDS:
+            buckets = dict(self.index[field])
+            value = doc.get(field)
+            if value is not None:
+                # Only the touched bucket is copied; rows stay ascending
+                rows = array("I", buckets.get(value, ()))
+                rows.append(row)
+                buckets[value] = rows
+            snap.index[field] = buckets
+        def created(r):
+            return _sortable(snap.docs[r].get("created_at"))
+
+        snap.orders = {}
+        for name, key, newest_first in (
+            # A rebuild puts later rows first among equal created_at values
+            # and after equal counter values
+            ("new", created, True),
+            ("likes", snap.likes.__getitem__, False),
+            ("downloads", snap.downloads.__getitem__, False),
+            ("trending", snap.trending.__getitem__, False),
+        ):
+            order = array("I", self.orders[name])
+            order.insert(_position(order, key, key(row), newest_first), row)
+            snap.orders[name] = order
+        return snap
+
+    def query(self, q: Optional[str] = None, filters: Optional[Dict[str, str]] = None,
+              sort: Optional[str] = "new", skip: int = 0, limit: int = 24) -> List[Dict]:
+        candidates = None
+        for field, value in (filters or {}).items():
+            if value is None:
+                continue
+            rows = self.index[field].get(value)
+            if rows is None:
+                return []
+            candidates = set(rows) if candidates is None else candidates.intersection(rows)
+            if not candidates:
+                return []
+        needle = q.lower() if q else None
+        items: List[Dict] = []
+        to_skip = max(skip, 0)
+        for row in self.orders.get(sort or "new", self.orders["new"]):
+            if candidates is not None and row not in candidates:
+                continue
+            if needle is not None and needle not in self.titles[row]:
+                continue
+            if to_skip:
+                to_skip -= 1
+                continue
+            items.append(self.docs[row])
+            if len(items) >= limit:
+                break
+        return items
+
+    def get(self, note_id: str) -> Optional[Dict]:
+        row = self.by_id.get(note_id)
+        return None if row is None else self.docs[row]
+
+
+def _sortable(value):
+    # created_at is a datetime for notes written by this app, an ISO string for imported ones
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).replace(tzinfo=None)
+        except ValueError:
+            return _EPOCH
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return _EPOCH
+
+
+def _title(doc: Dict) -> str:
+    return (doc.get("title") or "").lower()
+
+
+def _position(order: array, key, value, before_ties: bool) -> int:
+    """Insertion point in `order` (descending by `key`), before or after equal keys"""
+    lo, hi = 0, len(order)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        k = key(order[mid])
+        if k > value or (k == value and not before_ties):
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class ReadModel:
+    def __init__(self):
+        self.notes: Optional[NoteSnapshot] = None
+        self.contributors: List[Dict] = []
+        self.settings: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.notes is not None
+
+    def build(self, db) -> int:
+        """Load everything from Mongo and swap the new snapshot in"""
+        notes = NoteSnapshot(present(NoteOut, upgrade("note", d)) for d in db["note"].find({}))
+        self.load_contributors(db)
+        self.load_settings(db)
+        with self._lock:
+            self.notes = notes
+        return len(notes)
+
+    def load_contributors(self, db):
+        contributors = [present(ContributorOut, d) for d in db["contributor"].find({}).sort([("points", -1)])]
+        self.contributors = contributors
+
+    def load_settings(self, db):
+        s = db["settings"].find_one({})
+        self.settings = present(SettingsOut, s) if s else None
+
+    def add_note(self, doc: Dict):
+        doc = present(NoteOut, upgrade("note", dict(doc))) if "_id" in doc else doc
+        with self._lock:
+            if self.notes is not None and doc["id"] in self.notes.by_id:
+                return
+            self.notes = self.notes.with_note(doc) if self.notes is not None else NoteSnapshot([doc])
+
+    def record_counter(self, note_id: str, counter: str, value: int, trending_score: Optional[float] = None):
+        """Reflect a like/download; sort orders catch up on the next refresh"""
+        snap = self.notes
+        doc = snap.get(note_id) if snap else None
+        if doc is None:
+            return
+        doc[counter] = value
+        getattr(snap, counter)[snap.by_id[note_id]] = value
+        if trending_score is not None:
+            doc["trending_score"] = trending_score
+            snap.trending[snap.by_id[note_id]] = trending_score
+
+    def list_notes(self, q=None, subject=None, class_level=None, college=None, sort="new", skip=0, limit=24) -> List[Dict]:
+        filters = {"subject": subject or None, "class_level": class_level or None, "college": college or None}
+        return self.notes.query(q, filters, sort, skip, limit)
+
+    def get_note(self, note_id: str) -> Optional[Dict]:
+        return self.notes.get(note_id)
+
+    def leaderboard(self, limit: int) -> List[Dict]:
+        return self.contributors[:limit]
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": enabled,
+            "notes": len(self.notes) if self.notes else 0,
+            "contributors": len(self.contributors),
+        }
+
+
+store = ReadModel()
@@ -6,13 +6,24 @@ Copy and modify these examples for your specific needs.
 """
 
 from datetime import datetime
-from database import create_document, get_documents, update_document, delete_document
+import analytics
+import chat
+import database
+import notifications
+from database import BatchWriter, create_document, get_document, update_document
+
+
+def _insert(collection_name: str, data: dict, batch: BatchWriter = None):
+    """Write now, or queue on `batch` to be sent with the next bulk_write"""
+    if batch is not None:
+        return batch.insert(collection_name, data)
+    return create_document(collection_name, data)
 
 # =============================================================================
 # USER MANAGEMENT SCHEMA
 # =============================================================================
 
-def create_user(name: str, email: str, password_hash: str):
+def create_user(name: str, email: str, password_hash: str, batch: BatchWriter = None):
     """Create a new user"""
     user_data = {
         "name": name,
@@ -29,18 +40,17 @@ def create_user(name: str, email: str, password_hash: str):
         },
         "status": "active"
     }
-    return create_document("users", user_data)
+    return _insert("users", user_data, batch)
 
 def get_user_by_email(email: str):
     """Get user by email"""
-    users = get_documents("users", {"email": email})
-    return users[0] if users else None
+    return get_document("users", {"email": email})
 
 # =============================================================================
 # BLOG/CMS SCHEMA
 # =============================================================================
 
-def create_blog_post(title: str, content: str, author_id: str, tags: list = None):
+def create_blog_post(title: str, content: str, author_id: str, tags: list = None, batch: BatchWriter = None):
     """Create a blog post"""
     post_data = {
         "title": title,
@@ -53,9 +63,9 @@ def create_blog_post(title: str, content: str, author_id: str, tags: list = None
         "likes": 0,
         "comments": []
     }
-    return create_document("posts", post_data)
+    return _insert("posts", post_data, batch)
 
-def add_comment_to_post(post_id: str, author_id: str, comment_text: str):
+def add_comment_to_post(post_id: str, author_id: str, comment_text: str, batch: BatchWriter = None):
     """Add comment to a blog post"""
     from bson import ObjectId
     
@@ -68,18 +78,16 @@ def add_comment_to_post(post_id: str, author_id: str, comment_text: str):
     }
     
     # Add comment to post's comments array
-    from database import db
-    result = db.posts.update_one(
-        {"_id": ObjectId(post_id)},
-        {"$push": {"comments": comment}}
-    )
-    return result.modified_count > 0
+    if batch is not None:
+        batch.update("posts", {"_id": post_id}, {"$push": {"comments": comment}})
+        return True
+    return update_document("posts", {"_id": post_id}, {"$push": {"comments": comment}}) > 0
 
 # =============================================================================
 # E-COMMERCE SCHEMA
 # =============================================================================
 
-def create_product(name: str, price: float, description: str, category: str):
+def create_product(name: str, price: float, description: str, category: str, batch: BatchWriter = None):
     """Create a product"""
     product_data = {
         "name": name,
@@ -100,9 +108,9 @@ def create_product(name: str, price: float, description: str, category: str):
             "count": 0
         }
     }
-    return create_document("products", product_data)
+    return _insert("products", product_data, batch)
 
-def create_order(user_id: str, items: list, shipping_address: dict):
+def create_order(user_id: str, items: list, shipping_address: dict, batch: BatchWriter = None):
     """Create an order"""
     total_amount = sum(item["price"] * item["quantity"] for item in items)
     
@@ -124,13 +132,13 @@ def create_order(user_id: str, items: list, shipping_address: dict):
             "status": "processing"
         }
     }
-    return create_document("orders", order_data)
+    return _insert("orders", order_data, batch)
 
 # =============================================================================
 # TASK/PROJECT MANAGEMENT SCHEMA
 # =============================================================================
 
-def create_project(name: str, description: str, owner_id: str):
+def create_project(name: str, description: str, owner_id: str, batch: BatchWriter = None):
     """Create a project"""
     project_data = {
         "name": name,
@@ -146,9 +154,9 @@ def create_project(name: str, description: str, owner_id: str):
             "allow_comments": True
         }
     }
-    return create_document("projects", project_data)
+    return _insert("projects", project_data, batch)
 
-def create_task(project_id: str, title: str, description: str, assignee_id: str = None):
+def create_task(project_id: str, title: str, description: str, assignee_id: str = None, batch: BatchWriter = None):
     """Create a task"""
     task_data = {
         "project_id": project_id,
@@ -166,13 +174,13 @@ def create_task(project_id: str, title: str, description: str, assignee_id: str
         "checklist": [],
         "attachments": []
     }
-    return create_document("tasks", task_data)
+    return _insert("tasks", task_data, batch)
 
 # =============================================================================
 # CHAT/MESSAGING SCHEMA
 # =============================================================================
 
-def create_chat_room(name: str, type: str = "group", members: list = None):
+def create_chat_room(name: str, type: str = "group", members: list = None, batch: BatchWriter = None):
     """Create a chat room"""
     room_data = {
         "name": name,
@@ -186,27 +194,23 @@ def create_chat_room(name: str, type: str = "group", members: list = None):
         },
         "last_activity": datetime.utcnow()
     }
-    return create_document("chat_rooms", room_data)
+    return _insert("chat_rooms", room_data, batch)
 
 def send_message(room_id: str, sender_id: str, content: str, message_type: str = "text"):
-    """Send a message to a chat room"""
-    message_data = {
-        "room_id": room_id,
-        "sender_id": sender_id,
-        "content": content,
-        "type": message_type,  # text, image, file, system
-        "reactions": {},
-        "replies": [],
-        "is_edited": False,
-        "is_deleted": False
-    }
-    return create_document("messages", message_data)
+    """Send a message to a chat room (appended to the room's current history bucket)"""
+    return chat.append_message(room_id, sender_id, content, message_type)
+
+def get_room_messages(room_id: str, before: str = None, limit: int = 50):
+    """Latest messages of a room, or the page before a `cursor` from a previous call"""
+    if before:
+        return chat.older_messages(room_id, before, limit)
+    return chat.recent_messages(room_id, limit)
 
 # =============================================================================
 # EVENT/BOOKING SCHEMA
 # =============================================================================
 
-def create_event(title: str, description: str, start_time: datetime, end_time: datetime, location: str):
+def create_event(title: str, description: str, start_time: datetime, end_time: datetime, location: str, batch: BatchWriter = None):
     """Create an event"""
     event_data = {
         "title": title,
@@ -227,9 +231,9 @@ def create_event(title: str, description: str, start_time: datetime, end_time: d
             "send_reminders": True
         }
     }
-    return create_document("events", event_data)
+    return _insert("events", event_data, batch)
 
-def create_booking(event_id: str, user_id: str, ticket_quantity: int = 1):
+def create_booking(event_id: str, user_id: str, ticket_quantity: int = 1, batch: BatchWriter = None):
     """Create a booking for an event"""
     booking_data = {
         "event_id": event_id,
@@ -245,14 +249,14 @@ def create_booking(event_id: str, user_id: str, ticket_quantity: int = 1):
         "attendee_details": [],
         "special_requirements": ""
     }
-    return create_document("bookings", booking_data)
+    return _insert("bookings", booking_data, batch)
 
 # =============================================================================
 # ANALYTICS/TRACKING SCHEMA
 # =============================================================================
 
 def track_user_activity(user_id: str, action: str, resource_type: str, resource_id: str, metadata: dict = None):
-    """Track user activity for analytics"""
+    """Track user activity for analytics (buffered, flushed in batches)"""
     activity_data = {
         "user_id": user_id,
         "action": action,  # view, create, update, delete, login, etc.
@@ -262,12 +266,11 @@ def track_user_activity(user_id: str, action: str, resource_type: str, resource_
         "ip_address": None,
         "user_agent": None,
         "session_id": None,
-        "timestamp": datetime.utcnow()
     }
-    return create_document("user_activities", activity_data)
+    analytics.track("user_activity", f"{action}:{resource_type}", activity_data)
 
 def track_page_view(page_path: str, user_id: str = None, session_id: str = None):
-    """Track page views for analytics"""
+    """Track page views for analytics (buffered, flushed in batches)"""
     pageview_data = {
         "page_path": page_path,
         "user_id": user_id,
@@ -282,26 +285,26 @@ def track_page_view(page_path: str, user_id: str = None, session_id: str = None)
             "os": None,
             "browser": None
         },
-        "timestamp": datetime.utcnow()
     }
-    return create_document("page_views", pageview_data)
+    analytics.track("page_view", page_path, pageview_data)
+
+def get_page_view_stats(page_path: str = None, granularity: str = "hour", since: datetime = None):
+    """Page view counts per minute/hour/day, read from the rollups"""
+    return analytics.get_rollups("page_view", granularity, start=since, key=page_path)
 
 # =============================================================================
 # NOTIFICATION SCHEMA
 # =============================================================================
 
 def create_notification(user_id: str, title: str, message: str, type: str = "info"):
-    """Create a notification"""
-    notification_data = {
-        "user_id": user_id,
-        "title": title,
-        "message": message,
-        "type": type,  # info, success, warning, error
-        "is_read": False,
-        "action_url": None,
-        "metadata": {}
-    }
-    return create_document("notifications", notification_data)
+    """Create a notification and bump the user's unread counter with it"""
+    if database.db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    return notifications.deliver(database.db, [user_id], title, message, type=type)
+
+def notify_users(user_ids: list, title: str, message: str, type: str = "info"):
+    """Notify many users at once; written in bulk by the background fan-out worker"""
+    notifications.fanout.enqueue(user_ids, title, message, type=type)
 
 # =============================================================================
 # USAGE EXAMPLES
@@ -321,5 +324,10 @@ if __name__ == "__main__":
     
     # Track user activity
     # track_user_activity(user_id, "create", "post", post_id, {"category": "blog"})
+
+    # Batch many writes into a few bulk_write round trips
+    # with BatchWriter(chunk_size=500) as batch:
+    #     for name, email in [("Ram", "ram@example.com"), ("Sita", "sita@example.com")]:
+    #         create_user(name, email, "hashed_password", batch=batch)
     
     pass
\ No newline at end of file
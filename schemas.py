@@ -8,14 +8,20 @@ Collections:
 - Note: accepted/published notes metadata stored with Google Drive link
 - Upload: incoming submissions pending review by admin
 - Contributor: people who contribute notes and earn Knowledge Points
+- ContributorStats: precomputed per-contributor profile stats
 - Settings: site-wide settings (hero text, featured, language)
 - Subject: controlled list of subjects
 - College: controlled list of colleges
 
 These models are used for validation when creating/editing documents.
+
+The *Out models describe API responses. Trusted database documents are shaped
+to them without re-validation (validation.present), so every field has a
+default and URLs are plain strings.
 """
 
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, List, Optional
 from pydantic import BaseModel, Field, HttpUrl
 
 
@@ -62,6 +68,15 @@ class Contributor(BaseModel):
     badges: List[str] = Field(default_factory=list)
 
 
+class ContributorStats(BaseModel):
+    name: Optional[str] = None
+    accepted_count: int = Field(0, ge=0)
+    total_likes: int = Field(0, ge=0)
+    total_downloads: int = Field(0, ge=0)
+    streak: int = Field(0, ge=0)
+    last_accepted_on: Optional[str] = Field(None, description="ISO date of the latest accepted upload")
+
+
 class Settings(BaseModel):
     hero_title_en: str = Field("Share & Discover premium notes", description="Hero title EN")
     hero_title_ne: str = Field("नोटहरू सेयर र खोज्नुहोस्", description="Hero title NE")
@@ -80,3 +95,85 @@ class Subject(BaseModel):
 class College(BaseModel):
     name: str
     code: Optional[str] = None
+
+
+# Response models
+
+class NoteOut(BaseModel):
+    id: str = ""
+    title: str = ""
+    class_level: str = ""
+    college: str = ""
+    subject: str = ""
+    chapters: List[str] = Field(default_factory=list)
+    pages: Optional[int] = None
+    drive_link: str = ""
+    uploader_alias: str = "Admin Upload"
+    contributor_id: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    likes: int = 0
+    downloads: int = 0
+    trending_score: float = 0.0
+    language: str = "en"
+    created_at: Optional[Any] = Field(None, description="datetime; ISO string on not yet migrated documents")
+    updated_at: Optional[Any] = None
+
+
+class NoteList(BaseModel):
+    items: List[NoteOut]
+    count: int
+
+
+class UploadOut(BaseModel):
+    id: str = ""
+    title: str = ""
+    class_level: str = ""
+    college: str = ""
+    subject: str = ""
+    chapters: List[str] = Field(default_factory=list)
+    pages: Optional[int] = None
+    drive_link: str = ""
+    contributor_name: Optional[str] = None
+    notes: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    status: str = "pending"
+    reviewer_note: Optional[str] = None
+    suggested_points: Optional[int] = None
+    assigned_points: Optional[int] = None
+    created_at: Optional[Any] = None
+    reviewed_at: Optional[datetime] = None
+    archived_at: Optional[datetime] = None
+
+
+class UploadList(BaseModel):
+    items: List[UploadOut]
+
+
+class ContributorOut(BaseModel):
+    id: str = ""
+    name: str = ""
+    avatar_url: Optional[str] = None
+    college: Optional[str] = None
+    points: int = 0
+    streak: int = 0
+    badges: List[str] = Field(default_factory=list)
+
+
+class ContributorList(BaseModel):
+    items: List[ContributorOut]
+
+
+class ContributorAdminOut(ContributorOut):
+    email: Optional[str] = None
+
+
+class ContributorAdminList(BaseModel):
+    items: List[ContributorAdminOut]
+
+
+class ContributorProfile(ContributorOut):
+    stats: ContributorStats = Field(default_factory=ContributorStats)
+
+
+class SettingsOut(Settings):
+    id: str = ""
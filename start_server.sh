@@ -1,19 +1,92 @@
 #!/bin/bash
-echo "Starting FastAPI backend server..."
+# Usage: ./start_server.sh [start|reload|stop|dev]
+#   start   production: gunicorn + uvicorn workers (uvloop/httptools), see gunicorn_conf.py
+#   reload  zero-downtime restart: new master/workers take over, old ones drain
+#   stop    graceful shutdown
+#   dev     single uvicorn process with --reload (previous behaviour)
+# Settings come from the environment: APP_DIR (. or backend), PORT, WEB_CONCURRENCY, ...
+set -e
+cd "$(dirname "$0")"
 
-# Find and kill MainThread processes
-PIDS=$(ps | grep uvicorn | grep -v grep | awk '{print $1}')
-if [ ! -z "$PIDS" ]; then
-  echo "Killing uvicorn processes: $PIDS"
-  for pid in $PIDS; do
-    kill $pid 2>/dev/null || true
-  done
-  sleep 2
-fi
+LOG_DIR="${LOG_DIR:-logs}"
+PIDFILE="$LOG_DIR/gunicorn.pid"
+READY_DIR="$LOG_DIR/ready"
+READY_TIMEOUT="${READY_TIMEOUT:-120}"
+APP_DIR="${APP_DIR:-.}"
+PORT="${PORT:-8000}"
+mkdir -p "$LOG_DIR"
 
-mkdir -p logs
-echo "Installing dependencies..."
-pip install -r requirements.txt
-echo "Starting FastAPI server..."
-nohup uvicorn main:app --host 0.0.0.0 --port 8000 --reload > logs/server.log 2>&1 
-echo "Server started in background"
+master_pid() {
+  [ -f "$1" ] && kill -0 "$(cat "$1")" 2>/dev/null && cat "$1"
+}
+
+# Healthy once every worker of master $1 has finished startup and warm-up
+# (see ready_marker in gunicorn_conf.py) and the socket answers GET /
+generation_ready() {
+  local ready
+  ready=$(find "$READY_DIR" -name "$1.*" 2>/dev/null | wc -l)
+  [ "$ready" -ge "$WORKERS" ] || return 1
+  python -c "import sys, urllib.request; urllib.request.urlopen(sys.argv[1], timeout=2)" \
+    "http://127.0.0.1:$PORT/" >/dev/null 2>&1
+}
+
+case "${1:-start}" in
+  start)
+    if PID=$(master_pid "$PIDFILE"); then
+      echo "Server already running (master $PID)"
+      exit 0
+    fi
+    echo "Installing dependencies..."
+    pip install -r "$APP_DIR/requirements.txt"
+    echo "Starting production server..."
+    nohup gunicorn -c gunicorn_conf.py > "$LOG_DIR/server.log" 2>&1 &
+    echo "Server started in background (logs in $LOG_DIR/server.log)"
+    ;;
+  reload)
+    PID=$(master_pid "$PIDFILE") || { echo "Server not running"; exit 1; }
+    # USR2 starts a new master with fresh code next to the old one; once all
+    # of its workers are ready, WINCH/TERM drain the old workers and master
+    # without dropping connections (the new master writes its pid to
+    # $PIDFILE.2 until the old one exits)
+    WORKERS=$(python -c "import gunicorn_conf; print(gunicorn_conf.workers)")
+    kill -USR2 "$PID"
+    NEW=""
+    for _ in $(seq 1 30); do
+      NEW=$(master_pid "$PIDFILE.2" || true)
+      [ -n "$NEW" ] && break
+      sleep 1
+    done
+    if [ -z "$NEW" ]; then
+      echo "New master did not come up; keeping $PID"
+      exit 1
+    fi
+    echo "Waiting for $WORKERS workers of master $NEW to finish startup..."
+    WAITED=0
+    until generation_ready "$NEW"; do
+      if [ "$WAITED" -ge "$READY_TIMEOUT" ] || ! kill -0 "$NEW" 2>/dev/null; then
+        echo "New master $NEW not healthy after ${WAITED}s; stopping it and keeping $PID"
+        kill -TERM "$NEW" 2>/dev/null || true
+        exit 1
+      fi
+      sleep 1
+      WAITED=$((WAITED + 1))
+    done
+    kill -WINCH "$PID"
+    kill -TERM "$PID"
+    echo "Reloaded: master $PID -> $NEW"
+    ;;
+  stop)
+    PID=$(master_pid "$PIDFILE") || { echo "Server not running"; exit 0; }
+    kill -TERM "$PID"
+    echo "Stopping master $PID"
+    ;;
+  dev)
+    echo "Starting FastAPI dev server..."
+    cd "$APP_DIR"
+    exec uvicorn main:app --host 0.0.0.0 --port "$PORT" --reload
+    ;;
+  *)
+    echo "Usage: $0 [start|reload|stop|dev]"
+    exit 2
+    ;;
+esac
@@ -0,0 +1,220 @@
+"""
+Search Suggestions
+
+In-memory prefix index over note titles, subjects, chapters and colleges for
+the typeahead endpoint. Terms are kept in a sorted array and looked up with
+bisect; every word of a term is indexed so "organic" finds "Chemistry:
+Organic Basics". Matches are ranked by popularity (number of notes plus their
+likes/downloads). The index is built at startup and updated in place when a
+note is published or liked/downloaded through this worker; counters bumped
+on other workers are picked up by the periodic rebuild
+(SUGGEST_REBUILD_INTERVAL in main.py).
+
+A build collects every (key, term) pair and sorts them once. Prefixes that
+match more than SCAN_LIMIT keys keep their TOP_K best terms precomputed, so
+a search never ranks more than SCAN_LIMIT keys; those lists are kept in
+order as notes are added and scores rise.
+"""
+
+import bisect
+import heapq
+import threading
+from typing import Dict, List, Optional, Tuple
+
+KINDS = ("note", "subject", "chapter", "college")
+# The largest `limit` /api/suggest accepts
+TOP_K = 25
+# Prefixes matching more keys than this are answered from a top-K list
+SCAN_LIMIT = 256
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _suffixes(norm: str) -> List[str]:
+    words = norm.split(" ")
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+def _note_popularity(d: Dict) -> int:
+    return 1 + int(d.get("likes") or 0) + int(d.get("downloads") or 0)
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: List[str] = []
+        self._refs: List[int] = []
+        self._entries: List[Dict] = []
+        self._by_term: Dict[Tuple[str, str], int] = {}
+        self._note_refs: Dict[str, List[int]] = {}
+        self._top: Dict[str, List[int]] = {}
+        # (key, ref) pairs collected during build() and sorted once at the end
+        self._pending: Optional[List[Tuple[str, int]]] = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _add(self, kind: str, text: Optional[str], score: int, note_id: Optional[str] = None) -> Optional[int]:
+        norm = _normalize(text or "")
+        if not norm:
+            return None
+        term = (kind, note_id or norm)
+        ref = self._by_term.get(term)
+        if ref is not None:
+            self._entries[ref]["score"] += score
+            if self._pending is None:
+                self._promote(ref)
+            return ref
+        ref = len(self._entries)
+        entry = {"text": text.strip(), "kind": kind, "score": score}
+        if note_id:
+            entry["id"] = note_id
+        self._entries.append(entry)
+        self._by_term[term] = ref
+        if self._pending is not None:
+            self._pending.extend((key, ref) for key in _suffixes(norm))
+            return ref
+        for key in _suffixes(norm):
+            pos = bisect.bisect_right(self._keys, key)
+            self._keys.insert(pos, key)
+            self._refs.insert(pos, ref)
+        self._promote(ref)
+        return ref
+
+    def _score(self, ref: int) -> int:
+        return self._entries[ref]["score"]
+
+    def _rank(self, lo: int, hi: int, limit: int) -> List[int]:
+        return heapq.nlargest(limit, set(self._refs[lo:hi]), key=self._score)
+
+    def _build_top(self):
+        """Top-K lists for every prefix matching more than SCAN_LIMIT keys"""
+        keys = self._keys
+        self._top = {}
+        spans = [(0, len(keys), 0)]  # keys[lo:hi] share their first `depth` characters
+        while spans:
+            lo, hi, depth = spans.pop()
+            depth += 1
+            i = lo
+            while i < hi:
+                if len(keys[i]) < depth:
+                    # Keys equal to the shared prefix; its list already exists
+                    i = bisect.bisect_right(keys, keys[i], i, hi)
+                    continue
+                prefix = keys[i][:depth]
+                j = bisect.bisect_left(keys, prefix + "\uffff", i, hi)
+                if j - i > SCAN_LIMIT:
+                    self._top[prefix] = self._rank(i, j, TOP_K)
+                    spans.append((i, j, depth))
+                i = j
+
+    def _promote(self, ref: int):
+        """Move a new term, or one whose score rose, into the top-K lists of its prefixes"""
+        if not self._top:
+            return
+        score = self._score(ref)
+        prefixes = {key[:i] for key in _suffixes(_normalize(self._entries[ref]["text"])) for i in range(1, len(key) + 1)}
+        for prefix in prefixes:
+            top = self._top.get(prefix)
+            if top is None:
+                continue
+            if ref in top:
+                top.remove(ref)
+            elif len(top) >= TOP_K and score <= self._score(top[-1]):
+                continue
+            lo, hi = 0, len(top)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._score(top[mid]) >= score:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            top.insert(lo, ref)
+            del top[TOP_K:]
+
+    def _add_note(self, d: Dict):
+        score = _note_popularity(d)
+        note_id = str(d.get("_id") or d.get("id") or "") or None
+        refs = [
+            self._add("note", d.get("title"), score, note_id),
+            self._add("subject", d.get("subject"), score),
+            self._add("college", d.get("college"), score),
+        ]
+        refs += [self._add("chapter", chapter, score) for chapter in d.get("chapters") or []]
+        if note_id:
+            self._note_refs[note_id] = [r for r in refs if r is not None]
+
+    def _swap(self, other: "PrefixIndex"):
+        self._keys, self._refs = other._keys, other._refs
+        self._entries, self._by_term = other._entries, other._by_term
+        self._note_refs = other._note_refs
+        self._top = other._top
+
+    def build(self, db):
+        """Rebuild from the note, subject and college collections"""
+        fresh = PrefixIndex()
+        fresh._pending = []
+        projection = {"title": 1, "subject": 1, "college": 1, "chapters": 1, "likes": 1, "downloads": 1}
+        for d in db["note"].find({}, projection):
+            fresh._add_note(d)
+        for d in db["subject"].find({}, {"name": 1}):
+            fresh._add("subject", d.get("name"), 0)
+        for d in db["college"].find({}, {"name": 1}):
+            fresh._add("college", d.get("name"), 0)
+        fresh._pending.sort()
+        fresh._keys = [key for key, _ in fresh._pending]
+        fresh._refs = [ref for _, ref in fresh._pending]
+        fresh._pending = None
+        fresh._build_top()
+        with self._lock:
+            self._swap(fresh)
+        return len(self)
+
+    # Writers mutate the arrays and top-K lists in place under the lock (a
+    # few list inserts per term instead of copying the index); searches look
+    # up under the same lock and only read entries outside it.
+
+    def add_note(self, d: Dict):
+        with self._lock:
+            note_id = str(d.get("_id") or d.get("id") or "")
+            if note_id and note_id in self._note_refs:
+                return
+            self._add_note(d)
+
+    def record_counter(self, note_id: str, delta: int = 1):
+        """Raise the popularity of a note and its terms after a like/download"""
+        with self._lock:
+            refs = self._note_refs.get(note_id)
+            if not refs:
+                return
+            for ref in refs:
+                self._entries[ref]["score"] += delta
+                if delta >= 0:
+                    self._promote(ref)
+            if delta < 0:
+                # A lower score may let other terms in; relist on next search
+                lowered = set(refs)
+                self._top = {p: top for p, top in self._top.items() if lowered.isdisjoint(top)}
+
+    def search(self, prefix: str, limit: int = 8) -> List[Dict]:
+        norm = _normalize(prefix)
+        if not norm:
+            return []
+        with self._lock:
+            lo = bisect.bisect_left(self._keys, norm)
+            hi = bisect.bisect_left(self._keys, norm + "\uffff", lo)
+            if hi - lo > SCAN_LIMIT and limit <= TOP_K:
+                top = self._top.get(norm)
+                if top is None:
+                    # Grew past SCAN_LIMIT since the build, or was relisted
+                    top = self._top[norm] = self._rank(lo, hi, TOP_K)
+                top = top[:limit]
+            else:
+                top = self._rank(lo, hi, limit)
+            entries = self._entries
+        return [{k: v for k, v in entries[r].items() if k != "score"} for r in top]
+
+
+index = PrefixIndex()
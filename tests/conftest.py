@@ -0,0 +1,50 @@
+"""
+Test setup: every test runs against the in-memory database backend
+(DATABASE_BACKEND=memory, see database.py), so no mongod is needed.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["DATABASE_BACKEND"] = "memory"
+os.environ.setdefault("LOAD_SHEDDING", "0")
+os.environ.setdefault("THUMBNAIL_CACHE_DIR", tempfile.mkdtemp(prefix="notebuddy-thumbnails-"))
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def db():
+    for name in database.db.list_collection_names():
+        database.db.drop_collection(name)
+    return database.db
+
+
+@pytest.fixture
+def app_module(db):
+    import main
+    import read_model
+
+    for c in main.CACHES:
+        c.clear()
+    read_model.store.notes = None
+    return main
+
+
+@pytest.fixture
+def client(app_module):
+    from fastapi.testclient import TestClient
+
+    # Not used as a context manager: startup jobs and warm-up stay off
+    return TestClient(app_module.app)
+
+
+@pytest.fixture
+def admin():
+    return {"Authorization": f"Bearer {os.getenv('ADMIN_TOKEN', 'admin-token')}"}
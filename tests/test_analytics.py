@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+import analytics
+import database
+
+# Recent enough that the raw events TTL does not expire them
+NOW = datetime.now(timezone.utc).replace(second=30, microsecond=0)
+
+
+class FailingEvents:
+    """Wraps the events collection; the next insert_many stores all but `fail` and raises"""
+
+    def __init__(self, real, fail=(), code=2, error=None, stored=False):
+        self.real = real
+        self.fail = set(fail)
+        self.code = code
+        self.error = error
+        self.stored = stored  # whether the write behind `error` went through
+        self.sent = []
+
+    def insert_many(self, docs, ordered=True):
+        self.sent.append([d.get("n") for d in docs])
+        if self.error is not None:
+            error, self.error = self.error, None
+            if self.stored:
+                self.real.insert_many(docs, ordered=ordered)
+            raise error
+        if not self.fail:
+            return self.real.insert_many(docs, ordered=ordered)
+        stored = [d for i, d in enumerate(docs) if i not in self.fail]
+        if stored:
+            self.real.insert_many(stored, ordered=ordered)
+        errors = [{"index": i, "code": self.code, "errmsg": "rejected"} for i in sorted(self.fail)]
+        self.fail = set()
+        raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": [], "nInserted": len(stored)})
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+@pytest.fixture
+def ingestor(db, monkeypatch):
+    ing = analytics.EventIngestor(batch_size=3, flush_interval=60)
+    monkeypatch.setattr(ing, "_ensure_started", lambda: None)
+    return ing
+
+
+class FailingRollups:
+    """Wraps the rollup collection; the next bulk_write rejects op 0, or applies everything and raises"""
+
+    def __init__(self, real, lost=False):
+        self.real = real
+        self.lost = lost
+        self.armed = True
+
+    def bulk_write(self, ops, ordered=True):
+        if not self.armed:
+            return self.real.bulk_write(ops, ordered=ordered)
+        self.armed = False
+        if self.lost:
+            self.real.bulk_write(ops, ordered=ordered)
+            raise AutoReconnect("reply lost")
+        if ops[1:]:
+            self.real.bulk_write(ops[1:], ordered=ordered)
+        raise BulkWriteError({"writeErrors": [{"index": 0, "code": 2, "errmsg": "rejected"}], "writeConcernErrors": []})
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+def _patch_events(monkeypatch, db, wrapper, rollups=None):
+    class Db:
+        def __getitem__(self, name):
+            if name == analytics.ROLLUPS and rollups is not None:
+                return rollups
+            return wrapper if name == analytics.EVENTS else db[name]
+
+        def __getattr__(self, name):
+            return getattr(db, name)
+
+    monkeypatch.setattr(database, "db", Db())
+
+
+def _day_count(db):
+    return sum(r["count"] for r in db[analytics.ROLLUPS].find({"granularity": "day"}))
+
+
+def test_flush_writes_events_and_rollups(ingestor, db):
+    for i in range(5):
+        ingestor.track("view", "note", {"n": i}, timestamp=NOW)
+    assert ingestor.flush() == 5
+    assert db[analytics.EVENTS].count_documents({}) == 5
+    assert analytics.get_rollups("view", "minute") == [{"key": "note", "bucket": NOW.replace(second=0, tzinfo=None), "count": 5}]
+    assert ingestor.stats() == {"buffered": 0, "flushed": 5, "dropped": 0}
+
+
+def test_partial_failure_rebuffers_only_rejected_events(ingestor, db, monkeypatch):
+    _patch_events(monkeypatch, db, FailingEvents(db[analytics.EVENTS], fail={1}))
+    for i in range(5):
+        ingestor.track("view", "note", {"n": i}, timestamp=NOW)
+    with pytest.raises(BulkWriteError):
+        ingestor.flush()
+    # Chunk one stored events 0 and 2; event 1 and the unsent chunk are retried
+    assert sorted(e["n"] for e in db[analytics.EVENTS].find()) == [0, 2]
+    assert [e["n"] for e in ingestor._buffer] == [1, 3, 4]
+    assert _day_count(db) == 2
+
+    assert ingestor.flush() == 3
+    assert sorted(e["n"] for e in db[analytics.EVENTS].find()) == [0, 1, 2, 3, 4]
+    assert _day_count(db) == 5
+    assert ingestor.stats()["flushed"] == 5
+
+
+def test_duplicate_key_errors_count_as_written(ingestor, db, monkeypatch):
+    _patch_events(monkeypatch, db, FailingEvents(db[analytics.EVENTS], fail={0}, code=analytics.DUPLICATE_KEY))
+    for i in range(3):
+        ingestor.track("view", "note", {"n": i}, timestamp=NOW)
+    assert ingestor.flush() == 3
+    assert len(ingestor._buffer) == 0
+    assert ingestor.stats()["flushed"] == 3
+
+
+def test_unknown_outcome_retries_the_chunk(ingestor, db, monkeypatch):
+    _patch_events(monkeypatch, db, FailingEvents(db[analytics.EVENTS], error=AutoReconnect("gone")))
+    for i in range(4):
+        ingestor.track("view", "note", {"n": i}, timestamp=NOW)
+    with pytest.raises(AutoReconnect):
+        ingestor.flush()
+    assert [e["n"] for e in ingestor._buffer] == [0, 1, 2, 3]
+    assert ingestor.flush() == 4
+    assert db[analytics.EVENTS].count_documents({}) == 4
+
+
+def test_retry_after_a_stored_but_unacknowledged_insert_writes_nothing_twice(ingestor, db, monkeypatch):
+    # Time-series collections raise no duplicate key error, so the retry must check first
+    events = FailingEvents(db[analytics.EVENTS], error=AutoReconnect("gone"), stored=True)
+    _patch_events(monkeypatch, db, events)
+    for i in range(3):
+        ingestor.track("view", "note", {"n": i}, timestamp=NOW)
+    with pytest.raises(AutoReconnect):
+        ingestor.flush()
+    ingestor.track("view", "note", {"n": 3}, timestamp=NOW)
+    assert ingestor.flush() == 4
+    assert events.sent == [[0, 1, 2], [3]]
+    assert sorted(e["n"] for e in db[analytics.EVENTS].find()) == [0, 1, 2, 3]
+    assert _day_count(db) == 4
+
+
+def test_rejected_rollups_are_sent_with_the_next_flush(ingestor, db, monkeypatch):
+    _patch_events(monkeypatch, db, db[analytics.EVENTS], rollups=FailingRollups(db[analytics.ROLLUPS]))
+    ingestor.track("view", "note", {}, timestamp=NOW)
+    ingestor.track("view", "note", {}, timestamp=NOW)
+    assert ingestor.flush() == 2
+    assert db[analytics.ROLLUPS].count_documents({"granularity": "minute"}) == 0  # op 0 was the minute bucket
+    assert ingestor.flush() == 0
+    assert [r["count"] for r in analytics.get_rollups("view", "minute")] == [2]
+    assert _day_count(db) == 2
+
+
+def test_rollups_with_an_unknown_outcome_are_rebuilt(ingestor, db, monkeypatch):
+    _patch_events(monkeypatch, db, db[analytics.EVENTS], rollups=FailingRollups(db[analytics.ROLLUPS], lost=True))
+    for _ in range(3):
+        ingestor.track("view", "note", {}, timestamp=NOW)
+    assert ingestor.flush() == 3
+    # Re-sending the $incs would have counted 6; the rebuild counts the raw events
+    assert _day_count(db) == 3
+    assert [r["count"] for r in analytics.get_rollups("view", "hour")] == [3]
+    assert ingestor._stale_span is None
+
+
+def test_rebuild_rollups_recounts_from_raw_events(ingestor, db):
+    for key in ("a", "a", "b"):
+        ingestor.track("view", key, {}, timestamp=NOW)
+    ingestor.flush()
+    db[analytics.ROLLUPS].update_many({}, {"$set": {"count": 99}})
+    day = NOW.replace(hour=0, minute=0, second=0)
+    assert analytics.rebuild_rollups(db, day, day + timedelta(days=1)) == 6
+    assert {r["key"]: r["count"] for r in analytics.get_rollups("view", "day")} == {"a": 2, "b": 1}
@@ -0,0 +1,82 @@
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+import chat
+import database
+
+
+@pytest.fixture(autouse=True)
+def fresh_chat(monkeypatch):
+    monkeypatch.setattr(chat, "BUCKET_SIZE", 4)
+    monkeypatch.setattr(chat, "_indexed", False)
+    chat.recent_cache.clear()
+    yield
+    chat.shutdown()
+
+
+def test_messages_page_back_through_buckets(db):
+    room = str(ObjectId())
+    ids = [chat.append_message(room, "u1", f"m{i}") for i in range(10)]
+    assert db[chat.BUCKETS].count_documents({"room_id": room}) == 3
+
+    recent = chat.recent_messages(room, limit=3)
+    assert [m["id"] for m in recent["messages"]] == ids[-3:]
+    seen = [m["id"] for m in recent["messages"]]
+    cursor = recent["cursor"]
+    while cursor:
+        page = chat.older_messages(room, cursor, limit=3)
+        seen = [m["id"] for m in page["messages"]] + seen
+        cursor = page["cursor"]
+    assert seen == ids
+
+
+def test_shutdown_stops_flusher_and_writes_activity(db):
+    room = db[chat.ROOMS].insert_one({"name": "physics"}).inserted_id
+    chat.append_message(str(room), "u1", "hello")
+    flusher = chat._flusher
+    assert flusher is not None and flusher.is_alive()
+
+    chat.shutdown()
+    assert not flusher.is_alive()
+    assert chat._flusher is None
+    assert db[chat.ROOMS].find_one({"_id": room})["last_activity"] is not None
+
+
+def test_stuck_flusher_keeps_its_slot_until_it_exits(db, monkeypatch):
+    release = threading.Event()
+    stuck = threading.Thread(target=release.wait, daemon=True)
+    stuck.start()
+    monkeypatch.setattr(chat, "_flusher", stuck)
+
+    chat.shutdown(timeout=0.01)
+    assert chat._stop.is_set() and chat._flusher is stuck
+    chat._touch_room(str(ObjectId()), datetime.now(timezone.utc))
+    assert chat._flusher is stuck
+
+    release.set()
+    stuck.join()
+    chat._touch_room(str(ObjectId()), datetime.now(timezone.utc))
+    assert chat._flusher is not stuck and chat._flusher.is_alive()
+    assert not chat._stop.is_set()
+
+
+def test_atexit_handler_is_registered_once(db, monkeypatch):
+    registered = []
+    monkeypatch.setattr(chat.atexit, "register", registered.append)
+    monkeypatch.setattr(chat, "_atexit_registered", False)
+    room = str(ObjectId())
+    for _ in range(3):
+        chat.append_message(room, "u1", "hi")
+        chat.shutdown()
+    assert registered == [chat.shutdown]
+
+
+def test_without_database(monkeypatch):
+    monkeypatch.setattr(database, "db", None)
+    assert chat.recent_messages("r") == {"messages": [], "cursor": None}
+    assert chat.older_messages("r", "0:0") == {"messages": [], "cursor": None}
+    with pytest.raises(RuntimeError):
+        chat.append_message("r", "u1", "hi")
@@ -0,0 +1,95 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.testclient import TestClient
+
+import compression
+
+BIG = {"items": [{"title": f"note {i}", "subject": "Physics"} for i in range(200)]}
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;q=0.5, deflate", "gzip"),
+    ("*", next(iter(compression.ENCODERS))),
+])
+def test_negotiate(header, expected):
+    assert compression.negotiate(header) == expected
+
+
+def test_payload_compresses_each_encoding_once(monkeypatch):
+    calls = []
+    real = compression.ENCODERS["gzip"]
+    monkeypatch.setitem(compression.ENCODERS, "gzip", lambda data, high: calls.append(high) or real(data, high))
+    payload = compression.Payload.of(BIG)
+    first = payload.response("gzip")
+    second = payload.response("gzip")
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.body == second.body
+    assert gzip.decompress(first.body) == payload.body
+    assert calls == [True]
+
+
+def test_payload_small_bodies_stay_plain():
+    r = compression.Payload.of({"ok": True}).response("gzip")
+    assert "content-encoding" not in r.headers
+    assert r.headers["vary"] == "Accept-Encoding"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(compression.CompressionMiddleware)
+
+    @app.get("/big")
+    def big():
+        return BIG
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    @app.get("/binary")
+    def binary():
+        return Response(b"\0" * 4096, media_type="application/octet-stream")
+
+    @app.get("/payload")
+    def payload():
+        return compression.Payload.of(BIG).response("gzip")
+
+    @app.get("/huge")
+    def huge():
+        return PlainTextResponse("x" * (compression.OFFLOAD_BYTES + 1), headers={"Vary": "Origin"})
+
+    return TestClient(app)
+
+
+def test_middleware_compresses_large_json(client):
+    r = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert int(r.headers["content-length"]) < len(r.content)
+    assert r.json() == BIG
+
+
+@pytest.mark.parametrize("path", ["/small", "/binary"])
+def test_middleware_leaves_small_and_binary_bodies(client, path):
+    r = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+
+
+def test_middleware_does_not_recompress_payloads(client):
+    r = client.get("/payload", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.json() == BIG
+
+
+def test_middleware_offloads_big_bodies_and_merges_vary(client):
+    r = client.get("/huge", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Origin, Accept-Encoding"
+    assert len(r.text) == compression.OFFLOAD_BYTES + 1
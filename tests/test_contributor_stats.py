@@ -0,0 +1,94 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import contributor_stats
+from schemas import ContributorStats
+
+
+def _contributor(db, name="Asha"):
+    return db["contributor"].insert_one({"name": name, "points": 0, "streak": 0}).inserted_id
+
+
+def test_streak_advances_on_consecutive_days_and_resets_after_a_gap(db):
+    cid = _contributor(db)
+    day = datetime(2026, 3, 1, 9, tzinfo=timezone.utc)
+    for offset in (0, 0, 1, 2):
+        contributor_stats.record_acceptance(db, cid, "Asha", day + timedelta(days=offset))
+    stats = contributor_stats.get_stats(db, cid)
+    assert isinstance(stats, ContributorStats)
+    assert (stats.accepted_count, stats.streak, stats.last_accepted_on) == (4, 3, "2026-03-03")
+    assert db["contributor"].find_one({"_id": cid})["streak"] == 3
+
+    contributor_stats.record_acceptance(db, cid, "Asha", day + timedelta(days=5))
+    assert contributor_stats.get_stats(db, cid).streak == 1
+    assert db["contributor"].find_one({"_id": cid})["streak"] == 1
+
+
+def test_concurrent_acceptances_are_all_counted(db):
+    cid = _contributor(db)
+    when = datetime.now(timezone.utc)
+    threads = [threading.Thread(target=contributor_stats.record_acceptance, args=(db, cid, "Asha", when)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = contributor_stats.get_stats(db, cid)
+    assert stats.accepted_count == 8
+    assert stats.streak == 1
+
+
+def test_counters_and_unknown_contributor(db):
+    cid = _contributor(db)
+    contributor_stats.record_counter(db, str(cid), "likes")
+    contributor_stats.record_counter(db, str(cid), "downloads", 3)
+    contributor_stats.record_counter(db, None, "likes")
+    stats = contributor_stats.get_stats(db, cid)
+    assert (stats.total_likes, stats.total_downloads) == (1, 3)
+    assert contributor_stats.get_stats(db, "0" * 24) == ContributorStats()
+
+
+def test_reconcile_reports_and_fixes_drift(db):
+    cid = _contributor(db)
+    when = datetime.now(timezone.utc)
+    db["note"].insert_one({"title": "n", "contributor_id": str(cid), "likes": 4, "downloads": 2})
+    db["upload"].insert_one({"contributor_name": "Asha", "status": "accepted", "reviewed_at": when})
+    contributor_stats.record_acceptance(db, cid, "Asha", when)
+
+    assert contributor_stats.reconcile(db)["drifted"] == 1  # likes/downloads never recorded
+    assert contributor_stats.reconcile(db)["drifted"] == 0
+    stats = contributor_stats.get_stats(db, cid)
+    assert (stats.total_likes, stats.total_downloads, stats.accepted_count) == (4, 2, 1)
+
+
+def test_streak_from_days():
+    d = datetime(2026, 3, 10).date()
+    assert contributor_stats.streak_from_days([]) == 0
+    assert contributor_stats.streak_from_days([d, d - timedelta(days=1), d - timedelta(days=3)]) == 2
+
+
+def test_reconcile_counts_archived_uploads(db):
+    import upload_archive
+
+    cid = _contributor(db)
+    now = datetime.now(timezone.utc)
+    for days_ago in (2, 1, 0):
+        when = now - timedelta(days=days_ago)
+        db["note"].insert_one({"title": "n", "contributor_id": str(cid)})
+        db["upload"].insert_one({"contributor_name": "Asha", "status": "accepted", "reviewed_at": when})
+        contributor_stats.record_acceptance(db, cid, "Asha", when)
+    assert contributor_stats.get_stats(db, cid).streak == 3
+
+    # The two older uploads move to the archive; the streak still counts them
+    assert upload_archive.archive_batch(db, now - timedelta(hours=12)) == 2
+    assert contributor_stats.reconcile(db)["drifted"] == 0
+    assert contributor_stats.get_stats(db, cid).streak == 3
+
+
+def test_reconcile_keeps_streaks_whose_uploads_expired(db):
+    cid = _contributor(db)
+    contributor_stats.record_acceptance(db, cid, "Asha", datetime.now(timezone.utc))
+    db["note"].insert_one({"title": "n", "contributor_id": str(cid)})
+    # No upload left in either collection (archive TTL): streak is not reset
+    result = contributor_stats.reconcile(db)
+    assert result["drifted"] == 0
+    assert contributor_stats.get_stats(db, cid).streak == 1
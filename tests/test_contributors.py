@@ -0,0 +1,35 @@
+from bson import ObjectId
+
+import contributor_stats
+
+
+def _contributor(db, **extra):
+    doc = {"name": "Asha", "email": "asha@example.com", "college": "LBA", "points": 40, "streak": 2, **extra}
+    return db["contributor"].insert_one(doc).inserted_id
+
+
+def test_leaderboard_hides_email(client, db):
+    _contributor(db)
+    items = client.get("/api/leaderboard").json()["items"]
+    assert [c["name"] for c in items] == ["Asha"]
+    assert "email" not in items[0]
+
+
+def test_admin_list_includes_email(client, db, admin):
+    _contributor(db)
+    items = client.get("/api/admin/contributors", headers=admin).json()["items"]
+    assert items[0]["email"] == "asha@example.com"
+
+
+def test_profile_shape(client, db):
+    cid = _contributor(db)
+    contributor_stats.record_acceptance(db, cid, "Asha")
+    r = client.get(f"/api/contributors/{cid}")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["id"] == str(cid)
+    assert "email" not in body and "_id" not in body
+    assert body["stats"]["accepted_count"] == 1
+
+    assert client.get(f"/api/contributors/{ObjectId()}").status_code == 404
+    assert client.get("/api/contributors/nothex").status_code == 400
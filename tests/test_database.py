@@ -0,0 +1,62 @@
+import bson
+
+import database
+from schemas import Upload
+
+
+def _upload(**kw):
+    data = dict(title="Waves", class_level="12", college="LBA", subject="Physics",
+                drive_link="https://drive.google.com/file/d/1/view",
+                thumbnail_url="https://img.example.com/1.png")
+    data.update(kw)
+    return Upload(**data)
+
+
+def test_models_are_stored_bson_encodable(db):
+    new_id = database.create_document("upload", _upload())
+    doc = database.get_document("upload", {"id": new_id})
+    assert doc["drive_link"] == "https://drive.google.com/file/d/1/view"
+    assert isinstance(doc["thumbnail_url"], str)
+    bson.encode(doc)
+
+
+def test_update_spec_dumps_models_in_json_mode():
+    spec = database._update_spec(_upload(), database.datetime.now(database.timezone.utc))
+    bson.encode(spec)
+    assert isinstance(spec["$set"]["drive_link"], str)
+
+
+def test_batch_writer_assigns_ids_and_counts(db):
+    with database.BatchWriter(chunk_size=2) as batch:
+        ids = [batch.insert("upload", _upload(title=f"t{i}")) for i in range(3)]
+        batch.update("upload", {"id": ids[0]}, {"status": "accepted"})
+        batch.delete("upload", {"id": ids[2]})
+    assert batch.counts == {"inserted": 3, "modified": 1, "upserted": 0, "deleted": 1}
+    assert database.get_document("upload", {"id": ids[0]})["status"] == "accepted"
+    assert database.count_documents("upload") == 2
+
+
+def test_bulk_helpers(db):
+    ids = database.create_documents("contributor", [{"name": "a", "points": 1}, {"name": "b", "points": 2}])
+    assert database.bulk_update("contributor", [({"id": i}, {"$inc": {"points": 1}}) for i in ids]) == 2
+    assert [d["points"] for d in database.get_documents("contributor", sort=[("points", 1)])] == [2, 3]
+    assert database.bulk_delete("contributor", [{"id": ids[0]}]) == 1
+    assert database.upsert_document("contributor", {"name": "c"}, {"points": 5})
+    assert database.count_documents("contributor") == 2
+
+
+def test_submit_upload_stores_urls_as_strings(client, db):
+    body = _upload().model_dump(mode="json")
+    r = client.post("/api/uploads", json=body)
+    assert r.status_code == 200
+    doc = database.get_document("upload", {"id": r.json()["id"]})
+    assert doc["status"] == "pending"
+    bson.encode(doc)
+
+
+def test_backend_upload_dump_is_bson_encodable():
+    from backend.schemas import Upload as BackendUpload
+
+    data = BackendUpload(title="Waves", class_level="12", college="LBA", subject="Physics",
+                         drive_link="https://drive.google.com/file/d/1/view").model_dump(mode="json")
+    bson.encode(data)
@@ -0,0 +1,67 @@
+import io
+import json
+
+import import_notes
+import invalidation
+
+HEADER = "title,class_level,college,subject,chapters,drive_link,likes\n"
+
+
+def _write(tmp_path, rows, name="notes.csv"):
+    path = tmp_path / name
+    path.write_text(HEADER + "".join(rows), encoding="utf-8")
+    return str(path)
+
+
+def test_import_validates_dedupes_and_rejects(db, tmp_path):
+    path = _write(tmp_path, [
+        "Waves,12,LBA,Physics,waves;sound,https://drive.test/1,\n",
+        "Waves again,12,LBA,Physics,,https://drive.test/1,\n",
+        "Broken,12,LBA,Physics,,not-a-url,\n",
+        "Cells,11,SXC,Biology,,https://drive.test/2,\n",
+    ])
+    summary = import_notes.run_import(db, path, chunk_size=2, out=io.StringIO())
+    assert (summary["inserted"], summary["duplicates"], summary["rejected"]) == (2, 1, 1)
+    waves = db["note"].find_one({"drive_link": "https://drive.test/1"})
+    assert waves["chapters"] == ["waves", "sound"]
+    assert (waves["likes"], waves["downloads"]) == (0, 0)
+    rejects = [json.loads(line) for line in open(path + ".rejects.jsonl")]
+    assert [r["row"] for r in rejects] == [3]
+
+
+def test_update_existing_keeps_counters_and_unset_fields(db, tmp_path):
+    path = _write(tmp_path, ["Waves,12,LBA,Physics,,https://drive.test/1,\n"])
+    import_notes.run_import(db, path, out=io.StringIO())
+    db["note"].update_one({}, {"$set": {"likes": 42, "downloads": 7, "language": "ne"}})
+
+    path = _write(tmp_path, [
+        "Waves (revised),12,LBA,Physics,,https://drive.test/1,0\n",
+        "Optics,12,LBA,Physics,,https://drive.test/3,\n",
+    ], name="again.csv")
+    summary = import_notes.run_import(db, path, update_existing=True, out=io.StringIO())
+    assert (summary["inserted"], summary["updated"]) == (1, 1)
+    waves = db["note"].find_one({"drive_link": "https://drive.test/1"})
+    assert waves["title"] == "Waves (revised)"
+    assert (waves["likes"], waves["downloads"], waves["language"]) == (42, 7, "ne")
+    optics = db["note"].find_one({"drive_link": "https://drive.test/3"})
+    assert (optics["likes"], optics["language"]) == (0, "en")
+
+
+def test_resume_continues_after_the_checkpoint(db, tmp_path):
+    path = _write(tmp_path, [f"Note {i},12,LBA,Physics,,https://drive.test/{i},\n" for i in range(5)])
+    with open(path + ".checkpoint", "w") as f:
+        json.dump({"rows_done": 3, "inserted": 3}, f)
+    summary = import_notes.run_import(db, path, resume=True, out=io.StringIO())
+    assert summary["rows"] == 5
+    assert summary["inserted"] == 5
+    assert db["note"].count_documents({}) == 2
+
+
+def test_cli_publishes_a_catalog_event_through_a_configured_bus(db, tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(invalidation.bus, "db", None)
+    path = _write(tmp_path, ["Waves,12,LBA,Physics,,https://drive.test/1,\n"])
+    import_notes.main([path, "--set", "language=ne"])
+    assert json.loads(capsys.readouterr().out)["inserted"] == 1
+    assert db["note"].find_one()["language"] == "ne"
+    assert db[invalidation.EVENTS].find_one({"type": "catalog"}) is not None
+    assert invalidation.bus.stats()["mode"] is None  # configured, not tailing
@@ -0,0 +1,122 @@
+import os
+import threading
+from datetime import datetime, timezone
+
+import invalidation
+from cache import MISSING, TTLCache
+
+
+def _bus(db):
+    bus = invalidation.InvalidationBus()
+    bus.db = db
+    seen = []
+    bus.subscribe("note", seen.append)
+    return bus, seen
+
+
+def _remote_event(db, seq, key):
+    db[invalidation.EVENTS].insert_one({
+        "seq": seq, "type": "note", "key": key, "pid": os.getpid() + 1, "created_at": datetime.now(timezone.utc),
+    })
+
+
+def test_publish_invalidates_locally_and_broadcasts(db):
+    bus, seen = _bus(db)
+    bus.publish("note", "a")
+    bus.publish("note", "b")
+    assert seen == ["a", "b"]
+    assert [e["seq"] for e in db[invalidation.EVENTS].find().sort("seq")] == [1, 2]
+    bus.poll_once()
+    assert seen == ["a", "b"]  # our own events are not dispatched twice
+    assert bus.last_seq == 2
+
+
+def test_out_of_order_inserts_are_not_skipped(db):
+    bus, seen = _bus(db)
+    _remote_event(db, 2, "second")
+    bus.poll_once(now=0)
+    assert seen == ["second"]
+    assert bus.last_seq == 0
+
+    _remote_event(db, 1, "first")
+    bus.poll_once(now=1)
+    assert seen == ["second", "first"]
+    assert bus.last_seq == 2
+    bus.poll_once(now=2)
+    assert seen == ["second", "first"]
+
+
+def test_a_sequence_number_that_never_arrives_is_given_up_on(db):
+    bus, seen = _bus(db)
+    _remote_event(db, 2, "x")
+    bus.poll_once(now=0)
+    bus.poll_once(now=invalidation.GAP_TIMEOUT - 1)
+    assert bus.last_seq == 0
+    bus.poll_once(now=invalidation.GAP_TIMEOUT)
+    assert bus.last_seq == 2
+    assert bus.stats()["pending_gap"] == 0
+
+
+def test_cache_does_not_store_a_value_loaded_before_an_invalidation():
+    cache = TTLCache("t", ttl=60)
+
+    def load():
+        cache.invalidate("k")  # an admin write lands while we read
+        return "stale"
+
+    assert cache.get_or_load("k", load) == "stale"
+    assert cache.get("k") is MISSING
+    assert cache.get_or_load("k", lambda: "fresh") == "fresh"
+    assert cache.get("k") == "fresh"
+
+
+def test_cache_clear_during_concurrent_load():
+    cache = TTLCache("t", ttl=60)
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_load():
+        loading.set()
+        release.wait(5)
+        return "old"
+
+    t = threading.Thread(target=cache.get_or_load, args=(None, slow_load))
+    t.start()
+    loading.wait(5)
+    cache.clear()
+    release.set()
+    t.join()
+    assert cache.get() is MISSING
+
+
+def test_get_note_is_not_cached_across_an_invalidation(client, db, app_module):
+    nid = db["note"].insert_one({"title": "Before", "drive_link": "https://x.test/1"}).inserted_id
+    assert client.get(f"/api/notes/{nid}").json()["title"] == "Before"
+    db["note"].update_one({"_id": nid}, {"$set": {"title": "After"}})
+    invalidation.bus.publish("note", str(nid))
+    assert client.get(f"/api/notes/{nid}").json()["title"] == "After"
+    assert client.get("/api/notes/000000000000000000000000").status_code == 404
+    assert client.get("/api/notes/nope").status_code == 400
+
+
+def test_like_is_visible_on_the_next_read(client, db, app_module):
+    nid = str(db["note"].insert_one({"title": "Waves", "drive_link": "https://x.test/2", "likes": 0}).inserted_id)
+    assert client.get(f"/api/notes/{nid}").json()["likes"] == 0
+    assert client.get("/api/notes").json()["items"][0]["likes"] == 0
+
+    assert client.post(f"/api/notes/{nid}/like").json()["likes"] == 1
+    assert client.get(f"/api/notes/{nid}").json()["likes"] == 1
+    assert client.get("/api/notes").json()["items"][0]["likes"] == 1
+
+
+def test_remote_note_event_clears_note_and_catalog_caches(db, app_module):
+    app_module.note_cache.get_or_load("n1", lambda: "stale")
+    app_module.catalog_cache.get_or_load("page", lambda: "stale")
+    invalidation.bus._handle({"type": "note", "key": "n1", "pid": os.getpid() + 1})
+    assert app_module.note_cache.get("n1") is MISSING
+    assert app_module.catalog_cache.get("page") is MISSING
+
+
+def test_catalog_reload_drops_cached_notes(db, app_module):
+    app_module.note_cache.get_or_load("n1", lambda: "stale")
+    invalidation.bus.dispatch("catalog")
+    assert app_module.note_cache.get("n1") is MISSING
@@ -0,0 +1,41 @@
+import jobs
+
+
+def test_lease_is_exclusive_until_it_expires(db):
+    assert jobs.acquire_lease(db, "reconcile", 60, owner="worker-1")
+    assert not jobs.acquire_lease(db, "reconcile", 60, owner="worker-2")
+    assert jobs.acquire_lease(db, "reconcile", 60, owner="worker-1")  # renewal
+    assert jobs.acquire_lease(db, "other-job", 60, owner="worker-2")
+
+    db[jobs.LEASES].update_one({"_id": "reconcile"}, {"$set": {"expires_at": jobs.datetime(2000, 1, 1)}})
+    assert jobs.acquire_lease(db, "reconcile", 60, owner="worker-2")
+
+
+def test_only_the_lease_holder_runs_a_tick(db, monkeypatch):
+    runs = []
+    first = jobs.PeriodicJob("archive", 60, lambda: runs.append(1), lease_db=db)
+    second = jobs.PeriodicJob("archive", 60, lambda: runs.append(2), lease_db=db)
+    owners = iter(["host:1", "host:1", "host:2"])
+    monkeypatch.setattr(jobs, "_owner", lambda: next(owners))
+    first.run_once()
+    second.run_once()
+    assert runs == [1]
+    assert second.skipped == 1
+
+
+def test_failed_run_is_recorded_and_the_job_keeps_going(db):
+    def boom():
+        raise RuntimeError("nope")
+
+    job = jobs.PeriodicJob("boom", 60, boom)
+    assert job.run_once() is None
+    assert job.last_error == "nope"
+
+
+def test_start_periodic_respects_disabled_and_duplicate_names():
+    try:
+        assert jobs.start_periodic("disabled", 0, lambda: None) is None
+        job = jobs.start_periodic("once", 3600, lambda: None)
+        assert jobs.start_periodic("once", 3600, lambda: None) is job
+    finally:
+        jobs.stop_all()
@@ -0,0 +1,115 @@
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import load_shedding
+from conftest import ROOT
+
+
+def _event(command="find", ms=1.0):
+    return SimpleNamespace(command_name=command, duration_micros=int(ms * 1000))
+
+
+@pytest.fixture
+def limiter():
+    return load_shedding.AdaptiveLimiter(initial=10, min_limit=2, max_limit=20, tolerance=2.0)
+
+
+@pytest.mark.parametrize("method, path, query, expected", [
+    ("GET", "/api/admin/uploads", b"", "critical"),
+    ("POST", "/api/admin/uploads/archive", b"", "low"),
+    ("GET", "/api/notes/abc", b"", "high"),
+    ("GET", "/api/notes", b"q=waves", "low"),
+    ("GET", "/api/notes", b"subject=x", "normal"),
+    ("GET", "/api/suggest", b"q=w", "low"),
+])
+def test_classify(method, path, query, expected):
+    assert load_shedding.classify({"method": method, "path": path, "query_string": query}) == expected
+
+
+def test_listener_ignores_commands_outside_requests(limiter):
+    listener = load_shedding.DbLatencyListener(limiter)
+    listener.succeeded(_event())
+    assert limiter.db == {}
+
+
+def test_listener_tracks_per_route_and_command(limiter):
+    listener = load_shedding.DbLatencyListener(limiter)
+    route = SimpleNamespace(path="/api/notes")
+    token = load_shedding._request.set({"route": route})
+    try:
+        listener.succeeded(_event("find"))
+        listener.failed(_event("aggregate"))
+        listener.succeeded(_event("getMore"))
+    finally:
+        load_shedding._request.reset(token)
+    assert set(limiter.db) == {("/api/notes", "find"), ("/api/notes", "aggregate")}
+
+
+def test_only_the_slow_route_backs_off(limiter):
+    for ms in (1, 1, 1):
+        limiter.observe_db("/api/notes", "find", ms / 1000)
+        limiter.observe_db("/api/suggest", "aggregate", ms / 1000)
+    for _ in range(20):
+        limiter.observe_db("/api/suggest", "aggregate", 0.05)
+    assert limiter.db_ratio("/api/suggest") > limiter.tolerance
+    assert limiter.db_ratio("/api/notes") == 1.0
+    assert limiter.db_ratio() > limiter.tolerance
+
+    assert limiter.try_acquire("normal")
+    limiter.release("normal", "/api/notes", 0.001)
+    assert limiter.decreases == 0
+    assert limiter.try_acquire("normal")
+    limiter.release("normal", "/api/suggest", 0.001)
+    assert limiter.decreases == 1
+
+
+def test_middleware_attributes_threadpool_commands_to_the_route(limiter, monkeypatch):
+    monkeypatch.setattr(load_shedding, "enabled", True)
+    listener = load_shedding.DbLatencyListener(limiter)
+    app = FastAPI()
+    app.add_middleware(load_shedding.LoadShedMiddleware, limiter=limiter)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: str):
+        listener.succeeded(_event("find"))
+        # A background thread started here has no request context
+        t = threading.Thread(target=listener.succeeded, args=(_event("update"),))
+        t.start()
+        t.join()
+        return {"id": item_id}
+
+    assert TestClient(app).get("/items/1").status_code == 200
+    assert set(limiter.db) == {("/items/{item_id}", "find")}
+    assert "/items/{item_id}" in limiter.routes
+
+
+def _run_alone(tmp_path, code):
+    # backend/ copied somewhere without the repository root next to it
+    app_dir = tmp_path / "backend"
+    shutil.copytree(os.path.join(ROOT, "backend"), app_dir, ignore=shutil.ignore_patterns("__pycache__"))
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONPATH"}
+    env["DATABASE_BACKEND"] = "memory"
+    out = subprocess.run([sys.executable, "-c", code], cwd=app_dir, env=env,
+                         capture_output=True, text=True, check=True).stdout.split()
+    return app_dir, out
+
+
+def test_shared_modules_import_without_the_repo_root(tmp_path):
+    code = "import load_shedding, schema_versions; print(load_shedding.__file__, schema_versions.__file__)"
+    app_dir, out = _run_alone(tmp_path, code)
+    assert out == [str(app_dir / "load_shedding.py"), str(app_dir / "schema_versions.py")]
+
+
+def test_backend_deploys_on_its_own(tmp_path):
+    pytest.importorskip("motor.motor_asyncio")
+    code = "import main, database, load_shedding; print(database.__file__, load_shedding.__file__)"
+    app_dir, out = _run_alone(tmp_path, code)
+    assert out == [str(app_dir / "database.py"), str(app_dir / "load_shedding.py")]
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import bench_api
+import database
+import migrations
+from backend import memory_backend
+
+
+def test_root_memory_backend_is_mongomock():
+    assert database.database_backend == "memory"
+    assert type(database.db).__module__.startswith("mongomock")
+
+
+def test_async_client_covers_the_motor_calls_the_backend_uses():
+    async def run():
+        db = memory_backend.AsyncMemoryClient()["notebuddy"]
+        notes = db["note"]
+        await notes.create_index("drive_link", unique=True)
+        res = await notes.insert_one({"title": "a", "drive_link": "1", "likes": 1})
+        await notes.insert_many([{"title": t, "drive_link": t, "likes": n} for t, n in (("b", 5), ("c", 3))])
+        with pytest.raises(DuplicateKeyError):
+            await notes.insert_one({"title": "dup", "drive_link": "1"})
+        assert (await notes.update_one({"_id": res.inserted_id}, {"$inc": {"likes": 10}})).modified_count == 1
+
+        titles = [d["title"] async for d in notes.find({}).sort([("likes", -1)]).skip(1).limit(1)]
+        assert titles == ["b"]
+        assert len(await notes.find({}).to_list(length=2)) == 2
+        grouped = await notes.aggregate([{"$group": {"_id": None, "likes": {"$sum": "$likes"}}}]).to_list()
+        assert grouped[0]["likes"] == 19
+        assert await notes.count_documents({"likes": {"$gte": 5}}) == 2
+        assert await db.list_collection_names() == ["note"]
+        with pytest.raises(AttributeError):
+            notes.watch
+
+    asyncio.run(run())
+
+
+def test_seed_is_deterministic_and_current(db):
+    bench_api.seed(db, notes=50, contributors=5, uploads=20)
+    first = [d["title"] for d in db["note"].find({}, {"title": 1}).sort("drive_link", 1)]
+    assert (db["note"].count_documents({}), db["contributor"].count_documents({}), db["upload"].count_documents({})) == (50, 5, 20)
+    for collection in ("note", "contributor", "upload"):
+        assert db[collection].count_documents(migrations._outdated(collection)) == 0
+
+    for name in db.list_collection_names():
+        db.drop_collection(name)
+    bench_api.seed(db, notes=50, contributors=5, uploads=20)
+    assert [d["title"] for d in db["note"].find({}, {"title": 1}).sort("drive_link", 1)] == first
+
+
+def test_seeded_catalog_serves_through_the_api(db, client):
+    bench_api.seed(db, notes=30, contributors=5, uploads=5)
+    notes = client.get("/api/notes", params={"sort": "likes"}).json()["items"]
+    assert len(notes) == 24
+    assert [n["likes"] for n in notes] == sorted((n["likes"] for n in notes), reverse=True)
+    assert client.get(f"/api/notes/{notes[0]['id']}").json()["title"] == notes[0]["title"]
+    assert len(client.get("/api/leaderboard").json()["items"]) == 5
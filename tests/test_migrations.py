@@ -0,0 +1,116 @@
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pytest
+
+import database
+import import_notes
+import migrations
+from conftest import ROOT
+from schemas import Note
+
+_sleep = time.sleep
+
+NOTE = {"title": "Waves", "class_level": "12", "college": "LBA", "subject": "Physics",
+        "drive_link": "https://drive.google.com/file/d/1/view"}
+
+
+def _outdated(db, collection):
+    return db[collection].count_documents(migrations._outdated(collection))
+
+
+def test_every_root_writer_stamps_the_target_version(db):
+    database.create_document("note", Note(**NOTE))
+    database.create_documents("note", [{**NOTE, "drive_link": "https://d/2"}])
+    database.upsert_document("contributor", {"name": "a"}, {"points": 1})
+    database.update_document("settings", {"site": "x"}, {"hero_title": "hi"}, upsert=True)
+    database.bulk_update("contributor", [({"name": "b"}, {"$inc": {"points": 1}})], upsert=True)
+    with database.BatchWriter() as batch:
+        batch.insert("upload", {**NOTE, "status": "pending"})
+        batch.update("contributor", {"name": "c"}, {"points": 2}, upsert=True)
+    for collection in ("note", "contributor", "settings", "upload"):
+        assert db[collection].count_documents({}) > 0
+        assert _outdated(db, collection) == 0, collection
+        for d in db[collection].find():
+            assert d[migrations.VERSION_FIELD] == migrations.target_version(collection)
+            assert isinstance(d["created_at"], datetime)
+
+
+def test_updates_leave_the_version_of_existing_documents_alone(db):
+    oid = db["note"].insert_one({**NOTE, "tags": ["waves"]}).inserted_id
+    database.update_document("note", {"id": str(oid)}, {"pages": 3}, upsert=True)
+    assert migrations.VERSION_FIELD not in db["note"].find_one({"_id": oid})
+
+
+def test_import_stamps_new_notes(db):
+    notes = [Note(**NOTE)]
+    db["note"].bulk_write(import_notes.build_ops(notes, set(), update_existing=False))
+    db["note"].bulk_write(import_notes.build_ops([Note(**{**NOTE, "drive_link": "https://d/3"})], set(), update_existing=True))
+    assert _outdated(db, "note") == 0
+
+
+def test_for_insert_converts_the_backend_shape():
+    doc = migrations.for_insert("note", {**NOTE, "tags": ["waves"], "thumbnail": "https://i/1.png",
+                                         "created_at": "2026-01-01T00:00:00"})
+    assert doc["chapters"] == ["waves"] and doc["thumbnail_url"] == "https://i/1.png"
+    assert "tags" not in doc and "thumbnail" not in doc
+    assert isinstance(doc["created_at"], datetime) and doc["created_at"].tzinfo is not None
+    assert doc[migrations.VERSION_FIELD] == migrations.target_version("note")
+
+
+def test_runner_migrates_old_documents(db):
+    oid = db["note"].insert_one({**NOTE, "tags": ["waves"], "created_at": "2026-01-01T00:00:00"}).inserted_id
+    db["note"].update_one({"_id": oid}, {"$set": {"id": str(oid)}})
+    state = migrations.MigrationRunner(db, "note", batch_size=10).run()
+    assert state["migrated"] == 1
+    d = db["note"].find_one({"_id": oid})
+    assert d["chapters"] == ["waves"] and "id" not in d and isinstance(d["created_at"], datetime)
+
+
+class SlowWrites:
+    """Collection proxy whose bulk_write takes `delays[i]` seconds on the i-th batch"""
+
+    def __init__(self, coll, delays):
+        self.coll = coll
+        self.delays = list(delays)
+
+    def bulk_write(self, *args, **kwargs):
+        _sleep(self.delays.pop(0))
+        return self.coll.bulk_write(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.coll, name)
+
+
+def test_runner_backs_off_when_its_batches_slow_down(db, monkeypatch):
+    db["note"].insert_many([{**NOTE, "drive_link": f"https://d/{i}", "tags": ["t"]} for i in range(8)])
+    slow = SlowWrites(db["note"], [0.005, 0.005, 0.1, 0.1])
+    proxy = type("DbProxy", (), {"__getitem__": lambda self, name: slow if name == "note" else db[name]})()
+    sleeps = []
+    monkeypatch.setattr(migrations.time, "sleep", sleeps.append)
+
+    runner = migrations.MigrationRunner(proxy, "note", batch_size=2)
+    assert runner.run()["migrated"] == 8
+    assert sleeps == [0.1, 0.2]
+    assert runner.latency.samples == 4
+
+
+def test_backend_writes_the_target_shape():
+    pytest.importorskip("motor.motor_asyncio")
+    code = """
+import asyncio, database
+async def main():
+    doc = await database.create_document("note", {"title": "t", "tags": ["a"], "thumbnail": "https://i/1.png"})
+    raw = await database.get_db()["note"].find_one({})
+    print(sorted(raw), doc["tags"], type(raw["created_at"]).__name__)
+asyncio.run(main())
+"""
+    env = {**os.environ, "DATABASE_BACKEND": "memory"}
+    out = subprocess.run([sys.executable, "-c", code], cwd=os.path.join(ROOT, "backend"), env=env,
+                         capture_output=True, text=True, check=True).stdout
+    assert "'chapters'" in out and "'schema_version'" in out and "'tags'" not in out.split("]")[0]
+    assert "'id'" not in out.split("]")[0]
+    assert out.strip().endswith("datetime")
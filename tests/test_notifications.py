@@ -0,0 +1,75 @@
+import pytest
+from pymongo.errors import BulkWriteError
+
+import notifications
+import schema_examples
+
+
+@pytest.fixture(autouse=True)
+def clear_unread_cache():
+    notifications.unread_cache.clear()
+
+
+def test_inbox_pages_and_unread_counts(db):
+    assert notifications.deliver(db, ["u1", "u2"] * 3, "hi", "there", chunk_size=4) == 6
+    first = notifications.inbox(db, "u1", limit=2)
+    assert len(first["items"]) == 2 and first["unread"] == 3
+    second = notifications.inbox(db, "u1", before=first["next"], limit=2)
+    assert len(second["items"]) == 1 and second["next"] is None
+    ids = {d["id"] for d in first["items"] + second["items"]}
+    assert len(ids) == 3
+
+    assert notifications.mark_read(db, "u1", [first["items"][0]["id"]]) == 1
+    assert notifications.unread_count(db, "u1") == 2
+    assert notifications.mark_read(db, "u1") == 2
+    assert notifications.unread_count(db, "u1") == 0
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "2026-01-01T00:00:00_nothex", "2026-01-01T00:00:00"])
+def test_bad_cursor_raises_value_error(db, cursor):
+    with pytest.raises(ValueError):
+        notifications.inbox(db, "u1", before=cursor)
+
+
+def test_endpoints_require_admin(client):
+    assert client.get("/api/notifications", params={"user_id": "u1"}).status_code == 401
+    assert client.get("/api/notifications/unread-count", params={"user_id": "u1"}).status_code == 401
+    assert client.post("/api/notifications/read", json={"user_id": "u1"}).status_code == 401
+
+
+def test_bad_cursor_and_ids_are_400(client, admin):
+    r = client.get("/api/notifications", params={"user_id": "u1", "before": "2026-01-01T00:00:00_nothex"}, headers=admin)
+    assert r.status_code == 400
+    r = client.post("/api/notifications/read", json={"user_id": "u1", "ids": ["nothex"]}, headers=admin)
+    assert r.status_code == 400
+    r = client.get("/api/notifications/unread-count", params={"user_id": "u1"}, headers=admin)
+    assert r.json() == {"unread": 0}
+
+
+def test_create_notification_bumps_the_counter(db):
+    assert schema_examples.create_notification("u1", "hi", "there") == 1
+    assert notifications.unread_count(db, "u1") == 1
+
+
+def test_mark_all_read_keeps_a_racing_increment(db):
+    notifications.deliver(db, ["u1", "u1"], "hi", "there")
+    # A fan-out whose $inc lands after this mark_read's update_many
+    db[notifications.COUNTERS].update_one({"_id": "u1"}, {"$inc": {"unread": 1}})
+    assert notifications.mark_read(db, "u1") == 2
+    notifications.unread_cache.clear()
+    assert notifications.unread_count(db, "u1") == 1
+
+
+def test_partial_insert_bumps_only_what_was_stored(db):
+    db[notifications.NOTIFICATIONS].create_index([("user_id", 1), ("title", 1)], unique=True)
+    notifications.deliver(db, ["u1"], "dup", "x")
+    with pytest.raises(BulkWriteError):
+        notifications.deliver(db, ["u2", "u1", "u3"], "dup", "x")
+    assert {u: notifications.unread_count(db, u) for u in ("u1", "u2", "u3")} == {"u1": 1, "u2": 1, "u3": 1}
+
+
+def test_reconcile_recounts_from_the_inbox(db):
+    notifications.deliver(db, ["u1", "u1", "u2"], "hi", "there")
+    db[notifications.COUNTERS].update_one({"_id": "u1"}, {"$set": {"unread": 9}})
+    assert notifications.reconcile_unread(db, ["u1", "u2", "u3"]) == {"u1": 2, "u2": 1, "u3": 0}
+    assert notifications.unread_count(db, "u1") == 2
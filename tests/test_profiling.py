@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import profiling
+
+
+def wait():
+    # App code that happens to share a name with an idle stdlib frame
+    end = time.monotonic() + 0.3
+    while time.monotonic() < end:
+        pass
+
+
+def get():
+    pass
+
+
+def test_idle_frames_match_module_and_function():
+    assert profiling._is_idle(threading.Condition.wait.__code__)
+    assert profiling._is_idle(threading.Thread._wait_for_tstate_lock.__code__)
+    assert not profiling._is_idle(wait.__code__)
+    assert not profiling._is_idle(get.__code__)
+
+
+def test_profiler_keeps_busy_app_frames_and_drops_parked_threads():
+    parked = threading.Event()
+    idle = threading.Thread(target=parked.wait, name="parked", daemon=True)
+    busy = threading.Thread(target=wait, name="busy", daemon=True)
+    idle.start()
+    busy.start()
+    try:
+        counts = profiling.SamplingProfiler().run(0.1, interval=0.005)
+    finally:
+        parked.set()
+        busy.join()
+    stacks = list(counts)
+    assert any(s.startswith("busy;") and "wait (test_profiling.py" in s for s in stacks)
+    assert not any(s.startswith("parked;") for s in stacks)
+
+
+class Body(BaseModel):
+    title: str
+    pages: int
+
+
+@pytest.fixture
+def timed_app():
+    log = profiling.SlowRequestLog(threshold_ms=0, size=10)
+    app = FastAPI()
+    app.router.route_class = profiling.TimedRoute
+    app.add_middleware(profiling.RequestTimingMiddleware, log=log)
+
+    @app.post("/async")
+    async def create(body: Body):
+        return {"ok": True}
+
+    @app.post("/sync")
+    def create_sync(body: Body, limit: int = 10):
+        return {"ok": True}
+
+    return TestClient(app), log
+
+
+@pytest.mark.parametrize("path", ["/async", "/sync"])
+def test_request_validation_is_its_own_phase(timed_app, path):
+    client, log = timed_app
+    assert client.post(path, json={"title": "t", "pages": 3}).status_code == 200
+    assert client.post(path, json={"title": "t", "pages": "many"}).status_code == 422
+    bad, good = log.recent()
+    for entry in (good, bad):
+        assert entry["phases"]["request_validation_ms"] >= 0
+        assert entry["phases"]["request_validation_ms"] <= entry["total_ms"]
+    assert bad["status"] == 422
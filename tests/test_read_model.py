@@ -0,0 +1,74 @@
+import random
+from datetime import datetime, timedelta
+
+import read_model
+
+BASE = datetime(2026, 1, 1)
+
+
+def _doc(i, rng):
+    return {
+        "id": f"n{i}",
+        "title": rng.choice(["Waves (a+)+ notes", "Organic chemistry", "C++ basics", "Kinematics"]),
+        "subject": rng.choice(["Physics", "Chemistry", None]),
+        "class_level": rng.choice(["11", "12"]),
+        "college": rng.choice(["LBA", "KMC"]),
+        "likes": rng.randint(0, 5),
+        "downloads": rng.randint(0, 5),
+        "trending_score": rng.choice([0.0, 1.5, 2.5]),
+        "created_at": BASE + timedelta(days=rng.randint(0, 5)),
+    }
+
+
+def test_with_note_matches_a_full_rebuild():
+    rng = random.Random(7)
+    docs = [_doc(i, rng) for i in range(60)]
+    snap = read_model.NoteSnapshot(docs[:20])
+    for d in docs[20:]:
+        snap = snap.with_note(d)
+    full = read_model.NoteSnapshot(docs)
+    assert snap.by_id == full.by_id
+    assert snap.titles == full.titles
+    for name in full.orders:
+        assert list(snap.orders[name]) == list(full.orders[name]), name
+    for field in read_model.INDEXED_FIELDS:
+        assert {k: list(v) for k, v in snap.index[field].items()} == {k: list(v) for k, v in full.index[field].items()}
+
+
+def test_with_note_leaves_the_old_snapshot_untouched():
+    rng = random.Random(1)
+    old = read_model.NoteSnapshot([_doc(i, rng) for i in range(5)])
+    before = {name: list(order) for name, order in old.orders.items()}
+    new = old.with_note({**_doc(5, rng), "subject": "Physics"})
+    assert len(old) == 5 and len(new) == 6
+    assert {name: list(order) for name, order in old.orders.items()} == before
+    assert "n5" not in old.by_id
+
+
+def test_search_is_a_literal_case_insensitive_substring():
+    snap = read_model.NoteSnapshot([
+        {"id": "a", "title": "Waves (a+)+ notes"},
+        {"id": "b", "title": "C++ basics"},
+        {"id": "c", "title": "aaaaaaaaaaaaaaaaaaaaaaaaaaaa!"},
+    ])
+    assert [d["id"] for d in snap.query("(A+)+")] == ["a"]
+    assert [d["id"] for d in snap.query("c++")] == ["b"]
+    assert snap.query("(a+)+$") == []
+
+
+def test_store_add_note_is_idempotent():
+    store = read_model.ReadModel()
+    store.add_note({"id": "a", "title": "one"})
+    store.add_note({"id": "a", "title": "one"})
+    store.add_note({"id": "b", "title": "two"})
+    assert [d["id"] for d in store.list_notes()] == ["b", "a"]
+
+
+def test_mongo_search_escapes_the_query(client, db):
+    db["note"].insert_many([
+        {"title": "C++ basics", "class_level": "12", "college": "LBA", "subject": "CS", "drive_link": "https://d/1"},
+        {"title": "C basics", "class_level": "12", "college": "LBA", "subject": "CS", "drive_link": "https://d/2"},
+    ])
+    r = client.get("/api/notes", params={"q": "c++"})
+    assert r.status_code == 200
+    assert [n["title"] for n in r.json()["items"]] == ["C++ basics"]
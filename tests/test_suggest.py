@@ -0,0 +1,89 @@
+from bson import ObjectId
+
+import suggest
+
+
+def _note(title, subject="Chemistry", chapters=(), likes=0):
+    return {"_id": ObjectId(), "title": title, "subject": subject, "college": "LBA", "chapters": list(chapters), "likes": likes}
+
+
+def test_build_indexes_every_word_and_ranks_by_popularity(db):
+    db["note"].insert_many([
+        _note("Organic Basics", chapters=["Hydrocarbons"], likes=1),
+        _note("Organic Reactions", likes=50),
+    ])
+    index = suggest.PrefixIndex()
+    index.build(db)
+    titles = [r["text"] for r in index.search("organ") if r["kind"] == "note"]
+    assert titles == ["Organic Reactions", "Organic Basics"]
+    assert index.search("hydro")[0] == {"text": "Hydrocarbons", "kind": "chapter"}
+    assert index.search("basics")[0]["text"] == "Organic Basics"
+    assert index.search("  ") == []
+
+
+def test_add_note_is_visible_to_cached_prefixes_and_idempotent():
+    index = suggest.PrefixIndex()
+    index.add_note(_note("Physics Waves", subject="Physics"))
+    assert [r["text"] for r in index.search("ph")] == ["Physics Waves", "Physics"]
+    doc = _note("Photosynthesis", subject="Biology")
+    index.add_note(doc)
+    index.add_note(doc)
+    assert len([r for r in index.search("ph") if r["text"] == "Photosynthesis"]) == 1
+
+
+def test_likes_and_downloads_update_ranking():
+    index = suggest.PrefixIndex()
+    a, b = _note("Algebra One", likes=5), _note("Algebra Two", likes=1)
+    index.add_note(a)
+    index.add_note(b)
+    assert index.search("al")[0]["text"] == "Algebra One"
+    for _ in range(10):
+        index.record_counter(str(b["_id"]))
+    assert index.search("al")[0]["text"] == "Algebra Two"
+    index.record_counter("unknown")  # ignored
+
+
+def test_like_endpoint_updates_the_live_index(client, db, app_module):
+    notes = [_note("Calculus Limits", likes=3), _note("Calculus Series")]
+    db["note"].insert_many(notes)
+    suggest.index.build(db)
+    second = str(notes[1]["_id"])
+    for _ in range(5):
+        assert client.post(f"/api/notes/{second}/like").status_code == 200
+    top = client.get("/api/suggest", params={"q": "calc"}).json()["items"][0]
+    assert top["id"] == second
+
+
+def _brute_force(index, prefix, limit):
+    # Every matching term ranked by score; ties may come back in any order
+    norm = suggest._normalize(prefix)
+    refs = {r for k, r in zip(index._keys, index._refs) if k.startswith(norm)}
+    return sorted((index._entries[r]["score"] for r in refs), reverse=True)[:limit]
+
+
+def _term(result):
+    return (result["kind"], result.get("id") or suggest._normalize(result["text"]))
+
+
+def test_top_lists_match_a_full_scan(db, monkeypatch):
+    monkeypatch.setattr(suggest, "SCAN_LIMIT", 4)
+    monkeypatch.setattr(suggest, "TOP_K", 5)
+    notes = [_note(f"Chapter {i} notes", chapters=[f"chapter {i % 3}"], likes=i * 7 % 11) for i in range(30)]
+    db["note"].insert_many(notes)
+    index = suggest.PrefixIndex()
+    index.build(db)
+    assert "c" in index._top and "chapter" in index._top
+    assert index._keys == sorted(index._keys)
+
+    def check():
+        for prefix in ("c", "ch", "chapter", "chapter 1", "n", "notes"):
+            scores = [index._entries[index._by_term[_term(r)]]["score"] for r in index.search(prefix, 5)]
+            assert scores == _brute_force(index, prefix, 5), prefix
+
+    check()
+    index.add_note(_note("Chapter 99 notes", likes=100))
+    for _ in range(40):
+        index.record_counter(str(notes[3]["_id"]))
+    check()
+    index.record_counter(str(notes[3]["_id"]), delta=-35)
+    check()
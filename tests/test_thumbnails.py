@@ -0,0 +1,211 @@
+import asyncio
+import io
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import thumbnails
+
+PIL = pytest.importorskip("PIL.Image")
+
+
+def _png() -> bytes:
+    buf = io.BytesIO()
+    PIL.new("RGB", (400, 300), (200, 30, 30)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+class Origin(BaseHTTPRequestHandler):
+    image = _png()
+    hits = []
+    hosts = []
+
+    def do_GET(self):
+        self.hits.append(self.path)
+        self.hosts.append(self.headers["Host"])
+        port = self.server.server_address[1]
+        if self.path == "/img.png":
+            self._send(200, "image/png", self.image)
+        elif self.path == "/big.png":
+            self._send(200, "image/png", self.image * 4)
+        elif self.path == "/page.html":
+            self._send(200, "text/html", b"<html></html>")
+        elif self.path == "/moved":
+            self._redirect("/img.png")
+        elif self.path == "/to-private":
+            self._redirect(f"http://10.0.0.5:{port}/img.png")
+        elif self.path == "/to-file":
+            self._redirect("file:///etc/passwd")
+        else:
+            self._send(500, "text/plain", b"boom")
+
+    def _send(self, status, media_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", media_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _redirect(self, location):
+        self.send_response(302)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def origin():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = thumbnails.ThumbnailCache(root=str(tmp_path), workers=1, max_source=len(Origin.image) * 2, allow_private=True)
+    Origin.hits.clear()
+    Origin.hosts.clear()
+    yield c
+    c.shutdown()
+
+
+def _get(cache, url, width=160):
+    return asyncio.run(cache.get(url, width))
+
+
+def test_first_fetch_renders_and_second_is_cached(cache, origin):
+    path, media_type = _get(cache, f"{origin}/img.png")
+    assert media_type == "image/webp"
+    with PIL.open(path) as im:
+        assert im.size[0] == 160
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    assert _get(cache, f"{origin}/img.png") == (path, media_type)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert Origin.hits == ["/img.png"]
+
+
+def test_origin_errors(cache, origin):
+    with pytest.raises(thumbnails.SourceError):
+        _get(cache, f"{origin}/missing")
+    with pytest.raises(thumbnails.SourceError, match="Not an image"):
+        _get(cache, f"{origin}/page.html")
+    with pytest.raises(thumbnails.SourceError, match="too large"):
+        _get(cache, f"{origin}/big.png")
+
+
+def test_redirects_are_followed(cache, origin):
+    path, _ = _get(cache, f"{origin}/moved")
+    assert Origin.hits == ["/moved", "/img.png"]
+    with pytest.raises(thumbnails.SourceError, match="http"):
+        _get(cache, f"{origin}/to-file")
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/a.png",
+    "http://localhost/a.png",
+    "http://10.0.0.5/a.png",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::1]/a.png",
+    "http://[::ffff:192.168.0.1]/a.png",
+    "ftp://example.com/a.png",
+    "file:///etc/passwd",
+])
+def test_private_and_non_http_urls_are_rejected(url):
+    with pytest.raises(thumbnails.SourceError):
+        thumbnails.check_url(url)
+
+
+def test_each_redirect_hop_is_checked(tmp_path, origin, monkeypatch):
+    # Pretend the origin's IP is public; the redirect target is not
+    real = thumbnails._is_public
+    monkeypatch.setattr(thumbnails, "_is_public", lambda address: address == "127.0.0.1" or real(address))
+    strict = thumbnails.ThumbnailCache(root=str(tmp_path), workers=1)
+    Origin.hits.clear()
+    with pytest.raises(thumbnails.SourceError, match="publicly"):
+        _get(strict, f"{origin}/to-private")
+    assert Origin.hits == ["/to-private"]
+
+
+def test_fetch_connects_to_the_vetted_address(cache, origin, monkeypatch):
+    # The name only resolves during the check; a second lookup would fail
+    port = origin.rsplit(":", 1)[1]
+    answers = [["127.0.0.1"]]
+    monkeypatch.setattr(thumbnails, "_resolve", lambda host, p: answers.pop() if host == "img.test" else [])
+    path, _ = _get(cache, f"http://img.test:{port}/img.png")
+    assert os.path.exists(path)
+    assert Origin.hits == ["/img.png"]
+    assert Origin.hosts == [f"img.test:{port}"]
+
+
+def test_tls_keeps_the_original_hostname():
+    session = thumbnails.requests.Session()
+    target, headers = thumbnails._pinned(session, "https://img.test/a.png?x=1", "93.184.216.34")
+    assert (target, headers) == ("https://93.184.216.34:443/a.png?x=1", {"Host": "img.test"})
+    pool = session.get_adapter(target).poolmanager.connection_from_url(target)
+    assert pool.conn_kw["server_hostname"] == pool.assert_hostname == "img.test"
+    assert thumbnails._pinned(session, "http://u:p@img.test:8080/", "2001:db8::1") == (
+        "http://[2001:db8::1]:8080/", {"Host": "img.test:8080"})
+
+
+def test_endpoint_sends_etag_and_304(client, db, origin, cache, monkeypatch):
+    app_module = pytest.importorskip("main")
+    monkeypatch.setattr(app_module.thumbnails, "cache", cache)
+    note_id = db["note"].insert_one({
+        "title": "Waves", "class_level": "12", "college": "LBA", "subject": "Physics",
+        "drive_link": "https://drive.google.com/file/d/1/view", "thumbnail_url": f"{origin}/img.png",
+    }).inserted_id
+
+    r = client.get(f"/api/notes/{note_id}/thumbnail", params={"w": 150})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "image/webp"
+    assert "immutable" not in r.headers["cache-control"]
+    etag = r.headers["etag"]
+
+    r = client.get(f"/api/notes/{note_id}/thumbnail", params={"w": 150}, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == etag
+
+
+def test_endpoint_rerenders_a_variant_evicted_before_it_is_served(client, db, origin, cache, monkeypatch):
+    app_module = pytest.importorskip("main")
+    monkeypatch.setattr(app_module.thumbnails, "cache", cache)
+    note_id = db["note"].insert_one({
+        "title": "Waves", "class_level": "12", "college": "LBA", "subject": "Physics",
+        "drive_link": "https://drive.google.com/file/d/1/view", "thumbnail_url": f"{origin}/img.png",
+    }).inserted_id
+    real_get = cache.get
+    evicted = []
+
+    async def racing_get(url, width):
+        path, media_type = await real_get(url, width)
+        if not evicted:
+            evicted.append(path)
+            os.remove(path)
+        return path, media_type
+
+    monkeypatch.setattr(cache, "get", racing_get)
+    r = client.get(f"/api/notes/{note_id}/thumbnail", params={"w": 150})
+    assert r.status_code == 200
+    assert r.content[:4] == b"RIFF"
+    assert cache.misses == 2
+
+
+def test_evict_keeps_files_touched_after_the_scan(cache, origin, monkeypatch):
+    path, _ = _get(cache, f"{origin}/img.png")
+    real_walk = os.walk
+
+    def walk_then_touch(root):
+        yield from real_walk(root)
+        os.utime(path, (1e9, 2e9))  # handed out again while evict was sorting
+
+    monkeypatch.setattr(thumbnails.os, "walk", walk_then_touch)
+    cache.evict(target=0)
+    assert os.path.exists(path)
+    assert not os.path.exists(cache._blob(os.path.basename(path).split(".")[0]))
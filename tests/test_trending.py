@@ -0,0 +1,47 @@
+import math
+
+import pytest
+
+import trending
+
+
+def _bump(db, note_id, counter, now):
+    db["note"].update_one({"_id": note_id}, trending.counter_update(counter, now=now))
+
+
+def test_counter_update_bumps_counter_and_score(db):
+    nid = db["note"].insert_one({"title": "n"}).inserted_id
+    now = trending.current_epoch(1_000_000_000) + 10
+    _bump(db, nid, "likes", now)
+    _bump(db, nid, "downloads", now)
+    d = db["note"].find_one({"_id": nid})
+    assert (d["likes"], d["downloads"]) == (1, 1)
+    boost = math.exp(math.log(2) / trending.HALF_LIFE * 10)
+    assert d["trending_score"] == pytest.approx(3 * boost)
+    assert d["trending_epoch"] == trending.current_epoch(now)
+
+
+def test_newer_events_outrank_older_ones(db):
+    start = trending.current_epoch(1_000_000_000)
+    old = db["note"].insert_one({"title": "old"}).inserted_id
+    new = db["note"].insert_one({"title": "new"}).inserted_id
+    for _ in range(3):
+        _bump(db, old, "likes", start + 1)
+    now = start + 2 * trending.HALF_LIFE + 1
+    for _ in range(2):
+        _bump(db, new, "likes", now)
+    trending.renormalize(db, now=now)
+    top = db["note"].find_one(sort=[("trending_score", -1)])
+    assert top["title"] == "new"
+
+
+def test_renormalize_moves_untouched_notes_to_the_current_epoch(db):
+    start = trending.current_epoch(1_000_000_000)
+    nid = db["note"].insert_one({"title": "n"}).inserted_id
+    _bump(db, nid, "likes", start)
+    later = start + trending.HALF_LIFE
+    result = trending.renormalize(db, now=later)
+    d = db["note"].find_one({"_id": nid})
+    assert result["rescaled"] == 1
+    assert d["trending_epoch"] == later
+    assert d["trending_score"] == pytest.approx(trending.WEIGHTS["likes"] / 2)
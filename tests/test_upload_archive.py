@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import upload_archive
+
+NOW = datetime.now(timezone.utc)
+
+
+def _upload(db, status="accepted", reviewed_days=None, created_days=0, **extra):
+    doc = {"title": "Optics", "class_level": "12", "college": "LBA", "subject": "Physics",
+           "drive_link": "https://drive.google.com/file/d/1/view", "status": status,
+           "created_at": NOW - timedelta(days=created_days), **extra}
+    if reviewed_days is not None:
+        doc["reviewed_at"] = NOW - timedelta(days=reviewed_days)
+    return db[upload_archive.UPLOADS].insert_one(doc).inserted_id
+
+
+class Proxy:
+    """Database stand-in that swaps in wrappers for some collections"""
+
+    def __init__(self, db, **collections):
+        self.db = db
+        self.collections = collections
+
+    def __getitem__(self, name):
+        return self.collections.get(name) or self.db[name]
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+
+def test_archive_batch_moves_stale_reviewed_uploads(db):
+    stale = [_upload(db, "accepted", reviewed_days=40), _upload(db, "rejected", reviewed_days=31)]
+    fresh = _upload(db, "accepted", reviewed_days=2)
+    pending = _upload(db, "pending", created_days=90)
+
+    assert upload_archive.archive_batch(db, NOW - timedelta(days=30)) == 2
+    assert {d["_id"] for d in db[upload_archive.UPLOADS].find()} == {fresh, pending}
+    archived = list(db[upload_archive.ARCHIVE].find())
+    assert {d["_id"] for d in archived} == set(stale)
+    assert all(d["archived_at"] and d["title"] == "Optics" for d in archived)
+    assert upload_archive.archive_batch(db, NOW - timedelta(days=30)) == 0
+
+
+def test_status_change_mid_batch_rolls_the_copy_back(db):
+    changed = _upload(db, "accepted", reviewed_days=40)
+    moved = _upload(db, "accepted", reviewed_days=40)
+    uploads = db[upload_archive.UPLOADS]
+
+    class Reopened:
+        # A moderator reopens `changed` between the read and the delete
+        def bulk_write(self, ops, **kwargs):
+            uploads.update_one({"_id": changed}, {"$set": {"status": "pending"}})
+            return uploads.bulk_write(ops, **kwargs)
+
+        def __getattr__(self, name):
+            return getattr(uploads, name)
+
+    proxy = Proxy(db, **{upload_archive.UPLOADS: Reopened()})
+    assert upload_archive.archive_batch(proxy, NOW - timedelta(days=30)) == 1
+    assert uploads.find_one({"_id": changed})["status"] == "pending"
+    assert uploads.find_one({"_id": moved}) is None
+    assert [d["_id"] for d in db[upload_archive.ARCHIVE].find()] == [moved]
+
+
+def test_archive_stale_batches_up_to_the_cutoff(db, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(upload_archive.time, "sleep", sleeps.append)
+    for _ in range(5):
+        _upload(db, "accepted", reviewed_days=45)
+    legacy = _upload(db, "rejected", created_days=60)  # reviewed before reviewed_at existed
+    recent = _upload(db, "accepted", reviewed_days=10)
+
+    result = upload_archive.archive_stale(db, days=30, batch_size=2, pause=0.01)
+    assert (result["archived"], result["batches"]) == (6, 3)
+    assert sleeps == [0.01] * 3
+    assert abs((NOW - timedelta(days=30) - result["cutoff"]).total_seconds()) < 60
+    assert db[upload_archive.ARCHIVE].count_documents({"_id": legacy}) == 1
+    assert [d["_id"] for d in db[upload_archive.UPLOADS].find()] == [recent]
+
+
+def _expire(db):
+    return db[upload_archive.ARCHIVE].index_information().get("expire")
+
+
+def test_ttl_index_is_created_updated_and_dropped(db):
+    upload_archive._ensure_ttl(db, 10)
+    assert _expire(db)["expireAfterSeconds"] == 10 * 86400
+    assert _expire(db)["key"] == [("archived_at", 1)]
+
+    commands = []
+    proxy = Proxy(db)
+    proxy.command = commands.append
+    upload_archive._ensure_ttl(proxy, 20)
+    assert commands == [{"collMod": upload_archive.ARCHIVE, "index": {"name": "expire", "expireAfterSeconds": 20 * 86400}}]
+
+    # mongomock has no collMod, which exercises the drop-and-recreate fallback
+    upload_archive._ensure_ttl(db, 20)
+    assert _expire(db)["expireAfterSeconds"] == 20 * 86400
+
+    upload_archive._ensure_ttl(db, 0)
+    assert _expire(db) is None
+    upload_archive._ensure_ttl(db, 0)
+
+
+def _archived(db, contributor, status, reviewed_days, **extra):
+    db[upload_archive.ARCHIVE].insert_one({
+        "title": f"{contributor} {status}", "contributor_name": contributor, "status": status,
+        "reviewed_at": NOW - timedelta(days=reviewed_days), "archived_at": NOW, **extra,
+    })
+
+
+def test_search_archive_filters_and_upgrades(db):
+    _archived(db, "Asha", "accepted", 40, tags=["waves"])
+    _archived(db, "Asha", "rejected", 50)
+    _archived(db, "Bikash", "accepted", 45)
+
+    titles = [d["title"] for d in upload_archive.search_archive(db)]
+    assert titles == ["Asha accepted", "Bikash accepted", "Asha rejected"]
+    assert [d["title"] for d in upload_archive.search_archive(db, status="accepted")] == ["Asha accepted", "Bikash accepted"]
+    assert [d["title"] for d in upload_archive.search_archive(db, contributor="Asha")] == ["Asha accepted", "Asha rejected"]
+    assert [d["title"] for d in upload_archive.search_archive(db, skip=1, limit=1)] == ["Bikash accepted"]
+
+    first = upload_archive.search_archive(db, status="accepted", contributor="Asha")[0]
+    assert first["chapters"] == ["waves"] and "tags" not in first
+    assert isinstance(first["id"], str) and "_id" not in first
+
+
+def test_archive_endpoints(client, db, admin):
+    assert client.get("/api/admin/uploads/archive").status_code == 401
+    assert client.post("/api/admin/uploads/archive").status_code == 401
+
+    _upload(db, "accepted", reviewed_days=12)
+    _upload(db, "pending", created_days=12)
+    r = client.post("/api/admin/uploads/archive", params={"days": 7}, headers=admin)
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["batches"], body["hot"], body["archived"]) == (1, 1, 1)
+
+    r = client.get("/api/admin/uploads/archive", params={"status": "accepted"}, headers=admin)
+    assert r.json()["count"] == 1
+    assert r.json()["items"][0]["status"] == "accepted"
+    r = client.get("/api/admin/uploads/archive", params={"status": "rejected"}, headers=admin)
+    assert r.json() == {"items": [], "count": 0}
+
+
+@pytest.mark.parametrize("limit", [0, 201])
+def test_archive_search_limit_is_bounded(client, admin, limit):
+    r = client.get("/api/admin/uploads/archive", params={"limit": limit}, headers=admin)
+    assert r.status_code == 422
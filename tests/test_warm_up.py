@@ -0,0 +1,60 @@
+import bson
+import pytest
+
+
+class EncodingCollection:
+    """Collection proxy that BSON-encodes every filter, like a real driver would"""
+
+    def __init__(self, real, seen):
+        self.real = real
+        self.seen = seen
+
+    def _check(self, filt):
+        bson.encode(filt or {})
+        self.seen.append(filt)
+
+    def find(self, filt=None, *args, **kwargs):
+        self._check(filt)
+        return self.real.find(filt, *args, **kwargs)
+
+    def find_one(self, filt=None, *args, **kwargs):
+        self._check(filt)
+        return self.real.find_one(filt, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+class EncodingDb:
+    def __init__(self, real):
+        self.real = real
+        self.seen = []
+
+    def __getitem__(self, name):
+        return EncodingCollection(self.real[name], self.seen)
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+
+@pytest.fixture
+def encoding_db(app_module, db, monkeypatch):
+    proxy = EncodingDb(db)
+    monkeypatch.setattr(app_module, "db", proxy)
+    return proxy
+
+
+def test_warm_up_sends_only_encodable_filters(app_module, encoding_db):
+    encoding_db.real["contributor"].insert_one({"name": "a", "points": 3})
+    app_module.warm_up()
+    assert encoding_db.seen, "warm_up should query the database"
+    assert app_module.catalog_cache.stats()["size"] == 1
+    assert app_module.leaderboard_cache.stats()["size"] == 1
+    assert app_module.settings_cache.stats()["size"] == 1
+
+
+def test_warm_up_primes_what_the_endpoints_serve(app_module, encoding_db, client):
+    app_module.warm_up()
+    before = app_module.catalog_cache.stats()["hits"]
+    assert client.get("/api/notes").status_code == 200
+    assert app_module.catalog_cache.stats()["hits"] == before + 1
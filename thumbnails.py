@@ -0,0 +1,333 @@
+"""
+Thumbnail Proxy Cache
+
+Notes point `thumbnail_url` at arbitrary external images. The thumbnail
+endpoint fetches each source image once, stores it on disk under the SHA-256
+of its bytes (so identical images are shared), and renders resized WebP
+variants next to it in a process pool. Files are served with FileResponse,
+which streams them from disk in chunks, with an ETag derived from the
+content digest. The cache directory is kept under a disk quota by evicting
+least-recently-used files (access time is tracked via mtime). Without Pillow
+the original image is served unresized.
+
+Source URLs come from users, so fetching them must not reach into our own
+network: only http(s) is allowed, every host (including each redirect hop)
+must resolve to public addresses only, and bodies are capped at
+MAX_SOURCE_BYTES. The connection then goes to the address that was checked
+(the URL's host is still sent as Host and used for SNI and certificate
+checks), so a DNS answer that changes after the check cannot redirect it.
+"""
+
+import asyncio
+import hashlib
+import ipaddress
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from PIL import Image
+except ImportError:  # optional: serve originals as-is
+    Image = None
+
+logger = logging.getLogger("notebuddy.thumbnails")
+
+CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".thumbnail_cache"))
+QUOTA_BYTES = int(os.getenv("THUMBNAIL_CACHE_MB", 512)) * 1024 * 1024
+MAX_SOURCE_BYTES = int(os.getenv("THUMBNAIL_MAX_SOURCE_MB", 10)) * 1024 * 1024
+FETCH_TIMEOUT = float(os.getenv("THUMBNAIL_FETCH_TIMEOUT", 10))
+MAX_REDIRECTS = 3
+WIDTHS = (160, 320, 640)
+QUALITY = 75
+
+
+class SourceError(Exception):
+    """The origin image could not be fetched or decoded"""
+
+
+def _resolve(host: str, port: int) -> List[str]:
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        raise SourceError(f"Cannot resolve {host}: {e}")
+    return [info[4][0] for info in infos]
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    # is_global excludes private, loopback, link-local, reserved and
+    # unspecified ranges (and 100.64/10 carrier NAT)
+    return ip.is_global and not ip.is_multicast
+
+
+def check_url(url: str, allow_private: bool = False) -> str:
+    """Return the address to connect to for `url`.
+
+    Raises SourceError unless `url` is http(s) on a host with only public
+    addresses. Fetch through the returned address (see _PinnedAdapter) rather
+    than resolving the host again.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise SourceError("Only http(s) URLs are allowed")
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    except ValueError:
+        raise SourceError("Invalid port")
+    addresses = _resolve(parts.hostname, port)
+    if not addresses or not (allow_private or all(_is_public(a) for a in addresses)):
+        raise SourceError("Host is not publicly routable")
+    return addresses[0]
+
+
+class _PinnedAdapter(HTTPAdapter):
+    """Transport for a URL rewritten to a vetted IP: TLS still uses the original hostname"""
+
+    def __init__(self, hostname: str, **kwargs):
+        self.hostname = hostname
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **pool_kwargs):
+        # urllib3 drops these for plain http pools
+        pool_kwargs.update(server_hostname=self.hostname, assert_hostname=self.hostname)
+        super().init_poolmanager(*args, **pool_kwargs)
+
+
+def _pinned(session: requests.Session, url: str, address: str) -> Tuple[str, Dict[str, str]]:
+    """URL aimed at `address` plus the Host header of the original `url`"""
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    ip = f"[{address.split('%', 1)[0]}]" if ":" in address else address
+    target = urlunsplit((parts.scheme, f"{ip}:{port}", parts.path or "/", parts.query, ""))
+    session.mount(f"{parts.scheme}://{ip}:{port}/", _PinnedAdapter(parts.hostname))
+    return target, {"Host": parts.netloc.rpartition("@")[2]}
+
+
+def _render_variant(src: str, dst: str, width: int, quality: int = QUALITY):
+    # Runs in a worker process
+    with Image.open(src) as im:
+        im.thumbnail((width, width * 4))
+        if im.mode not in ("RGB", "RGBA"):
+            im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+        tmp = f"{dst}.{os.getpid()}.tmp"
+        im.save(tmp, "WEBP", quality=quality, method=4)
+    os.replace(tmp, dst)
+
+
+class ThumbnailCache:
+    def __init__(self, root: str = CACHE_DIR, quota: int = QUOTA_BYTES, workers: Optional[int] = None,
+                 max_source: int = MAX_SOURCE_BYTES, allow_private: bool = False):
+        self.root = root
+        self.quota = quota
+        self.workers = workers
+        self.max_source = max_source
+        # Only for tests against a local origin
+        self.allow_private = allow_private
+        self.hits = 0
+        self.misses = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._size: Optional[int] = None
+
+    # -- paths -------------------------------------------------------------
+
+    def _url_ref(self, url: str) -> str:
+        return os.path.join(self.root, "urls", hashlib.sha256(url.encode()).hexdigest())
+
+    def _blob(self, digest: str, suffix: str = "src") -> str:
+        return os.path.join(self.root, "blobs", digest[:2], f"{digest}.{suffix}")
+
+    # -- disk quota --------------------------------------------------------
+
+    def _scan(self):
+        total = 0
+        for dirpath, _, files in os.walk(os.path.join(self.root, "blobs")):
+            for name in files:
+                total += os.path.getsize(os.path.join(dirpath, name))
+        return total
+
+    def _account(self, added: int):
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()
+            else:
+                self._size += added
+            over = self._size > self.quota
+        if over:
+            self.evict()
+
+    def evict(self, target: Optional[float] = None) -> int:
+        """Delete least-recently-used blobs until usage drops to `target` (90% of quota).
+
+        Files touched since the scan (i.e. just handed out by get()) are kept.
+        """
+        target = self.quota * 0.9 if target is None else target
+        files = []
+        for dirpath, _, names in os.walk(os.path.join(self.root, "blobs")):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+        total = sum(f[1] for f in files)
+        removed = 0
+        for mtime, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                if os.stat(path).st_mtime != mtime:
+                    continue
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._size = total
+        return removed
+
+    @staticmethod
+    def _touch(path: str):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    # -- fetch / render ----------------------------------------------------
+
+    def _fetch(self, url: str) -> Tuple[str, str]:
+        """Download the source once; returns its content digest and media type"""
+        ref = self._url_ref(url)
+        try:
+            with open(ref) as f:
+                digest, _, media_type = f.read().strip().partition(" ")
+            if os.path.exists(self._blob(digest)):
+                return digest, media_type
+        except FileNotFoundError:
+            pass
+        body, media_type = self._download(url)
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(body)
+            os.replace(tmp, path)
+            self._account(len(body))
+        os.makedirs(os.path.dirname(ref), exist_ok=True)
+        with open(ref, "w") as f:
+            f.write(f"{digest} {media_type}")
+        return digest, media_type
+
+    def _download(self, url: str) -> Tuple[bytes, str]:
+        # Redirects are followed by hand so that every hop is checked, and
+        # each hop connects to the address its check approved. Proxies from
+        # the environment are ignored: they would resolve the host again.
+        session = requests.Session()
+        session.trust_env = False
+        try:
+            for _ in range(MAX_REDIRECTS + 1):
+                target, headers = _pinned(session, url, check_url(url, self.allow_private))
+                with session.get(target, headers=headers, stream=True, timeout=FETCH_TIMEOUT,
+                                 allow_redirects=False) as r:
+                    if r.is_redirect:
+                        url = urljoin(url, r.headers["location"])
+                        continue
+                    r.raise_for_status()
+                    media_type = r.headers.get("content-type", "image/jpeg").split(";")[0].strip()
+                    if not media_type.startswith("image/"):
+                        raise SourceError("Not an image")
+                    length = r.headers.get("content-length")
+                    if length and length.isdigit() and int(length) > self.max_source:
+                        raise SourceError("Image too large")
+                    body = bytearray()
+                    for part in r.iter_content(64 * 1024):
+                        body += part
+                        if len(body) > self.max_source:
+                            raise SourceError("Image too large")
+                    return bytes(body), media_type
+        except requests.RequestException as e:
+            raise SourceError(str(e))
+        finally:
+            session.close()
+        raise SourceError("Too many redirects")
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def _once(self, key: str, make):
+        # Coalesce concurrent requests for the same file into one producer
+        loop = asyncio.get_running_loop()
+        fut = self._inflight.get(key)
+        if fut is not None:
+            return await asyncio.shield(fut)
+        fut = loop.create_future()
+        self._inflight[key] = fut
+        try:
+            result = await make()
+            fut.set_result(result)
+            return result
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get(self, url: str, width: int) -> Tuple[str, str]:
+        """Path and media type of the `width` variant of `url`, creating it if needed"""
+        loop = asyncio.get_running_loop()
+        digest, media_type = await self._once("src:" + url, lambda: loop.run_in_executor(None, self._fetch, url))
+        src = self._blob(digest)
+        if Image is None:
+            self._touch(src)
+            return src, media_type
+        dst = self._blob(digest, f"w{width}.webp")
+        if os.path.exists(dst):
+            self.hits += 1
+            self._touch(dst)
+            return dst, "image/webp"
+        self.misses += 1
+
+        async def render():
+            try:
+                await loop.run_in_executor(self._executor(), _render_variant, src, dst, width)
+            except Exception as e:
+                raise SourceError(f"Could not decode image: {e}")
+            self._account(os.path.getsize(dst))
+            return dst
+
+        await self._once(dst, render)
+        self._touch(src)
+        return dst, "image/webp"
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict:
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._size, "quota": self.quota}
+
+
+def nearest_width(width: int) -> int:
+    """Snap a requested width to one of the rendered sizes"""
+    return next((w for w in WIDTHS if w >= width), WIDTHS[-1])
+
+
+cache = ThumbnailCache()
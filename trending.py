@@ -0,0 +1,67 @@
+"""
+Trending Scores
+
+Each note carries an exponentially time-decayed `trending_score`. Rather than
+decaying every score continuously, scores are expressed relative to an epoch
+(a multiple of the half-life, so every worker derives the same one from the
+clock): an event at time t adds `weight * 2 ** ((t - epoch) / half_life)`.
+The like/download paths apply this in the same atomic update that bumps the
+counter, rescaling the note first if it was last touched in an older epoch.
+`renormalize` rescales the untouched notes once a new epoch starts so that the
+indexed field stays comparable across the collection and never overflows.
+"""
+
+import math
+import os
+import time
+from typing import Dict, List
+
+from pymongo import DESCENDING
+
+HALF_LIFE = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 48)) * 3600
+WEIGHTS = {"likes": 2.0, "downloads": 1.0}
+# Scores below this are dropped to 0 so dead notes fall out of the index range
+FLOOR = 1e-6
+
+_LAMBDA = math.log(2) / HALF_LIFE
+
+
+def current_epoch(now: float = None) -> float:
+    now = time.time() if now is None else now
+    return math.floor(now / HALF_LIFE) * HALF_LIFE
+
+
+def ensure_indexes(db):
+    db["note"].create_index([("trending_score", DESCENDING)], name="trending_score_desc")
+
+
+def counter_update(counter: str, delta: int = 1, now: float = None) -> List[Dict]:
+    """Pipeline update that bumps `counter` and the note's trending score together"""
+    now = time.time() if now is None else now
+    epoch = current_epoch(now)
+    rescale = {"$exp": {"$multiply": [-_LAMBDA, {"$subtract": [epoch, {"$ifNull": ["$trending_epoch", epoch]}]}]}}
+    boost = WEIGHTS[counter] * delta * math.exp(_LAMBDA * (now - epoch))
+    return [{"$set": {
+        counter: {"$add": [{"$ifNull": [f"${counter}", 0]}, delta]},
+        "trending_score": {"$add": [{"$multiply": [{"$ifNull": ["$trending_score", 0]}, rescale]}, boost]},
+        "trending_epoch": epoch,
+    }}]
+
+
+def renormalize(db, now: float = None) -> Dict:
+    """Move every note still on an older epoch onto the current one"""
+    epoch = current_epoch(now)
+    coll = db["note"]
+    rescaled = 0
+    for old in coll.distinct("trending_epoch", {"trending_epoch": {"$lt": epoch}}):
+        factor = math.exp(-_LAMBDA * (epoch - old))
+        res = coll.update_many(
+            {"trending_epoch": old},
+            [{"$set": {"trending_score": {"$multiply": ["$trending_score", factor]}, "trending_epoch": epoch}}],
+        )
+        rescaled += res.modified_count
+    dropped = coll.update_many(
+        {"trending_score": {"$gt": 0, "$lt": FLOOR}},
+        {"$set": {"trending_score": 0}},
+    ).modified_count
+    return {"epoch": epoch, "rescaled": rescaled, "dropped": dropped}
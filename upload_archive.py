@@ -0,0 +1,127 @@
+"""
+Upload Archival
+
+Reviewed uploads are only needed for occasional look-ups, but left in
+"upload" they bloat the collection the moderation queue scans. A periodic
+job moves uploads that were accepted or rejected more than ARCHIVE_AFTER_DAYS
+ago to "upload_archive" in batches: each batch is upserted into the archive
+first and then deleted from "upload", so an interrupted run never loses a
+document and re-running it is harmless.
+
+Archived uploads expire ARCHIVE_TTL_DAYS after archival through a TTL index
+(0 keeps them forever). They stay searchable through `search_archive`, which
+reads from a secondary when one is available so archive look-ups don't pull
+cold pages into the primary's cache.
+"""
+
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, DeleteOne, ReadPreference, ReplaceOne
+from pymongo.errors import OperationFailure
+
+from migrations import upgrade
+
+logger = logging.getLogger("notebuddy.upload_archive")
+
+UPLOADS = "upload"
+ARCHIVE = "upload_archive"
+ARCHIVE_AFTER_DAYS = float(os.getenv("UPLOAD_ARCHIVE_AFTER_DAYS", 30))
+ARCHIVE_TTL_DAYS = float(os.getenv("UPLOAD_ARCHIVE_TTL_DAYS", 365))
+BATCH_SIZE = int(os.getenv("UPLOAD_ARCHIVE_BATCH_SIZE", 500))
+REVIEWED = ["accepted", "rejected"]
+
+
+def ensure_indexes(db, ttl_days: float = ARCHIVE_TTL_DAYS):
+    db[UPLOADS].create_index([("status", ASCENDING), ("reviewed_at", ASCENDING)], name="status_reviewed")
+    db[UPLOADS].create_index([("created_at", DESCENDING)], name="created")
+    db[ARCHIVE].create_index([("status", ASCENDING), ("reviewed_at", DESCENDING)], name="status_reviewed")
+    db[ARCHIVE].create_index([("contributor_name", ASCENDING)], name="contributor")
+    _ensure_ttl(db, ttl_days)
+
+
+def _ensure_ttl(db, ttl_days: float):
+    existing = db[ARCHIVE].index_information().get("expire")
+    if ttl_days <= 0:
+        if existing:
+            db[ARCHIVE].drop_index("expire")
+        return
+    seconds = int(ttl_days * 86400)
+    if existing is None:
+        db[ARCHIVE].create_index([("archived_at", ASCENDING)], name="expire", expireAfterSeconds=seconds)
+    elif existing.get("expireAfterSeconds") != seconds:
+        try:
+            db.command({"collMod": ARCHIVE, "index": {"name": "expire", "expireAfterSeconds": seconds}})
+        except (OperationFailure, NotImplementedError):
+            db[ARCHIVE].drop_index("expire")
+            db[ARCHIVE].create_index([("archived_at", ASCENDING)], name="expire", expireAfterSeconds=seconds)
+
+
+def _stale_filter(cutoff: datetime) -> Dict:
+    # Uploads reviewed before reviewed_at was recorded fall back to created_at
+    return {
+        "status": {"$in": REVIEWED},
+        "$or": [
+            {"reviewed_at": {"$lt": cutoff}},
+            {"reviewed_at": {"$exists": False}, "created_at": {"$lt": cutoff}},
+        ],
+    }
+
+
+def archive_batch(db, cutoff: datetime, batch_size: int = BATCH_SIZE) -> int:
+    """Move one batch of stale uploads; returns how many left the hot collection"""
+    docs = list(db[UPLOADS].find(_stale_filter(cutoff)).limit(batch_size))
+    if not docs:
+        return 0
+    now = datetime.now(timezone.utc)
+    db[ARCHIVE].bulk_write([ReplaceOne({"_id": d["_id"]}, {**d, "archived_at": now}, upsert=True) for d in docs], ordered=False)
+    # Only delete uploads whose status didn't change since they were read
+    result = db[UPLOADS].bulk_write([DeleteOne({"_id": d["_id"], "status": d["status"]}) for d in docs], ordered=False)
+    if result.deleted_count < len(docs):
+        kept = [d["_id"] for d in docs if db[UPLOADS].count_documents({"_id": d["_id"]}, limit=1)]
+        db[ARCHIVE].delete_many({"_id": {"$in": kept}})
+    return result.deleted_count
+
+
+def archive_stale(db, days: float = ARCHIVE_AFTER_DAYS, batch_size: int = BATCH_SIZE, pause: float = 0.05) -> Dict:
+    """Archive everything reviewed more than `days` ago, a batch at a time"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    moved = batches = 0
+    while True:
+        n = archive_batch(db, cutoff, batch_size)
+        if not n:
+            break
+        moved += n
+        batches += 1
+        time.sleep(pause)  # leave room for foreground traffic between batches
+    if moved:
+        logger.info("Archived %d uploads in %d batches", moved, batches)
+    return {"archived": moved, "batches": batches, "cutoff": cutoff}
+
+
+def search_archive(db, status: Optional[str] = None, contributor: Optional[str] = None,
+                   skip: int = 0, limit: int = 50) -> List[Dict]:
+    coll = db[ARCHIVE].with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
+    q = {}
+    if status:
+        q["status"] = status
+    if contributor:
+        q["contributor_name"] = contributor
+    items = []
+    for d in coll.find(q).sort([("reviewed_at", -1)]).skip(skip).limit(limit):
+        upgrade(UPLOADS, d)
+        d["id"] = str(d.pop("_id"))
+        items.append(d)
+    return items
+
+
+def stats(db) -> Dict:
+    return {
+        "hot": db[UPLOADS].estimated_document_count(),
+        "archived": db[ARCHIVE].estimated_document_count(),
+        "archive_after_days": ARCHIVE_AFTER_DAYS,
+        "ttl_days": ARCHIVE_TTL_DAYS,
+    }